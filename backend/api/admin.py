@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import User, Notification, Location, Category, Status, Item, ItemMovement, ItemDisposal, ItemMaintenance
+from .models import User, Notification, Location, Category, Status, Item, ItemMovement, ItemDisposal, ItemMaintenance, Job, StoredImage
 
 admin.site.register(User)
 admin.site.register(Notification)
@@ -9,4 +9,6 @@ admin.site.register(Status)
 admin.site.register(Item)
 admin.site.register(ItemMovement)
 admin.site.register(ItemDisposal)
-admin.site.register(ItemMaintenance)
\ No newline at end of file
+admin.site.register(ItemMaintenance)
+admin.site.register(Job)
+admin.site.register(StoredImage)
\ No newline at end of file
@@ -1,6 +1,28 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_migrate
+
+
+def ensure_search_index(sender, using, **kwargs):
+    from django.db import connections
+    from django.db.migrations.recorder import MigrationRecorder
+    from api import search
+
+    connection = connections[using]
+    applied = MigrationRecorder(connection).applied_migrations()
+    if ('api', '0004_item_search_index') in applied:
+        search.install(connection)
 
 
 class ApiConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'api'
+
+    def ready(self):
+        # SQLite pierde los triggers del índice cuando una migración reconstruye
+        # api_item; se vuelven a crear al terminar cada migrate.
+        post_migrate.connect(ensure_search_index, sender=self)
+
+        # Receptores que mantienen los contadores del dashboard y de
+        # notificaciones, los totales diarios del historial de stock, las
+        # versiones de la caché y las referencias a imágenes
+        from api import cache, counters, history, images, notifications  # noqa: F401
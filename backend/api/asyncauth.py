@@ -0,0 +1,106 @@
+"""
+Autenticación para las vistas `async def` (DRF 3.16 no tiene vistas
+asíncronas). Sigue las reglas de DEFAULT_AUTHENTICATION_CLASSES, en el mismo
+orden, pero la consulta del usuario se hace con la ORM asíncrona:
+
+- "Authorization: Token <key>": rest_framework.authtoken
+- "Authorization: Bearer <jwt>": simplejwt (usuario activo y revocación por
+  cambio de contraseña incluidos)
+- Sesión de Django (request.auser())
+
+Los errores responden igual que DRF: 401 con {"detail": ...}.
+"""
+from functools import wraps
+
+from django.http import JsonResponse
+from django.utils.translation import gettext_lazy as _
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+from rest_framework.exceptions import AuthenticationFailed, NotAuthenticated
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+
+class AsyncJWTAuthentication(JWTAuthentication):
+  async def aauthenticate(self, request):
+    header = self.get_header(request)
+    if header is None:
+      return None
+    raw_token = self.get_raw_token(header)
+    if raw_token is None:
+      return None
+    # Validar la firma no toca la base de datos
+    validated_token = self.get_validated_token(raw_token)
+    return await self.aget_user(validated_token)
+
+  async def aget_user(self, validated_token):
+    try:
+      user_id = validated_token[jwt_settings.USER_ID_CLAIM]
+    except KeyError:
+      raise InvalidToken(_("Token contained no recognizable user identification"))
+
+    try:
+      user = await self.user_model.objects.aget(**{jwt_settings.USER_ID_FIELD: user_id})
+    except self.user_model.DoesNotExist:
+      raise AuthenticationFailed(_("User not found"), code="user_not_found")
+
+    if jwt_settings.CHECK_USER_IS_ACTIVE and not user.is_active:
+      raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+    if jwt_settings.CHECK_REVOKE_TOKEN:
+      if validated_token.get(jwt_settings.REVOKE_TOKEN_CLAIM) != get_md5_hash_password(user.password):
+        raise AuthenticationFailed(_("The user's password has been changed."), code="password_changed")
+    return user
+
+
+async def _token_user(request):
+  parts = request.headers.get('Authorization', '').split()
+  if not parts or parts[0].lower() != TokenAuthentication.keyword.lower():
+    return None
+  if len(parts) != 2:
+    raise AuthenticationFailed(_('Invalid token header. Token string should not contain spaces.'))
+  try:
+    token = await Token.objects.select_related('user').aget(key=parts[1])
+  except Token.DoesNotExist:
+    raise AuthenticationFailed(_('Invalid token.'))
+  if not token.user.is_active:
+    raise AuthenticationFailed(_('User inactive or deleted.'))
+  return token.user
+
+
+async def aauthenticate(request):
+  """Usuario de la petición o None. AuthenticationFailed si las credenciales no son válidas"""
+  # APIClient.force_authenticate() de las pruebas, igual que en rest_framework.request
+  forced = getattr(request, '_force_auth_user', None)
+  if forced is not None:
+    return forced
+  user = await _token_user(request)
+  if user is None:
+    user = await AsyncJWTAuthentication().aauthenticate(request)
+  if user is None and hasattr(request, 'auser'):
+    # Solo existe con AuthenticationMiddleware
+    user = await request.auser()
+  return user if user is not None and user.is_authenticated else None
+
+
+def _unauthorized(detail):
+  response = JsonResponse(detail if isinstance(detail, dict) else {'detail': detail}, status=401)
+  # DRF toma la cabecera de la primera clase de autenticación
+  response['WWW-Authenticate'] = TokenAuthentication.keyword
+  return response
+
+
+def async_login_required(view):
+  """Equivale a @api_view + @permission_classes([IsAuthenticated]) para una vista async"""
+  @wraps(view)
+  async def wrapper(request, *args, **kwargs):
+    try:
+      user = await aauthenticate(request)
+    except (AuthenticationFailed, InvalidToken) as e:
+      return _unauthorized(e.detail)
+    if user is None:
+      return _unauthorized(NotAuthenticated.default_detail)
+    request.user = user
+    return await view(request, *args, **kwargs)
+  return wrapper
@@ -0,0 +1,199 @@
+"""
+Caché versionada para las listas de datos de referencia (categorías,
+ubicaciones, estados, usuarios).
+
+Cada tabla tiene un contador de versión en api_tableversion que se
+incrementa al confirmarse cada alta, edición o borrado de una fila. Las
+respuestas ya serializadas se guardan bajo (nombre, versiones), primero en un
+LRU del proceso y luego en el caché de Django, así que en estado estable una
+lista cuesta una sola consulta por llave primaria (las versiones).
+
+Como las versiones están en la base de datos, todos los workers ven cada
+incremento aunque el caché de Django sea local al proceso (LocMemCache): los
+ETag de las vistas de ítems nunca responden 304 con un stock que ya cambió.
+"""
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import DEFAULT_DB_ALIAS, IntegrityError, transaction
+from django.db.models import F
+from django.db.models.signals import post_delete, post_save
+from django.http import HttpResponse
+from django.views.decorators.http import condition
+
+from api import dbrouter
+from api.models import Category, Item, Location, Status, TableVersion, User
+
+TIMEOUT = getattr(settings, 'REFERENCE_CACHE_TIMEOUT', 300)
+LRU_SIZE = getattr(settings, 'REFERENCE_CACHE_LRU_SIZE', 256)
+
+# Modelo -> nombre de la tabla versionada
+VERSIONED_MODELS = {
+  Item: 'item',
+  Category: 'category',
+  Location: 'location',
+  Status: 'status',
+  User: 'user',
+}
+
+
+class LRUCache:
+  def __init__(self, size):
+    self.size = size
+    self._data = OrderedDict()
+    self._lock = threading.Lock()
+
+  def get(self, key):
+    with self._lock:
+      value = self._data.get(key)
+      if value is not None:
+        self._data.move_to_end(key)
+      return value
+
+  def set(self, key, value):
+    with self._lock:
+      self._data[key] = value
+      self._data.move_to_end(key)
+      while len(self._data) > self.size:
+        self._data.popitem(last=False)
+
+  def clear(self):
+    with self._lock:
+      self._data.clear()
+
+
+_local = LRUCache(LRU_SIZE)
+
+
+def _changed_key(table):
+  return f"tablever-changed:{table}"
+
+
+def _versions():
+  # Siempre de la primaria: una réplica atrasada daría una versión vieja
+  return TableVersion.objects.using(DEFAULT_DB_ALIAS)
+
+
+def table_versions(*tables):
+  """Versión actual de cada tabla, en el mismo orden, con una sola consulta"""
+  # Con réplica: si alguna tabla cambió hace poco, lo que se lea para esta
+  # versión tiene que salir de la primaria (ver api/dbrouter.py)
+  if dbrouter.replica_configured():
+    if cache.get_many([_changed_key(table) for table in tables]):
+      dbrouter.read_from_primary()
+  found = dict(_versions().filter(table__in=tables).values_list('table', 'version'))
+  missing = [table for table in tables if table not in found]
+  if missing:
+    # Una versión inicial a partir del reloj: si se vacía api_tableversion
+    # nunca repite una anterior
+    _versions().bulk_create(
+      [TableVersion(table=table, version=time.time_ns()) for table in missing], ignore_conflicts=True
+    )
+    found.update(_versions().filter(table__in=missing).values_list('table', 'version'))
+  return tuple(found[table] for table in tables)
+
+
+def bump_version(table):
+  if not _versions().filter(table=table).update(version=F('version') + 1):
+    try:
+      with transaction.atomic(using=DEFAULT_DB_ALIAS):
+        _versions().create(table=table, version=time.time_ns())
+    except IntegrityError:
+      # Otro proceso la creó primero
+      _versions().filter(table=table).update(version=F('version') + 1)
+  if dbrouter.replica_configured():
+    cache.set(_changed_key(table), True, dbrouter.PIN_SECONDS)
+
+
+def bump_on_commit(table):
+  # Tras confirmar, para que nadie vuelva a guardar en caché datos viejos bajo
+  # la versión nueva
+  transaction.on_commit(lambda: bump_version(table))
+
+
+def cached_json(name, tables, build, versions=None):
+  """
+  Devuelve los bytes JSON de `build()` desde el caché mientras no cambie la
+  versión de ninguna de `tables`. `versions` evita volver a leerlas si ya se
+  conocen.
+  """
+  if versions is None:
+    versions = table_versions(*tables)
+  key = f"refcache:{name}:" + ':'.join(str(v) for v in versions)
+  body = _local.get(key)
+  if body is None:
+    body = cache.get(key)
+    if body is None:
+      body = json.dumps(build(), cls=DjangoJSONEncoder).encode('utf-8')
+      cache.set(key, body, TIMEOUT)
+    _local.set(key, body)
+  return body
+
+
+def cached_json_response(request, name, tables, build):
+  # Las versiones que ya leyó versioned_etag en esta petición, si están todas
+  known = getattr(request, 'table_versions', {})
+  versions = tuple(known[table] for table in tables) if all(table in known for table in tables) else None
+  return HttpResponse(cached_json(name, tables, build, versions), content_type='application/json')
+
+
+def cache_is_shared():
+  """Si lo guardado en el caché de Django llega a todos los procesos"""
+  return not isinstance(caches['default'], (LocMemCache, DummyCache))
+
+
+def versioned_etag(*tables):
+  """
+  Función `etag_func` para django.views.decorators.http.condition: un ETag
+  fuerte calculado a partir de las versiones de `tables` y de la URL pedida,
+  sin construir ni serializar la respuesta. Si coincide con If-None-Match la
+  vista responde 304 sin ejecutarse.
+  """
+  def etag_func(request, *args, **kwargs):
+    versions = table_versions(*tables)
+    # Para que cached_json_response no las consulte otra vez
+    request.table_versions = dict(zip(tables, versions))
+    parts = [request.get_host(), request.get_full_path(), *versions]
+    return hashlib.sha1(repr(parts).encode('utf-8')).hexdigest()
+  return etag_func
+
+
+def versioned_condition(*tables):
+  """
+  condition(etag_func=versioned_etag(*tables)) que sirve también para vistas
+  `async def`: condition() llama a etag_func sin await, así que en ellas las
+  versiones se leen antes con sync_to_async.
+  """
+  etag_func = versioned_etag(*tables)
+
+  def decorator(view):
+    if not iscoroutinefunction(view):
+      return condition(etag_func=etag_func)(view)
+    conditional = condition(etag_func=lambda request, *args, **kwargs: request.versioned_etag)(view)
+
+    @wraps(view)
+    async def inner(request, *args, **kwargs):
+      request.versioned_etag = await sync_to_async(etag_func)(request, *args, **kwargs)
+      return await conditional(request, *args, **kwargs)
+    return inner
+  return decorator
+
+
+def _bump_for_instance(sender, raw=False, **kwargs):
+  if not raw:
+    bump_on_commit(VERSIONED_MODELS[sender])
+
+
+for _model in VERSIONED_MODELS:
+  post_save.connect(_bump_for_instance, sender=_model, dispatch_uid=f'cache-bump-save-{_model.__name__}')
+  post_delete.connect(_bump_for_instance, sender=_model, dispatch_uid=f'cache-bump-delete-{_model.__name__}')
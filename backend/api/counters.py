@@ -0,0 +1,148 @@
+"""
+Contadores materializados del dashboard.
+
+Con INVENTORY_COUNTERS = True la tabla api_inventorycounter se mantiene en la
+misma transacción que cada alta, baja o cambio de estado de un Item, y el
+dashboard la lee con una sola consulta por llave primaria. Al activarlos (o si
+se desincronizan) se reconstruyen con `manage.py rebuild_inventory_counters`.
+"""
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Q
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from api.models import InventoryCounter, Item, Status
+
+TOTAL_KEY = 'total'
+
+# Llave de la respuesta del dashboard -> estado que cuenta (None = todos)
+DASHBOARD_BUCKETS = {
+  'total_items': None,
+  'Disponible': Status.StatusChoices.DISPONIBLE,
+  'Mantenimiento': Status.StatusChoices.MANTENIMIENTO,
+  'no_disponibles': Status.StatusChoices.NO_DISPONIBLE,
+}
+
+
+def enabled():
+  return getattr(settings, 'INVENTORY_COUNTERS', False)
+
+
+def status_key(status_name):
+  return f"status:{status_name.lower()}"
+
+
+def _bucket_key(status_name):
+  return TOTAL_KEY if status_name is None else status_key(status_name)
+
+
+def bump(key, delta):
+  """Suma `delta` al contador `key`, creándolo si no existe"""
+  if not delta:
+    return
+  if InventoryCounter.objects.filter(key=key).update(value=F('value') + delta):
+    return
+  try:
+    with transaction.atomic():
+      InventoryCounter.objects.create(key=key, value=delta)
+  except IntegrityError:
+    # Otro escritor lo creó primero
+    InventoryCounter.objects.filter(key=key).update(value=F('value') + delta)
+
+
+def _status_name(status_id):
+  if status_id is None:
+    return None
+  return Status.objects.filter(pk=status_id).values_list('name', flat=True).first()
+
+
+def bump_status(status_id, delta):
+  name = _status_name(status_id)
+  if name is not None:
+    bump(status_key(name), delta)
+
+
+def aggregate_summary():
+  """Todos los contadores del dashboard en una sola consulta de agregación condicional"""
+  return Item.objects.aggregate(**_summary_aggregates())
+
+
+def _summary_aggregates():
+  return {
+    key: Count('id') if name is None else Count('id', filter=Q(status__name__lower=name.lower()))
+    for key, name in DASHBOARD_BUCKETS.items()
+  }
+
+
+def counter_summary():
+  """Lee los contadores materializados con una consulta por llave primaria"""
+  keys = {key: _bucket_key(name) for key, name in DASHBOARD_BUCKETS.items()}
+  values = dict(
+    InventoryCounter.objects.filter(key__in=keys.values()).values_list('key', 'value')
+  )
+  return {key: values.get(counter_key, 0) for key, counter_key in keys.items()}
+
+
+def dashboard_summary():
+  return counter_summary() if enabled() else aggregate_summary()
+
+
+async def adashboard_summary():
+  """dashboard_summary con la ORM asíncrona"""
+  if not enabled():
+    return await Item.objects.aaggregate(**_summary_aggregates())
+  keys = {key: _bucket_key(name) for key, name in DASHBOARD_BUCKETS.items()}
+  values = {
+    key: value async for key, value in
+    InventoryCounter.objects.filter(key__in=keys.values()).values_list('key', 'value')
+  }
+  return {key: values.get(counter_key, 0) for key, counter_key in keys.items()}
+
+
+@transaction.atomic
+def rebuild():
+  """Recalcula todos los contadores a partir de api_item"""
+  rows = Item.objects.values('status__name').annotate(n=Count('id')).order_by()
+  counters = {TOTAL_KEY: 0}
+  for row in rows:
+    counters[TOTAL_KEY] += row['n']
+    if row['status__name'] is not None:
+      key = status_key(row['status__name'])
+      counters[key] = counters.get(key, 0) + row['n']
+
+  InventoryCounter.objects.all().delete()
+  InventoryCounter.objects.bulk_create(
+    InventoryCounter(key=key, value=value) for key, value in counters.items()
+  )
+  return counters
+
+
+@receiver(post_save, sender=Item)
+def count_item_saved(sender, instance, created, raw=False, **kwargs):
+  if not enabled() or raw:
+    return
+  if created:
+    bump(TOTAL_KEY, 1)
+    bump_status(instance.status_id, 1)
+    return
+  old_status_id = instance.loaded_value('status_id')
+  if old_status_id is not None and old_status_id != instance.status_id:
+    bump_status(old_status_id, -1)
+    bump_status(instance.status_id, 1)
+
+
+@receiver(post_delete, sender=Item)
+def count_item_deleted(sender, instance, **kwargs):
+  if not enabled():
+    return
+  bump(TOTAL_KEY, -1)
+  bump_status(instance.status_id, -1)
+
+
+@receiver(post_save, sender=Status)
+@receiver(post_delete, sender=Status)
+def rebuild_on_status_change(sender, instance, raw=False, **kwargs):
+  # Los contadores van por nombre de estado; renombrar uno exige recalcular
+  if enabled() and not raw:
+    transaction.on_commit(rebuild)
@@ -0,0 +1,185 @@
+"""
+Lecturas en una réplica.
+
+Si settings.DATABASES tiene el alias 'replica', PrimaryReplicaRouter manda a la
+réplica las lecturas de las URLs listadas en DATABASE_REPLICA_URLS (peticiones
+GET/HEAD) y todo lo demás, incluidas todas las escrituras, a 'default'. Sin
+réplica configurada el router siempre responde 'default'.
+
+Leer lo que uno acaba de escribir:
+
+- Dentro de una petición, después de la primera escritura todas las lecturas
+  van a la primaria.
+- Una petición que escribe deja "fijado" a su cliente a la primaria durante
+  DATABASE_REPLICA_PIN_SECONDS, que debe cubrir el retraso de la réplica. El
+  pin viaja con el cliente en una cookie firmada (PIN_COOKIE), así que vale
+  aunque la siguiente petición la atienda otro worker. Para clientes que no
+  devuelven cookies (otro origen sin credenciales) también se guarda en el
+  caché bajo la cabecera Authorization o la cookie de sesión; eso solo cruza
+  procesos con un caché compartido (ver la comprobación api.W001).
+- Las respuestas que dependen de las versiones de tabla (ETag y caché de
+  referencia en api/cache.py) se leen de la primaria mientras alguna de sus
+  tablas haya cambiado hace menos de ese tiempo; si no, la réplica podría
+  devolver datos viejos bajo una versión nueva y quedarían en caché.
+
+Fuera de una petición (run_jobs, comandos de manage.py) todo va a 'default'.
+"""
+import hashlib
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core import checks
+from django.core.cache import cache
+from django.core.signals import request_finished
+from django.db import DEFAULT_DB_ALIAS
+from django.dispatch import receiver
+
+REPLICA = 'replica'
+PIN_SECONDS = getattr(settings, 'DATABASE_REPLICA_PIN_SECONDS', 5)
+REPLICA_URLS = frozenset(getattr(settings, 'DATABASE_REPLICA_URLS', ()))
+PIN_COOKIE = 'dbpin'
+PIN_SALT = 'api.dbrouter.pin'
+
+_state = ContextVar('db_routing', default=None)
+
+
+class RoutingState:
+  """Estado de la petición en curso. Se modifica en sitio para que los cambios
+  hechos en hilos de sync_to_async se vean en el resto de la petición"""
+  def __init__(self):
+    self.use_replica = False
+    self.wrote = False
+
+
+def replica_configured():
+  return REPLICA in settings.DATABASES
+
+
+def read_from_primary():
+  """Manda a la primaria el resto de las lecturas de la petición en curso"""
+  state = _state.get()
+  if state is not None:
+    state.use_replica = False
+
+
+class PrimaryReplicaRouter:
+  def db_for_read(self, model, **hints):
+    state = _state.get()
+    if state is not None and state.use_replica and not state.wrote and replica_configured():
+      return REPLICA
+    return DEFAULT_DB_ALIAS
+
+  def db_for_write(self, model, **hints):
+    state = _state.get()
+    if state is not None:
+      state.wrote = True
+    return DEFAULT_DB_ALIAS
+
+  def allow_relation(self, obj1, obj2, **hints):
+    # Primaria y réplica tienen los mismos datos
+    return True
+
+  def allow_migrate(self, db, app_label, **hints):
+    # La réplica recibe el esquema por replicación
+    return db == DEFAULT_DB_ALIAS
+
+
+def _client_key(request):
+  credential = (
+    request.headers.get('Authorization')
+    or request.COOKIES.get(settings.SESSION_COOKIE_NAME)
+  )
+  if not credential:
+    return None
+  return 'dbpin:' + hashlib.sha1(credential.encode('utf-8')).hexdigest()
+
+
+def _url_name(request):
+  match = getattr(request, 'resolver_match', None)
+  return match.url_name if match is not None else None
+
+
+@receiver(request_finished)
+def _clear_state(sender, **kwargs):
+  # El estado no se quita al salir del middleware porque las respuestas en
+  # flujo siguen leyendo después; request_finished llega al cerrarlas. Bajo
+  # ASGI cada petición tiene su propio contexto y esto no hace falta.
+  _state.set(None)
+
+
+class ReplicaRoutingMiddleware:
+  """
+  Decide por petición si las lecturas pueden ir a la réplica y fija al cliente
+  a la primaria después de escribir. Funciona con vistas síncronas y asíncronas.
+  """
+  sync_capable = True
+  async_capable = True
+
+  def __init__(self, get_response):
+    self.get_response = get_response
+    self.is_async = iscoroutinefunction(get_response)
+    if self.is_async:
+      markcoroutinefunction(self)
+
+  def __call__(self, request):
+    if self.is_async:
+      return self.__acall__(request)
+    state = RoutingState()
+    _state.set(state)
+    response = self.get_response(request)
+    self.finish(request, response, state)
+    return response
+
+  async def __acall__(self, request):
+    state = RoutingState()
+    _state.set(state)
+    response = await self.get_response(request)
+    self.finish(request, response, state)
+    return response
+
+  @staticmethod
+  def pinned(request):
+    signed = request.get_signed_cookie(PIN_COOKIE, default=None, salt=PIN_SALT, max_age=PIN_SECONDS)
+    if signed is not None:
+      return True
+    key = _client_key(request)
+    return key is not None and bool(cache.get(key))
+
+  def process_view(self, request, view_func, view_args, view_kwargs):
+    state = _state.get()
+    if (
+      state is None or not replica_configured()
+      or request.method not in ('GET', 'HEAD')
+      or _url_name(request) not in REPLICA_URLS
+    ):
+      return None
+    state.use_replica = not self.pinned(request)
+    return None
+
+  def finish(self, request, response, state):
+    if not state.wrote or not replica_configured():
+      return
+    response.set_signed_cookie(
+      PIN_COOKIE, '1', salt=PIN_SALT, max_age=PIN_SECONDS,
+      secure=settings.SESSION_COOKIE_SECURE, httponly=True, samesite='Lax',
+    )
+    key = _client_key(request)
+    if key is not None:
+      cache.set(key, True, PIN_SECONDS)
+
+
+@checks.register(checks.Tags.database)
+def check_replica_cache(app_configs, **kwargs):
+  from api.cache import cache_is_shared
+
+  if not replica_configured() or cache_is_shared():
+    return []
+  return [checks.Warning(
+    "Hay una réplica configurada pero el caché por omisión es local al proceso",
+    hint=(
+      "Con varios workers, los pins guardados en el caché y las marcas de tablas recién cambiadas "
+      "no se ven en los demás procesos. Configure un caché compartido (Redis, Memcached) en CACHES."
+    ),
+    id='api.W001',
+  )]
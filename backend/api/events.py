@@ -0,0 +1,417 @@
+"""
+Notificaciones en vivo por Server-Sent Events (GET /notifications/stream/).
+
+Se sirve con inventario.asgi (uvicorn): route() atiende la ruta del canal
+antes de llegar a Django y cada conexión abierta es una corrutina esperando en
+su cola, no un hilo, así que un worker sostiene miles de conexiones ociosas.
+Bajo WSGI (runserver) la ruta responde 503 y el cliente sigue con el sondeo.
+
+- Hub: pub/sub en memoria del proceso. add_notifications() y el alta de una
+  Notification publican al confirmarse la transacción.
+- Las notificaciones creadas en otro proceso (run_jobs, otros workers) llegan
+  por un único sondeo a la base de datos por event loop cada
+  SSE_POLL_INTERVAL segundos, sin importar cuántas conexiones haya.
+- Cada evento lleva el id de la notificación. Al reconectar, EventSource
+  envía Last-Event-ID y se reenvían desde la base de datos las posteriores
+  (hasta SSE_REPLAY_LIMIT; si faltan más se envía `reset` para que el cliente
+  recargue la bandeja).
+- Contrapresión: cada conexión tiene una cola de SSE_QUEUE_SIZE eventos. Si
+  el cliente no la vacía a tiempo se descarta su contenido y la conexión se
+  pone al día desde la base de datos, así que la memoria queda acotada.
+- Un comentario cada SSE_HEARTBEAT_INTERVAL segundos mantiene viva la
+  conexión a través de proxies.
+
+EventSource no puede enviar la cabecera Authorization: el cliente pide un
+ticket firmado de corta duración (POST /notifications/stream/ticket/) y lo
+pasa en ?ticket=. También se acepta "Authorization: Bearer <jwt>".
+"""
+import asyncio
+import io
+import json
+import logging
+import threading
+from collections import OrderedDict, defaultdict
+
+from asgiref.sync import sync_to_async
+from corsheaders.conf import conf as cors_conf
+from django.conf import settings
+from django.core import signing
+from django.core.handlers.asgi import ASGIRequest
+from django.db import connection, transaction
+from django.http import HttpResponse
+from django.urls import reverse
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from rest_framework_simplejwt.authentication import JWTStatelessUserAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+
+from api import metrics
+from api.models import Notification
+
+logger = logging.getLogger(__name__)
+
+HEARTBEAT_INTERVAL = getattr(settings, 'SSE_HEARTBEAT_INTERVAL', 15)
+QUEUE_SIZE = getattr(settings, 'SSE_QUEUE_SIZE', 100)
+REPLAY_LIMIT = getattr(settings, 'SSE_REPLAY_LIMIT', 200)
+# None desactiva el sondeo (un solo proceso, sin run_jobs aparte)
+POLL_INTERVAL = getattr(settings, 'SSE_POLL_INTERVAL', 2)
+TICKET_MAX_AGE = getattr(settings, 'SSE_TICKET_MAX_AGE', 60)
+# Milisegundos que espera EventSource antes de reconectar
+RETRY_MS = 3000
+
+TICKET_SALT = 'api.events.stream'
+# Ids ya enviados que recuerda cada conexión para no repetir eventos que
+# llegan por publicación y por sondeo
+SEEN_IDS = 1000
+# Marca en la cola: se descartaron eventos y hay que releer la base de datos
+RESYNC = object()
+
+
+def event_data(notification):
+  return {
+    'id': notification['id'],
+    'message': notification['message'],
+    'is_read': notification['is_read'],
+    'created_at': notification['created_at'].strftime("%Y-%m-%d %H:%M:%S"),
+  }
+
+
+def format_event(event, data, event_id=None):
+  lines = []
+  if event_id is not None:
+    lines.append(f'id: {event_id}')
+  lines.append(f'event: {event}')
+  lines.append(f'data: {json.dumps(data, ensure_ascii=False)}')
+  return '\n'.join(lines) + '\n\n'
+
+
+class Subscriber:
+  """Una conexión abierta. Solo se toca desde el event loop que la creó"""
+  def __init__(self, user_id, loop, maxsize=QUEUE_SIZE):
+    self.user_id = user_id
+    self.loop = loop
+    self.queue = asyncio.Queue(maxsize)
+    self.overflowed = False
+
+  def offer(self, event):
+    if self.overflowed:
+      return
+    try:
+      self.queue.put_nowait(event)
+    except asyncio.QueueFull:
+      # Cliente lento: se descarta lo pendiente y se relee desde la base
+      self.overflowed = True
+      while not self.queue.empty():
+        self.queue.get_nowait()
+      self.queue.put_nowait(RESYNC)
+
+
+class Hub:
+  """
+  Suscriptores por usuario. publish() se puede llamar desde cualquier hilo
+  (las vistas síncronas corren fuera del event loop).
+  """
+  def __init__(self):
+    self._lock = threading.Lock()
+    self._subscribers = defaultdict(set)
+    # event loop -> (suscriptores en ese loop, tarea de sondeo)
+    self._loops = {}
+
+  def subscribe(self, user_id):
+    loop = asyncio.get_running_loop()
+    subscriber = Subscriber(user_id, loop)
+    with self._lock:
+      self._subscribers[user_id].add(subscriber)
+      count, poller = self._loops.get(loop, (0, None))
+      if poller is None and POLL_INTERVAL:
+        poller = loop.create_task(self._poll(loop))
+      self._loops[loop] = (count + 1, poller)
+    return subscriber
+
+  def unsubscribe(self, subscriber):
+    with self._lock:
+      subscribers = self._subscribers.get(subscriber.user_id)
+      if subscribers is not None:
+        subscribers.discard(subscriber)
+        if not subscribers:
+          del self._subscribers[subscriber.user_id]
+      count, poller = self._loops.pop(subscriber.loop, (1, None))
+      if count > 1:
+        self._loops[subscriber.loop] = (count - 1, poller)
+      elif poller is not None:
+        poller.cancel()
+
+  def subscriber_count(self):
+    with self._lock:
+      return sum(len(subscribers) for subscribers in self._subscribers.values())
+
+  def publish(self, user_id, event):
+    with self._lock:
+      subscribers = list(self._subscribers.get(user_id, ()))
+    for subscriber in subscribers:
+      try:
+        subscriber.loop.call_soon_threadsafe(subscriber.offer, event)
+      except RuntimeError:
+        # El loop ya se cerró; su suscriptor se va a dar de baja
+        pass
+
+  def _deliver_local(self, loop, user_id, event):
+    with self._lock:
+      subscribers = [s for s in self._subscribers.get(user_id, ()) if s.loop is loop]
+    for subscriber in subscribers:
+      subscriber.offer(event)
+
+  async def _poll(self, loop):
+    """Trae las notificaciones creadas por otros procesos"""
+    cursor = await _latest_id()
+    while True:
+      await asyncio.sleep(POLL_INTERVAL)
+      with self._lock:
+        users = {user_id for user_id, subscribers in self._subscribers.items()
+                 if any(s.loop is loop for s in subscribers)}
+      try:
+        rows = await _rows_after(cursor)
+      except Exception:
+        logger.exception("Error al consultar notificaciones nuevas")
+        continue
+      for row in rows:
+        cursor = max(cursor, row['id'])
+        if row['user_id'] in users:
+          self._deliver_local(loop, row['user_id'], event_data(row))
+
+
+hub = Hub()
+
+
+def publish_on_commit(notifications):
+  """Publica `notifications` (instancias guardadas) cuando se confirme la transacción"""
+  events = [
+    (n.user_id, event_data({'id': n.pk, 'message': n.message, 'is_read': n.is_read, 'created_at': n.created_at}))
+    for n in notifications if n.pk is not None
+  ]
+  if not events:
+    return
+
+  def publish():
+    for user_id, event in events:
+      hub.publish(user_id, event)
+  transaction.on_commit(publish)
+
+
+# Lecturas de la base de datos (desde el event loop, en el hilo de la ORM)
+
+COLUMNS = ('id', 'user_id', 'message', 'is_read', 'created_at')
+
+
+def _check_connection():
+  # Lo que Django hace al empezar cada petición: descartar una conexión caída
+  # o vencida (CONN_MAX_AGE). Dentro de una transacción (pruebas) no se toca.
+  if not connection.in_atomic_block:
+    connection.close_if_unusable_or_obsolete()
+
+
+@sync_to_async
+def _latest_id():
+  _check_connection()
+  return Notification.objects.order_by('-id').values_list('id', flat=True).first() or 0
+
+
+@sync_to_async
+def _rows_after(cursor, limit=1000):
+  _check_connection()
+  return list(Notification.objects.filter(id__gt=cursor).order_by('id').values(*COLUMNS)[:limit])
+
+
+@sync_to_async
+def _user_rows_after(user_id, last_id, limit):
+  _check_connection()
+  return list(
+    Notification.objects.filter(user_id=user_id, id__gt=last_id).order_by('id').values(*COLUMNS)[:limit]
+  )
+
+
+# Autenticación sin consultas a la base de datos
+
+def make_ticket(user_id):
+  return signing.dumps(user_id, salt=TICKET_SALT)
+
+
+def stream_user_id(request):
+  """Id del usuario del ticket o del JWT; None si no hay credenciales válidas"""
+  ticket = request.GET.get('ticket')
+  if ticket:
+    try:
+      return signing.loads(ticket, salt=TICKET_SALT, max_age=TICKET_MAX_AGE)
+    except signing.BadSignature:
+      return None
+  try:
+    result = JWTStatelessUserAuthentication().authenticate(request)
+  except (AuthenticationFailed, InvalidToken):
+    return None
+  return int(result[0].id) if result else None
+
+
+def last_event_id(request):
+  value = request.headers.get('Last-Event-ID') or request.GET.get('last_event_id')
+  try:
+    return int(value) if value else None
+  except ValueError:
+    return None
+
+
+# Canal SSE
+
+async def _event_stream(user_id, last_id):
+  seen = OrderedDict()
+
+  def send(data):
+    seen[data['id']] = None
+    if len(seen) > SEEN_IDS:
+      seen.popitem(last=False)
+    return format_event('notification', data, data['id'])
+
+  async def replay(after):
+    # Devuelve (texto, último id); `reset` si hay más de las que se reenvían
+    rows = await _user_rows_after(user_id, after, REPLAY_LIMIT + 1)
+    if len(rows) > REPLAY_LIMIT:
+      latest = rows[-1]['id']
+      return format_event('reset', {'latest_id': latest}, latest), latest
+    chunks = [send(event_data(row)) for row in rows]
+    return ''.join(chunks), rows[-1]['id'] if rows else after
+
+  # Se suscribe al empezar a enviar: si el cliente se va antes, no queda nada
+  # que dar de baja
+  subscriber = hub.subscribe(user_id)
+  try:
+    yield f'retry: {RETRY_MS}\n\n'
+    if last_id is None:
+      # Sin punto de partida: lo que se cree desde ahora. El id más reciente
+      # sirve para reenviar lo que se pierda en un RESYNC.
+      last_id = await _latest_id()
+    else:
+      text, last_id = await replay(last_id)
+      if text:
+        yield text
+    while True:
+      try:
+        event = await asyncio.wait_for(subscriber.queue.get(), HEARTBEAT_INTERVAL)
+      except asyncio.TimeoutError:
+        yield ': ping\n\n'
+        continue
+      if event is RESYNC:
+        subscriber.overflowed = False
+        text, last_id = await replay(last_id)
+        if text:
+          yield text
+        continue
+      if event['id'] in seen:
+        continue
+      last_id = max(last_id, event['id'])
+      yield send(event)
+  finally:
+    hub.unsubscribe(subscriber)
+
+
+def _cors_headers(request):
+  origin = request.headers.get('Origin')
+  if not origin:
+    return []
+  if not (cors_conf.CORS_ALLOW_ALL_ORIGINS or origin in cors_conf.CORS_ALLOWED_ORIGINS):
+    return []
+  headers = [(b'access-control-allow-origin', origin.encode('latin-1')), (b'vary', b'origin')]
+  if cors_conf.CORS_ALLOW_CREDENTIALS:
+    headers.append((b'access-control-allow-credentials', b'true'))
+  return headers
+
+
+async def _respond(send, status, headers=(), body=b''):
+  await send({'type': 'http.response.start', 'status': status, 'headers': list(headers)})
+  await send({'type': 'http.response.body', 'body': body})
+
+
+async def _until_disconnect(receive):
+  while (await receive())['type'] != 'http.disconnect':
+    pass
+
+
+async def stream_application(scope, receive, send):
+  """
+  Aplicación ASGI del canal, fuera del manejador de Django: este abre un
+  ThreadSensitiveContext por petición y los receptores síncronos de
+  request_started dejan un hilo reservado mientras la respuesta siga abierta.
+  Aquí la conexión solo es una corrutina; las lecturas a la base de datos
+  pasan por el hilo compartido de sync_to_async.
+  """
+  request = ASGIRequest(scope, io.BytesIO())
+  cors = _cors_headers(request)
+  if request.method == 'OPTIONS':
+    await _respond(send, 200, [
+      *cors,
+      (b'access-control-allow-methods', b'GET, OPTIONS'),
+      (b'access-control-allow-headers', b'authorization, last-event-id'),
+      (b'access-control-max-age', str(cors_conf.CORS_PREFLIGHT_MAX_AGE).encode()),
+    ])
+    return
+  if request.method != 'GET':
+    await _respond(send, 405, [*cors, (b'allow', b'GET, OPTIONS')])
+    return
+  user_id = stream_user_id(request)
+  if user_id is None:
+    await _respond(send, 401, cors)
+    return
+
+  await send({'type': 'http.response.start', 'status': 200, 'headers': [
+    *cors,
+    (b'content-type', b'text/event-stream; charset=utf-8'),
+    (b'cache-control', b'no-cache'),
+    # nginx no debe acumular la respuesta antes de enviarla
+    (b'x-accel-buffering', b'no'),
+  ]})
+
+  async def pump():
+    shard = metrics.registry.shard()
+    shard.inc('notifications_stream_connections', ())
+    try:
+      async for chunk in _event_stream(user_id, last_event_id(request)):
+        await send({'type': 'http.response.body', 'body': chunk.encode('utf-8'), 'more_body': True})
+    finally:
+      shard.inc('notifications_stream_connections', (), -1)
+
+  tasks = [asyncio.ensure_future(pump()), asyncio.ensure_future(_until_disconnect(receive))]
+  try:
+    done, pending = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+  finally:
+    # El cliente se fue (o el servidor se detiene): se cierra el generador
+    for task in tasks:
+      task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+  for task in done:
+    error = None if task.cancelled() else task.exception()
+    # OSError: el cliente cortó mientras se le escribía
+    if error is not None and not isinstance(error, OSError):
+      raise error
+
+
+def route(django_application):
+  """Aplicación ASGI que atiende el canal y pasa todo lo demás a Django"""
+  stream_path = reverse('notifications-stream')
+
+  async def application(scope, receive, send):
+    if scope['type'] == 'http' and scope['path'] == stream_path:
+      await stream_application(scope, receive, send)
+    else:
+      await django_application(scope, receive, send)
+  return application
+
+
+def stream_unavailable(request):
+  # Solo se llega aquí cuando el proyecto no corre con inventario.asgi
+  return HttpResponse("El canal en vivo requiere el servidor ASGI", status=503)
+
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def stream_ticket(request):
+  return Response({'ticket': make_ticket(request.user.id), 'expires_in': TICKET_MAX_AGE})
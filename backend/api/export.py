@@ -0,0 +1,130 @@
+"""
+Exportación en flujo del inventario y del historial de stock.
+
+Las filas se leen con values_list().iterator() en una sola pasada ordenada por
+llave primaria (sin instanciar modelos ni ordenar en memoria) y se escriben
+como CSV o JSONL en bloques de ~64 KB, opcionalmente comprimidos con gzip. La
+memoria usada no depende del número de filas.
+"""
+import csv
+import zlib
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+
+from api.models import Item, StockHistory
+from api.streaming import STREAM_BUFFER_SIZE, STREAM_CHUNK_SIZE
+
+FORMATS = ('csv', 'jsonl')
+
+# (columna exportada, campo para values_list)
+ITEM_COLUMNS = (
+  ('id', 'id'),
+  ('name', 'name'),
+  ('description', 'description'),
+  ('category', 'category__name'),
+  ('location', 'location__name'),
+  ('status', 'status__name'),
+  ('stock', 'stock'),
+  ('min_stock', 'min_stock'),
+  ('qr_code', 'qr_code'),
+  ('responsible_user', 'responsible_user__username'),
+  ('created_at', 'created_at'),
+)
+
+STOCK_HISTORY_COLUMNS = (
+  ('id', 'id'),
+  ('item_id', 'item_id'),
+  ('item', 'item__name'),
+  ('action', 'action'),
+  ('quantity', 'quantity'),
+  ('old_stock', 'old_stock'),
+  ('new_stock', 'new_stock'),
+  ('user', 'user'),
+  ('date', 'date'),
+)
+
+CONTENT_TYPES = {
+  'csv': 'text/csv; charset=utf-8',
+  'jsonl': 'application/x-ndjson',
+}
+
+
+class _Echo:
+  """Pseudo-archivo para csv.writer: devuelve la línea en vez de guardarla"""
+  def write(self, value):
+    return value
+
+
+def item_rows():
+  fields = [field for _, field in ITEM_COLUMNS]
+  return Item.objects.order_by('id').values_list(*fields).iterator(chunk_size=STREAM_CHUNK_SIZE)
+
+
+def stock_history_rows(item_id=None):
+  fields = [field for _, field in STOCK_HISTORY_COLUMNS]
+  rows = StockHistory.objects.order_by('id')
+  if item_id is not None:
+    rows = rows.filter(item_id=item_id)
+  return rows.values_list(*fields).iterator(chunk_size=STREAM_CHUNK_SIZE)
+
+
+def _csv_value(value):
+  if hasattr(value, 'isoformat'):
+    return value.isoformat()
+  return value
+
+
+def iter_csv(columns, rows):
+  writer = csv.writer(_Echo())
+  yield writer.writerow([name for name, _ in columns])
+  for row in rows:
+    yield writer.writerow([_csv_value(value) for value in row])
+
+
+def iter_jsonl(columns, rows):
+  names = [name for name, _ in columns]
+  encoder = DjangoJSONEncoder(ensure_ascii=False)
+  for row in rows:
+    yield encoder.encode(dict(zip(names, row))) + '\n'
+
+
+def _buffered(lines):
+  # Agrupa líneas en bloques para no entregar al servidor un write por fila
+  buffer = []
+  size = 0
+  for line in lines:
+    data = line.encode('utf-8')
+    buffer.append(data)
+    size += len(data)
+    if size >= STREAM_BUFFER_SIZE:
+      yield b''.join(buffer)
+      buffer = []
+      size = 0
+  if buffer:
+    yield b''.join(buffer)
+
+
+def _gzipped(chunks):
+  compressor = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+  for chunk in chunks:
+    data = compressor.compress(chunk)
+    if data:
+      yield data
+  yield compressor.flush()
+
+
+def export_response(name, columns, rows, fmt='csv', gzip=False):
+  lines = iter_csv(columns, rows) if fmt == 'csv' else iter_jsonl(columns, rows)
+  chunks = _buffered(lines)
+  filename = f"{name}-{timezone.localdate():%Y%m%d}.{fmt}"
+  content_type = CONTENT_TYPES[fmt]
+  if gzip:
+    chunks = _gzipped(chunks)
+    filename += '.gz'
+    content_type = 'application/gzip'
+
+  response = StreamingHttpResponse(chunks, content_type=content_type)
+  response['Content-Disposition'] = f'attachment; filename="{filename}"'
+  return response
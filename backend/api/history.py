@@ -0,0 +1,281 @@
+"""
+Historial de stock de un ítem: movimientos paginados y totales por día o semana.
+
+api_stockdaily guarda por ítem y día (en TIME_ZONE) las entradas, las salidas,
+la cantidad de movimientos y el stock al cierre. Un gráfico de un año lee a lo
+sumo 366 filas por el índice (item, day), sin importar cuántos movimientos
+tenga el ítem. Se mantiene en la misma transacción que cada movimiento:
+
+- StockHistory.objects.create(): receptor de este módulo
+- bulk_create no emite señales: llamar a record() con las filas creadas
+
+Los días sin movimientos no tienen fila: su stock es el cierre del día
+anterior. Si la tabla se desincroniza (SQL directo, borrado de movimientos) se
+recalcula con `manage.py rebuild_stock_rollups`.
+"""
+import sqlite3
+from collections import OrderedDict
+from datetime import datetime, time, timedelta, timezone as dt_timezone
+
+from django.db import IntegrityError, connections, router, transaction
+from django.db.models import Case, Count, F, Q, Sum, Value, When, Window
+from django.db.models.functions import Greatest, RowNumber, TruncDate
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from api.models import StockDaily, StockHistory
+from api.pagination import keyset_page
+
+GROUPS = ('day', 'week')
+# Rango por omisión de la vista agregada
+DEFAULT_DAYS = 365
+REBUILD_CHUNK = 2000
+# Días por INSERT en record(): 7 parámetros cada uno, bajo el límite de 999 de SQLite
+UPSERT_BATCH = 100
+
+PAGE_FIELDS = ('-date', '-id')
+ROW_FIELDS = ('id', 'action', 'quantity', 'old_stock', 'new_stock', 'user', 'date')
+
+
+# Mantenimiento
+
+def _supports_upsert(connection):
+  if connection.vendor == 'postgresql':
+    return True
+  if connection.vendor == 'sqlite':
+    return sqlite3.sqlite_version_info >= (3, 24, 0)
+  return False
+
+
+def _upsert_days(connection, days):
+  """Un INSERT ... ON CONFLICT DO UPDATE por cada UPSERT_BATCH días"""
+  table = connection.ops.quote_name(StockDaily._meta.db_table)
+  adapt_day = connection.ops.adapt_datefield_value
+  adapt_moment = connection.ops.adapt_datetimefield_value
+  rows = list(days.items())
+  for start in range(0, len(rows), UPSERT_BATCH):
+    batch = rows[start:start + UPSERT_BATCH]
+    params = []
+    for (item_id, day), total in batch:
+      params += [
+        item_id, adapt_day(day), total['stock_in'], total['stock_out'], total['movements'],
+        total['closing_stock'], adapt_moment(total['closing_at']),
+      ]
+    values = ', '.join(['(%s, %s, %s, %s, %s, %s, %s)'] * len(batch))
+    # El movimiento más reciente define el cierre; ante empate, el nuevo
+    newer = f"excluded.closing_at >= {table}.closing_at"
+    sql = (
+      f"INSERT INTO {table} (item_id, day, stock_in, stock_out, movements, closing_stock, closing_at) "
+      f"VALUES {values} ON CONFLICT (item_id, day) DO UPDATE SET "
+      f"stock_in = {table}.stock_in + excluded.stock_in, "
+      f"stock_out = {table}.stock_out + excluded.stock_out, "
+      f"movements = {table}.movements + excluded.movements, "
+      f"closing_stock = CASE WHEN {newer} THEN excluded.closing_stock ELSE {table}.closing_stock END, "
+      f"closing_at = CASE WHEN {newer} THEN excluded.closing_at ELSE {table}.closing_at END"
+    )
+    with connection.cursor() as cursor:
+      cursor.execute(sql, params)
+
+
+def _bump_day(item_id, day, stock_in, stock_out, movements, closing_stock, closing_at):
+  """Lo mismo que _upsert_days con la ORM, para motores sin ON CONFLICT"""
+  updated = StockDaily.objects.filter(item_id=item_id, day=day).update(
+    stock_in=F('stock_in') + stock_in,
+    stock_out=F('stock_out') + stock_out,
+    movements=F('movements') + movements,
+    # Las dos expresiones ven los valores anteriores de la fila
+    closing_stock=Case(
+      When(closing_at__lte=closing_at, then=Value(closing_stock)),
+      default=F('closing_stock'),
+    ),
+    closing_at=Greatest(F('closing_at'), Value(closing_at)),
+  )
+  if updated:
+    return
+  try:
+    with transaction.atomic():
+      StockDaily.objects.create(
+        item_id=item_id, day=day, stock_in=stock_in, stock_out=stock_out,
+        movements=movements, closing_stock=closing_stock, closing_at=closing_at,
+      )
+  except IntegrityError:
+    # Otro escritor creó el día primero
+    _bump_day(item_id, day, stock_in, stock_out, movements, closing_stock, closing_at)
+
+
+def record(entries):
+  """
+  Suma los movimientos `entries` (StockHistory ya guardados) a sus días. Con
+  SQLite y PostgreSQL es una sola consulta aunque sean muchos ítems.
+  """
+  days = OrderedDict()
+  for entry in entries:
+    key = (entry.item_id, timezone.localdate(entry.date))
+    total = days.setdefault(key, {'stock_in': 0, 'stock_out': 0, 'movements': 0, 'closing_at': None})
+    if entry.action == 'add':
+      total['stock_in'] += entry.quantity
+    else:
+      total['stock_out'] += entry.quantity
+    total['movements'] += 1
+    # En un lote varias filas comparten fecha: gana la última de la lista
+    if total['closing_at'] is None or entry.date >= total['closing_at']:
+      total['closing_at'] = entry.date
+      total['closing_stock'] = entry.new_stock
+  if not days:
+    return
+
+  connection = connections[router.db_for_write(StockDaily)]
+  if _supports_upsert(connection):
+    _upsert_days(connection, days)
+  else:
+    for (item_id, day), total in days.items():
+      _bump_day(item_id, day, **total)
+
+
+@receiver(post_save, sender=StockHistory)
+def _history_created(sender, instance, created, raw=False, **kwargs):
+  if created and not raw:
+    record([instance])
+
+
+def rebuild_daily(item_ids=None, history_model=StockHistory, daily_model=StockDaily):
+  """
+  Recalcula api_stockdaily desde el historial, por bloques de ítems. Devuelve
+  cuántas filas escribió. La migración 0010 la llama con los modelos
+  históricos.
+  """
+  history = history_model.objects.all()
+  if item_ids is not None:
+    history = history.filter(item_id__in=item_ids)
+  chunk_ids = list(history.order_by('item_id').values_list('item_id', flat=True).distinct())
+
+  written = 0
+  with transaction.atomic():
+    stale = daily_model.objects.all()
+    if item_ids is not None:
+      stale = stale.filter(item_id__in=item_ids)
+    stale.delete()
+    for start in range(0, len(chunk_ids), REBUILD_CHUNK):
+      chunk = history_model.objects.filter(item_id__in=chunk_ids[start:start + REBUILD_CHUNK])
+      chunk = chunk.annotate(day=TruncDate('date'))
+      totals = chunk.values('item_id', 'day').annotate(
+        stock_in=Sum('quantity', filter=Q(action='add'), default=0),
+        stock_out=Sum('quantity', filter=~Q(action='add'), default=0),
+        movements=Count('id'),
+      ).order_by()
+      # Último movimiento de cada día: define el stock al cierre
+      closings = {
+        (row['item_id'], row['day']): row
+        for row in chunk.annotate(
+          position=Window(
+            RowNumber(), partition_by=[F('item_id'), F('day')], order_by=[F('date').desc(), F('id').desc()],
+          ),
+        ).filter(position=1).values('item_id', 'day', 'new_stock', 'date')
+      }
+      rows = []
+      for total in totals:
+        closing = closings[(total['item_id'], total['day'])]
+        rows.append(daily_model(
+          closing_stock=closing['new_stock'], closing_at=closing['date'], **total
+        ))
+      daily_model.objects.bulk_create(rows, batch_size=1000)
+      written += len(rows)
+  return written
+
+
+# Lectura
+
+def parse_bound(value, end=False):
+  """
+  Fecha (YYYY-MM-DD, día completo en TIME_ZONE) o fecha y hora ISO 8601.
+  Con `end` una fecha sola incluye todo ese día. None si no viene.
+  """
+  if not value:
+    return None
+  # parse_datetime también acepta una fecha sola: se prueba primero como fecha
+  try:
+    day = parse_date(value)
+    moment = parse_datetime(value) if day is None else None
+  except ValueError:
+    day = moment = None
+  try:
+    if day is not None:
+      moment = datetime.combine(day + timedelta(days=1) if end else day, time.min)
+    elif moment is None:
+      raise ValueError(f"Fecha inválida: {value}")
+    if timezone.is_naive(moment):
+      moment = timezone.make_aware(moment)
+    # En UTC, como se guarda: falla aquí y no en la consulta si se sale del rango
+    moment = moment.astimezone(dt_timezone.utc)
+  except OverflowError:
+    # p. ej. el día siguiente a 9999-12-31
+    raise ValueError(f"Fecha inválida: {value}")
+  return moment
+
+
+def history_page(item_id, since=None, until=None, cursor=None, limit=None):
+  """(movimientos del más reciente al más antiguo, siguiente cursor)"""
+  rows = StockHistory.objects.filter(item_id=item_id)
+  if since is not None:
+    rows = rows.filter(date__gte=since)
+  if until is not None:
+    rows = rows.filter(date__lt=until)
+  return keyset_page(
+    rows.values(*ROW_FIELDS), PAGE_FIELDS, cursor=cursor, limit=limit, datetime_fields=('date',)
+  )
+
+
+def _period_start(day, group):
+  return day - timedelta(days=day.weekday()) if group == 'week' else day
+
+
+def aggregated(item_id, since=None, until=None, group='day'):
+  """
+  Totales por día o semana (desde el lunes) entre `since` y `until`
+  (exclusivo), más el stock al abrir el rango. Sin `until` llega hasta el final
+  de hoy y sin `since` abarca DEFAULT_DAYS días. Se lee solo de api_stockdaily.
+  """
+  if until is None:
+    until = timezone.make_aware(datetime.combine(timezone.localdate() + timedelta(days=1), time.min))
+  try:
+    if since is None:
+      since = until - timedelta(days=DEFAULT_DAYS)
+    if since >= until:
+      raise ValueError("'from' debe ser anterior a 'to'")
+    first_day = timezone.localdate(since)
+    # `until` exclusivo: el último día es el anterior si cae justo a medianoche
+    last_day = timezone.localdate(until - timedelta(microseconds=1))
+  except OverflowError:
+    raise ValueError("Rango de fechas fuera de los límites")
+  days = StockDaily.objects.filter(item_id=item_id, day__gte=first_day, day__lte=last_day).order_by('day')
+
+  periods = OrderedDict()
+  for row in days.values('day', 'stock_in', 'stock_out', 'movements', 'closing_stock'):
+    start = _period_start(row['day'], group)
+    period = periods.get(start)
+    if period is None:
+      period = periods[start] = {'period': start, 'in': 0, 'out': 0, 'movements': 0}
+    period['in'] += row['stock_in']
+    period['out'] += row['stock_out']
+    period['movements'] += row['movements']
+    period['closing_stock'] = row['closing_stock']
+  results = list(periods.values())
+
+  previous = (
+    StockDaily.objects.filter(item_id=item_id, day__lt=first_day)
+    .order_by('-day').values_list('closing_stock', flat=True).first()
+  )
+  if previous is None and results:
+    # Sin días anteriores: el stock antes del primer movimiento del rango
+    first = results[0]
+    previous = first['closing_stock'] - first['in'] + first['out']
+  return {
+    'group': group,
+    'from': first_day,
+    'to': last_day,
+    'opening_stock': previous,
+    'results': results,
+  }
+
@@ -0,0 +1,197 @@
+"""
+Imágenes de ítems con almacenamiento por contenido y miniaturas.
+
+- El archivo original se guarda como items/<hh>/<sha256>.<ext>: subir dos veces
+  la misma imagen la almacena una sola vez.
+- Las variantes (list, detail) se generan en la cola de trabajos, fuera de la
+  petición. Mientras no existan se sirve el original.
+- StoredImage.ref_count cuenta los ítems que usan cada imagen; al llegar a
+  cero un trabajo borra los archivos.
+"""
+import hashlib
+import io
+import logging
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.db.models import F
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
+from PIL import Image, UnidentifiedImageError
+
+from api import jobs
+from api.cache import bump_on_commit
+from api.models import Item, StoredImage
+
+logger = logging.getLogger(__name__)
+
+# Variante -> tamaño máximo (ancho, alto); "original" es el archivo subido
+VARIANTS = {
+  'list': (240, 240),
+  'detail': (1024, 1024),
+}
+THUMBNAIL_FORMAT = 'WEBP'
+THUMBNAIL_QUALITY = 80
+
+_EXTENSIONS = {
+  'JPEG': '.jpg',
+  'PNG': '.png',
+  'GIF': '.gif',
+  'WEBP': '.webp',
+  'BMP': '.bmp',
+}
+
+
+class InvalidImage(ValueError):
+  pass
+
+
+def _digest(upload):
+  sha = hashlib.sha256()
+  for chunk in upload.chunks():
+    sha.update(chunk)
+  upload.seek(0)
+  return sha.hexdigest()
+
+
+def _image_format(upload):
+  try:
+    with Image.open(upload) as image:
+      image.verify()
+      image_format = image.format
+  except Image.DecompressionBombError:
+    # No hereda de OSError: sin esto un archivo con demasiados píxeles da 500
+    raise InvalidImage("La imagen tiene demasiados píxeles")
+  except (UnidentifiedImageError, OSError, SyntaxError):
+    raise InvalidImage("El archivo no es una imagen válida")
+  finally:
+    upload.seek(0)
+  if image_format not in _EXTENSIONS:
+    raise InvalidImage(f"Formato de imagen no soportado: {image_format}")
+  return image_format
+
+
+def original_name(digest, image_format):
+  return f"items/{digest[:2]}/{digest}{_EXTENSIONS[image_format]}"
+
+
+def variant_name(digest, variant):
+  return f"items/thumbs/{digest[:2]}/{digest}_{variant}.{THUMBNAIL_FORMAT.lower()}"
+
+
+def _save_exact(name, content):
+  # Si dos subidas iguales llegan a la vez, el storage le da otro nombre a la
+  # segunda copia: se descarta porque el contenido ya está en `name`
+  if default_storage.exists(name):
+    return
+  saved = default_storage.save(name, content)
+  if saved != name:
+    default_storage.delete(saved)
+
+
+def store_upload(upload):
+  """Guarda el archivo (si su contenido no existía) y devuelve su StoredImage"""
+  image_format = _image_format(upload)
+  digest = _digest(upload)
+  name = original_name(digest, image_format)
+  _save_exact(name, upload)
+
+  stored, created = StoredImage.objects.get_or_create(digest=digest, defaults={'original': name})
+  if created or not stored.variants:
+    jobs.enqueue('api.tasks.generate_image_variants', args=[stored.id], priority=5)
+  return stored
+
+
+def attach(item, upload):
+  """
+  Asigna la imagen subida al ítem (sin guardarlo) y ajusta los contadores de
+  referencias. Debe llamarse dentro de una transacción junto con item.save().
+  """
+  stored = store_upload(upload)
+  if not StoredImage.objects.filter(pk=stored.pk).update(ref_count=F('ref_count') + 1):
+    # collect() borró la fila (y sus archivos) entre get_or_create y el
+    # incremento: store_upload vuelve a guardar el archivo y crea otra
+    stored = store_upload(upload)
+    StoredImage.objects.filter(pk=stored.pk).update(ref_count=F('ref_count') + 1)
+  previous = item.stored_image_id
+  item.stored_image = stored
+  item.image.name = stored.original
+  if previous:
+    release(previous)
+
+
+def detach(item):
+  """Quita la imagen del ítem (sin guardarlo) y libera su referencia"""
+  previous = item.stored_image_id
+  item.stored_image = None
+  item.image = None
+  if previous:
+    release(previous)
+
+
+def release(stored_image_id):
+  StoredImage.objects.filter(pk=stored_image_id, ref_count__gt=0).update(ref_count=F('ref_count') - 1)
+  # El trabajo vuelve a comprobar el contador antes de borrar nada
+  if StoredImage.objects.filter(pk=stored_image_id, ref_count=0).exists():
+    jobs.enqueue('api.tasks.collect_image', args=[stored_image_id])
+
+
+def generate_variants(stored_image_id):
+  stored = StoredImage.objects.filter(pk=stored_image_id).first()
+  if stored is None:
+    return
+
+  variants = {}
+  with default_storage.open(stored.original, 'rb') as source:
+    with Image.open(source) as original:
+      original.load()
+      for variant, size in VARIANTS.items():
+        image = original.copy()
+        image.thumbnail(size)
+        if image.mode not in ('RGB', 'RGBA'):
+          image = image.convert('RGBA')
+        buffer = io.BytesIO()
+        image.save(buffer, THUMBNAIL_FORMAT, quality=THUMBNAIL_QUALITY)
+        name = variant_name(stored.digest, variant)
+        if default_storage.exists(name):
+          default_storage.delete(name)
+        default_storage.save(name, ContentFile(buffer.getvalue()))
+        variants[variant] = name
+
+  StoredImage.objects.filter(pk=stored.pk).update(variants=variants)
+  # Las URLs de los listados cambian del original a la miniatura
+  bump_on_commit('item')
+
+
+@transaction.atomic
+def collect(stored_image_id):
+  """Borra los archivos de una imagen que ya no usa ningún ítem"""
+  stored = StoredImage.objects.select_for_update().filter(pk=stored_image_id, ref_count=0).first()
+  if stored is None or Item.objects.filter(stored_image_id=stored_image_id).exists():
+    return
+  stored.delete()
+  # Con la fila todavía bloqueada: un attach() concurrente espera, ve que la
+  # fila ya no existe y vuelve a guardar el archivo sin que este borrado lo pise
+  for name in [stored.original, *stored.variants.values()]:
+    if default_storage.exists(name):
+      default_storage.delete(name)
+
+
+def image_urls(request, item):
+  """URLs absolutas del original y de cada variante (None si no hay imagen)"""
+  if not item.image:
+    return None
+  original = request.build_absolute_uri(item.image.url)
+  urls = {'original': original}
+  variants = item.stored_image.variants if item.stored_image_id and item.stored_image else {}
+  for variant in VARIANTS:
+    name = variants.get(variant)
+    urls[variant] = request.build_absolute_uri(default_storage.url(name)) if name else original
+  return urls
+
+
+@receiver(post_delete, sender=Item)
+def release_deleted_item_image(sender, instance, **kwargs):
+  if instance.stored_image_id:
+    release(instance.stored_image_id)
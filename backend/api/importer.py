@@ -0,0 +1,333 @@
+"""
+Importación masiva de ítems desde CSV o JSONL.
+
+El archivo se lee como flujo, fila por fila, y se inserta en bloques de
+`chunk_size` con bulk_create, cada bloque dentro de su propia transacción (o
+savepoint si ya hay una abierta). Las categorías y ubicaciones se resuelven
+por nombre con mapas en memoria y las que faltan se crean en bloque. Los
+efectos de post_save que bulk_create no dispara (alertas de bajo stock,
+contadores del dashboard, versiones de caché) se aplican una vez por bloque.
+
+Columnas: name, description, category, location, status, stock, min_stock,
+qr_code, responsible_user (username). Solo name, category y location son
+obligatorias.
+
+El archivo debe estar en UTF-8. Si a mitad del archivo aparece un byte que no
+lo es, la importación se detiene con ImportFormatError; las filas leídas hasta
+ahí quedan insertadas y el resumen del importador dice cuántas.
+"""
+import csv
+import io
+import json
+from collections import Counter
+
+from django.db import DatabaseError, transaction
+
+from api import counters, jobs
+from api.cache import bump_on_commit
+from api.models import Category, Item, Location, Status, User
+
+FORMATS = ('csv', 'jsonl')
+DEFAULT_CHUNK_SIZE = 1000
+MAX_REPORTED_ERRORS = 1000
+# Mayor valor de un IntegerField/PositiveIntegerField en todos los motores
+MAX_INTEGER = 2 ** 31 - 1
+# Errores al insertar que se atribuyen a filas del bloque y no detienen la importación
+INSERT_ERRORS = (DatabaseError, OverflowError)
+
+
+class ImportFormatError(ValueError):
+  pass
+
+
+def detect_format(filename):
+  name = (filename or '').lower()
+  if name.endswith('.jsonl') or name.endswith('.ndjson'):
+    return 'jsonl'
+  return 'csv'
+
+
+def _text_stream(fileobj):
+  if isinstance(fileobj, io.TextIOBase):
+    return fileobj
+  return io.TextIOWrapper(fileobj, encoding='utf-8-sig', newline='')
+
+
+def iter_rows(fileobj, fmt):
+  """Genera (número_de_fila, dict) sin cargar el archivo completo"""
+  if fmt not in FORMATS:
+    raise ImportFormatError(f"Formato no soportado: {fmt}")
+  text = _text_stream(fileobj)
+  number = 0
+  try:
+    for number, row in _parse(text, fmt):
+      yield number, row
+  except UnicodeDecodeError:
+    where = f" (después de la fila {number})" if number else ""
+    raise ImportFormatError(f"El archivo no está codificado en UTF-8{where}")
+
+
+def _parse(text, fmt):
+  if fmt == 'csv':
+    reader = csv.DictReader(text)
+    if not reader.fieldnames or 'name' not in reader.fieldnames:
+      raise ImportFormatError("El CSV debe tener encabezado con al menos la columna 'name'")
+    # La fila 1 es el encabezado
+    for number, row in enumerate(reader, start=2):
+      yield number, row
+    return
+
+  for number, line in enumerate(text, start=1):
+    line = line.strip()
+    if not line:
+      continue
+    try:
+      row = json.loads(line)
+    except json.JSONDecodeError:
+      yield number, None
+      continue
+    yield number, row if isinstance(row, dict) else None
+
+
+def _clean(value):
+  if value is None:
+    return ''
+  return str(value).strip()
+
+
+def _integer(value, default, minimum, field, errors):
+  value = _clean(value)
+  if value == '':
+    return default
+  try:
+    number = int(value)
+  except ValueError:
+    errors.append(f"{field} debe ser un número entero")
+    return None
+  if number < minimum:
+    errors.append(f"{field} debe ser mayor o igual a {minimum}")
+    return None
+  if number > MAX_INTEGER:
+    errors.append(f"{field} debe ser menor o igual a {MAX_INTEGER}")
+    return None
+  return number
+
+
+class ItemImporter:
+  def __init__(self, chunk_size=DEFAULT_CHUNK_SIZE, create_missing=True, progress=None):
+    self.chunk_size = max(1, chunk_size)
+    self.create_missing = create_missing
+    self.progress = progress
+    self.rows_read = 0
+    self.created = 0
+    self.failed = 0
+    self.errors = []
+    self.created_categories = 0
+    self.created_locations = 0
+    self._categories = self._name_map(Category)
+    self._locations = self._name_map(Location)
+    self._statuses = {name.lower(): pk for pk, name in Status.objects.values_list('id', 'name')}
+    self._users = {}
+
+  @staticmethod
+  def _name_map(model):
+    # Si hay nombres repetidos gana el de menor id
+    names = {}
+    for pk, name in model.objects.order_by('-id').values_list('id', 'name'):
+      names[name.strip().lower()] = pk
+    return names
+
+  def run(self, fileobj, fmt):
+    """Importa todo el archivo y devuelve el resumen"""
+    for _ in self.iter_run(fileobj, fmt):
+      pass
+    return self.summary()
+
+  def iter_run(self, fileobj, fmt):
+    """Igual que run() pero entrega el progreso después de cada bloque"""
+    chunk = []
+    try:
+      for number, raw in iter_rows(fileobj, fmt):
+        self.rows_read += 1
+        row = self._validate(number, raw)
+        if row is not None:
+          chunk.append(row)
+        if len(chunk) >= self.chunk_size:
+          self._flush(chunk)
+          chunk = []
+          yield self._report()
+    except ImportFormatError:
+      # Las filas leídas antes del error están completas: se insertan igual
+      # para que el resumen cuadre (rows_read = created + failed)
+      if chunk:
+        self._flush(chunk)
+      raise
+    if chunk:
+      self._flush(chunk)
+    yield self._report()
+
+  def summary(self):
+    return {
+      'rows_read': self.rows_read,
+      'created': self.created,
+      'failed': self.failed,
+      'created_categories': self.created_categories,
+      'created_locations': self.created_locations,
+      'errors': self.errors,
+      'errors_truncated': self.failed > len(self.errors),
+    }
+
+  def _report(self):
+    progress = {
+      'rows_read': self.rows_read,
+      'created': self.created,
+      'failed': self.failed,
+    }
+    if self.progress:
+      self.progress(progress)
+    return progress
+
+  def _error(self, number, messages):
+    self.failed += 1
+    if len(self.errors) < MAX_REPORTED_ERRORS:
+      self.errors.append({'row': number, 'errors': messages})
+
+  def _validate(self, number, raw):
+    if raw is None:
+      self._error(number, ["Fila con formato inválido"])
+      return None
+
+    errors = []
+    name = _clean(raw.get('name'))
+    category = _clean(raw.get('category'))
+    location = _clean(raw.get('location'))
+    status = _clean(raw.get('status')) or Status.StatusChoices.DISPONIBLE
+
+    if not name:
+      errors.append("name es obligatorio")
+    elif len(name) > 100:
+      errors.append("name no puede superar 100 caracteres")
+    if not category:
+      errors.append("category es obligatorio")
+    if not location:
+      errors.append("location es obligatorio")
+    if status.lower() not in self._statuses:
+      errors.append(f"Estado desconocido: {status}")
+
+    stock = _integer(raw.get('stock'), 1, 0, 'stock', errors)
+    min_stock = _integer(raw.get('min_stock'), 1, 1, 'min_stock', errors)
+
+    if not self.create_missing:
+      if category and category.lower() not in self._categories:
+        errors.append(f"Categoría desconocida: {category}")
+      if location and location.lower() not in self._locations:
+        errors.append(f"Ubicación desconocida: {location}")
+
+    if errors:
+      self._error(number, errors)
+      return None
+
+    return {
+      'row': number,
+      'name': name,
+      'description': _clean(raw.get('description')),
+      'category': category,
+      'location': location,
+      'status_id': self._statuses[status.lower()],
+      'stock': stock,
+      'min_stock': min_stock,
+      'qr_code': _clean(raw.get('qr_code')),
+      'responsible_user': _clean(raw.get('responsible_user')),
+    }
+
+  def _create_missing(self, model, names, mapping):
+    missing = {}
+    for name in names:
+      if name.lower() not in mapping:
+        missing.setdefault(name.lower(), name)
+    if not missing:
+      return 0
+    model.objects.bulk_create([model(name=name) for name in missing.values()])
+    # Releer los ids (no todos los motores los devuelven en bulk_create)
+    for pk, name in model.objects.filter(name__in=missing.values()).order_by('-id').values_list('id', 'name'):
+      mapping[name.strip().lower()] = pk
+    # bulk_create no dispara post_save: invalidar la caché de la tabla aquí
+    bump_on_commit(model._meta.model_name)
+    return len(missing)
+
+  def _resolve_users(self, rows):
+    wanted = {row['responsible_user'] for row in rows if row['responsible_user']}
+    unknown = wanted - self._users.keys()
+    if unknown:
+      self._users.update(User.objects.filter(username__in=unknown).values_list('username', 'id'))
+
+  def _build(self, row):
+    username = row['responsible_user']
+    return Item(
+      name=row['name'],
+      description=row['description'],
+      category_id=self._categories[row['category'].lower()],
+      location_id=self._locations[row['location'].lower()],
+      status_id=row['status_id'],
+      stock=row['stock'],
+      min_stock=row['min_stock'],
+      qr_code=row['qr_code'],
+      responsible_user_id=self._users.get(username) if username else None,
+    )
+
+  def _flush(self, rows):
+    self._resolve_users(rows)
+    valid = []
+    for row in rows:
+      if row['responsible_user'] and row['responsible_user'] not in self._users:
+        self._error(row['row'], [f"Usuario responsable desconocido: {row['responsible_user']}"])
+      else:
+        valid.append(row)
+    if not valid:
+      return
+
+    checkpoint = self._checkpoint()
+    try:
+      self.created += len(self._insert(valid))
+    except INSERT_ERRORS:
+      # Aislar las filas que hacen fallar el bloque, una por una
+      self._restore(checkpoint)
+      for row in valid:
+        checkpoint = self._checkpoint()
+        try:
+          self.created += len(self._insert([row]))
+        except INSERT_ERRORS as e:
+          self._restore(checkpoint)
+          self._error(row['row'], [f"Error al insertar: {e}"])
+
+  def _insert(self, rows):
+    with transaction.atomic():
+      self.created_categories += self._create_missing(Category, [r['category'] for r in rows], self._categories)
+      self.created_locations += self._create_missing(Location, [r['location'] for r in rows], self._locations)
+      items = Item.objects.bulk_create([self._build(row) for row in rows])
+      self._after_insert(items)
+    return items
+
+  # Si un bloque hace rollback, las categorías y ubicaciones creadas en él
+  # desaparecen: hay que olvidar también sus ids
+  def _checkpoint(self):
+    return (dict(self._categories), dict(self._locations), self.created_categories, self.created_locations)
+
+  def _restore(self, checkpoint):
+    self._categories, self._locations, self.created_categories, self.created_locations = checkpoint
+
+  def _after_insert(self, items):
+    """Efectos de post_save aplicados una vez por bloque en vez de fila por fila"""
+    alerts = [
+      (item.name, item.stock, item.responsible_user_id)
+      for item in items if item.is_low_stock
+    ]
+    if alerts:
+      jobs.enqueue('api.tasks.notify_low_stock_many', args=[alerts], priority=5)
+
+    if counters.enabled():
+      counters.bump(counters.TOTAL_KEY, len(items))
+      for status_id, count in Counter(item.status_id for item in items).items():
+        counters.bump_status(status_id, count)
+
+    bump_on_commit('item')
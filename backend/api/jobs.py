@@ -0,0 +1,210 @@
+"""
+Cola de trabajos en segundo plano respaldada por la tabla api_job.
+
+No necesita un broker externo: las vistas encolan con `enqueue()` dentro de
+su propia transacción (si hay rollback el trabajo desaparece con ella) y el
+comando `manage.py run_jobs` los ejecuta con N hilos.
+
+    from api import jobs
+
+    @jobs.task
+    def mi_tarea(item_id):
+      ...
+
+    jobs.enqueue(mi_tarea, args=[item.id], priority=10)
+"""
+import logging
+import os
+import socket
+import threading
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from api.models import Job
+
+logger = logging.getLogger(__name__)
+
+# Nombre de la tarea -> función
+TASKS = {}
+
+DEFAULT_TIMEOUT = getattr(settings, 'JOBS_VISIBILITY_TIMEOUT', 300)
+DEFAULT_MAX_ATTEMPTS = getattr(settings, 'JOBS_MAX_ATTEMPTS', 3)
+RETRY_BACKOFF = getattr(settings, 'JOBS_RETRY_BACKOFF', 10)
+
+
+def task(func=None, *, name=None):
+  """Registra una función como tarea que se puede encolar"""
+  def register(func):
+    task_name = name or f"{func.__module__}.{func.__name__}"
+    TASKS[task_name] = func
+    func.task_name = task_name
+    return func
+  return register(func) if func is not None else register
+
+
+def _task_name(func_or_name):
+  if isinstance(func_or_name, str):
+    return func_or_name
+  return getattr(func_or_name, 'task_name', None) or f"{func_or_name.__module__}.{func_or_name.__name__}"
+
+
+def enqueue(func_or_name, args=(), kwargs=None, *, priority=0, delay=None,
+            max_attempts=None, timeout=None):
+  """
+  Encola una tarea. `args` y `kwargs` deben ser serializables a JSON.
+  Con JOBS_EAGER = True la tarea se ejecuta en el proceso actual apenas se
+  confirme la transacción (útil en desarrollo y pruebas).
+  """
+  name = _task_name(func_or_name)
+  args = list(args)
+  kwargs = kwargs or {}
+
+  if getattr(settings, 'JOBS_EAGER', False):
+    transaction.on_commit(lambda: _load_task(name)(*args, **kwargs))
+    return None
+
+  run_at = timezone.now()
+  if delay:
+    run_at += delay if isinstance(delay, timedelta) else timedelta(seconds=delay)
+
+  return Job.objects.create(
+    task=name,
+    args=args,
+    kwargs=kwargs,
+    priority=priority,
+    run_at=run_at,
+    max_attempts=max_attempts or DEFAULT_MAX_ATTEMPTS,
+    timeout=timeout or DEFAULT_TIMEOUT,
+  )
+
+
+def _load_task(name):
+  if name not in TASKS:
+    # Las tareas se registran al importar api.tasks
+    import api.tasks  # noqa: F401
+  return TASKS[name]
+
+
+def worker_id(suffix=''):
+  return f"{socket.gethostname()}:{os.getpid()}{suffix}"
+
+
+def _available(now):
+  # En cola y listos, o tomados por un worker cuyo plazo venció y con intentos libres
+  return Job.objects.filter(
+    Q(state=Job.State.QUEUED, run_at__lte=now) |
+    Q(state=Job.State.RUNNING, locked_until__lt=now, attempts__lt=F('max_attempts'))
+  ).order_by('-priority', 'run_at', 'id')
+
+
+def _fail_exhausted(now):
+  """
+  Marca como fallidos los trabajos vencidos que ya gastaron sus intentos: el
+  worker murió (OOM, segfault, plazo agotado) sin llegar a registrar el error.
+  """
+  failed = Job.objects.filter(
+    state=Job.State.RUNNING, locked_until__lt=now, attempts__gte=F('max_attempts'),
+  ).update(
+    state=Job.State.FAILED,
+    locked_until=None,
+    last_error="El worker no terminó el trabajo antes de su plazo en ninguno de los intentos",
+  )
+  if failed:
+    logger.error(f"{failed} trabajo(s) vencidos sin intentos restantes marcados como fallidos")
+  return failed
+
+
+def claim(worker):
+  """Toma el siguiente trabajo disponible o devuelve None"""
+  now = timezone.now()
+  _fail_exhausted(now)
+
+  if connection.features.has_select_for_update_skip_locked:
+    with transaction.atomic():
+      job = _available(now).select_for_update(skip_locked=True).first()
+      if job is None:
+        return None
+      job.state = Job.State.RUNNING
+      job.locked_by = worker
+      job.locked_until = now + timedelta(seconds=job.timeout)
+      job.attempts += 1
+      job.save(update_fields=['state', 'locked_by', 'locked_until', 'attempts'])
+      return job
+
+  # Sin SKIP LOCKED (SQLite): UPDATE condicional, gana quien lo aplique primero
+  candidates = _available(now).values_list('id', 'state', 'locked_until', 'timeout')[:10]
+  for job_id, state, locked_until, timeout in candidates:
+    claimed = Job.objects.filter(id=job_id, state=state, locked_until=locked_until).update(
+      state=Job.State.RUNNING,
+      locked_by=worker,
+      locked_until=now + timedelta(seconds=timeout),
+      attempts=F('attempts') + 1,
+    )
+    if claimed:
+      return Job.objects.get(id=job_id)
+  return None
+
+
+def run(job, worker):
+  """Ejecuta un trabajo tomado con claim() y registra el resultado"""
+  try:
+    _load_task(job.task)(*job.args, **job.kwargs)
+  except Exception:
+    error = traceback.format_exc()
+    mine = Job.objects.filter(id=job.id, locked_by=worker)
+    if job.attempts < job.max_attempts:
+      retry_at = timezone.now() + timedelta(seconds=RETRY_BACKOFF * 2 ** (job.attempts - 1))
+      mine.update(state=Job.State.QUEUED, run_at=retry_at, locked_until=None, last_error=error)
+      logger.warning(f"Trabajo {job.id} ({job.task}) falló, reintento {job.attempts}/{job.max_attempts}")
+    else:
+      mine.update(state=Job.State.FAILED, locked_until=None, last_error=error)
+      logger.error(f"Trabajo {job.id} ({job.task}) falló definitivamente:\n{error}")
+    return False
+
+  # Los trabajos terminados se eliminan para que la cola se mantenga pequeña
+  Job.objects.filter(id=job.id, locked_by=worker).delete()
+  return True
+
+
+def work(worker, stop_event, poll_interval=1.0, burst=False):
+  """Ciclo de un worker: toma y ejecuta trabajos hasta que se pida detenerse"""
+  from django.db import close_old_connections
+
+  while not stop_event.is_set():
+    close_old_connections()
+    try:
+      job = claim(worker)
+    except Exception:
+      logger.exception("Error al tomar un trabajo de la cola")
+      job = None
+
+    if job is None:
+      if burst:
+        break
+      stop_event.wait(poll_interval)
+      continue
+
+    run(job, worker)
+
+  connection.close()
+
+
+def start_workers(count, poll_interval=1.0, burst=False):
+  """Lanza `count` hilos worker; devuelve (hilos, evento para detenerlos)"""
+  stop_event = threading.Event()
+  threads = []
+  for number in range(count):
+    thread = threading.Thread(
+      target=work,
+      args=(worker_id(f"-{number}"), stop_event, poll_interval, burst),
+      name=f"job-worker-{number}",
+      daemon=True,
+    )
+    thread.start()
+    threads.append(thread)
+  return threads, stop_event
@@ -0,0 +1,42 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from api.importer import DEFAULT_CHUNK_SIZE, FORMATS, ImportFormatError, ItemImporter, detect_format
+
+
+class Command(BaseCommand):
+  help = "Importa ítems desde un archivo CSV o JSONL en bloques con bulk_create"
+
+  def add_arguments(self, parser):
+    parser.add_argument('path', help="Archivo a importar")
+    parser.add_argument('--format', choices=FORMATS, help="Por defecto se deduce de la extensión")
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE)
+    parser.add_argument('--no-create-missing', action='store_true',
+                        help="Rechazar filas con categorías o ubicaciones inexistentes")
+
+  def handle(self, *args, **options):
+    fmt = options['format'] or detect_format(options['path'])
+
+    def progress(p):
+      self.stdout.write(f"Leídas {p['rows_read']} filas: {p['created']} creadas, {p['failed']} con error")
+
+    importer = ItemImporter(
+      chunk_size=options['chunk_size'],
+      create_missing=not options['no_create_missing'],
+      progress=progress,
+    )
+    try:
+      with open(options['path'], 'rb') as fileobj:
+        summary = importer.run(fileobj, fmt)
+    except OSError as e:
+      raise CommandError(str(e))
+    except ImportFormatError as e:
+      raise CommandError(f"{e}; {importer.created} ítems ya creados")
+
+    for error in summary['errors']:
+      self.stderr.write(f"Fila {error['row']}: {'; '.join(error['errors'])}")
+    if summary['errors_truncated']:
+      self.stderr.write("(se omitieron más errores)")
+    self.stdout.write(self.style.SUCCESS(
+      f"{summary['created']} ítems creados, {summary['failed']} filas con error, "
+      f"{summary['created_categories']} categorías y {summary['created_locations']} ubicaciones nuevas"
+    ))
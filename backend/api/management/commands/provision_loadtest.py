@@ -0,0 +1,73 @@
+import io
+import json
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand
+
+from api.importer import ItemImporter
+from api.models import Item, Status, User
+
+DEFAULT_PREFIX = 'loadtest'
+DEFAULT_PASSWORD = 'loadtest-123'
+
+
+class Command(BaseCommand):
+  help = "Crea los usuarios y el inventario mínimo que usa locustfile.py"
+
+  def add_arguments(self, parser):
+    parser.add_argument('--users', type=int, default=50, help="Usuarios del pool (<prefijo>_001, ...)")
+    parser.add_argument('--admins', type=int, default=5, help="Cuántos de ellos tienen rol admin")
+    parser.add_argument('--prefix', default=DEFAULT_PREFIX)
+    parser.add_argument('--password', default=DEFAULT_PASSWORD)
+    parser.add_argument('--items', type=int, default=500,
+                        help="Ítems de prueba que deben existir como mínimo")
+
+  def handle(self, *args, **options):
+    self.provision_users(options)
+    self.provision_items(options)
+
+  def provision_users(self, options):
+    prefix = options['prefix']
+    # Un solo hash para todo el pool: hashear N veces tarda segundos
+    password = make_password(options['password'])
+    usernames = [f"{prefix}_{n:03d}" for n in range(1, options['users'] + 1)]
+    existing = set(User.objects.filter(username__in=usernames).values_list('username', flat=True))
+
+    User.objects.bulk_create([
+      User(
+        username=username,
+        email=f"{username}@loadtest.local",
+        password=password,
+        role='admin' if n < options['admins'] else 'pasante',
+      )
+      for n, username in enumerate(usernames) if username not in existing
+    ])
+    User.objects.filter(username__in=existing).update(password=password)
+    self.stdout.write(f"{len(usernames) - len(existing)} usuarios creados, {len(existing)} actualizados")
+
+  def provision_items(self, options):
+    prefix = options['prefix']
+    existing = Item.objects.filter(name__startswith=f"{prefix} ").count()
+    missing = options['items'] - existing
+    if missing <= 0:
+      self.stdout.write(f"Ya hay {existing} ítems de prueba")
+      return
+
+    # Pasa por el importador para que se apliquen los contadores, la caché y
+    # el índice de búsqueda igual que en una importación real
+    Status.objects.get_or_create(name=Status.StatusChoices.DISPONIBLE)
+    rows = io.StringIO()
+    for n in range(existing + 1, existing + missing + 1):
+      rows.write(json.dumps({
+        'name': f"{prefix} SKU {n:05d}",
+        'description': f"Ítem de prueba de carga número {n}",
+        'category': f"{prefix} categoría {n % 10}",
+        'location': f"{prefix} bodega {n % 5}",
+        # Stock alto: las pruebas restan unidades durante horas
+        'stock': 1_000_000,
+        'min_stock': 10,
+        'qr_code': f"{prefix.upper()}-{n:05d}",
+      }) + '\n')
+    rows.seek(0)
+    summary = ItemImporter().run(rows, 'jsonl')
+    self.stdout.write(self.style.SUCCESS(f"{summary['created']} ítems de prueba creados"))
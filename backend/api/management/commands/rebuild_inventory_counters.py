@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from api import counters
+
+
+class Command(BaseCommand):
+  help = "Recalcula desde cero los contadores materializados del dashboard"
+
+  def handle(self, *args, **options):
+    values = counters.rebuild()
+    for key, value in sorted(values.items()):
+      self.stdout.write(f"{key}: {value}")
+    self.stdout.write(self.style.SUCCESS("Contadores reconstruidos"))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from api.notifications import rebuild_unread_counters
+
+
+class Command(BaseCommand):
+  help = "Recalcula desde cero los contadores de notificaciones no leídas de cada usuario"
+
+  def handle(self, *args, **options):
+    users = rebuild_unread_counters()
+    self.stdout.write(self.style.SUCCESS(f"Contadores de {users} usuarios reconstruidos"))
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+from django.db import connections, DEFAULT_DB_ALIAS
+
+from api import search
+
+
+class Command(BaseCommand):
+  help = "Reconstruye el índice de búsqueda de texto completo de los ítems"
+
+  def add_arguments(self, parser):
+    parser.add_argument('--database', default=DEFAULT_DB_ALIAS)
+
+  def handle(self, *args, **options):
+    conn = connections[options['database']]
+    if search.rebuild(conn):
+      self.stdout.write(self.style.SUCCESS("Índice de búsqueda reconstruido"))
+    else:
+      self.stdout.write(self.style.WARNING(
+        f"El motor '{conn.vendor}' no tiene índice de texto completo; se usa icontains"
+      ))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from api import history
+
+
+class Command(BaseCommand):
+  help = "Recalcula desde el historial de stock los totales diarios por ítem (api_stockdaily)"
+
+  def add_arguments(self, parser):
+    parser.add_argument('--item', type=int, action='append', dest='items', help="Solo este ítem (se puede repetir)")
+
+  def handle(self, *args, **options):
+    rows = history.rebuild_daily(item_ids=options['items'])
+    self.stdout.write(self.style.SUCCESS(f"{rows} días reconstruidos"))
@@ -0,0 +1,36 @@
+import signal
+
+from django.core.management.base import BaseCommand
+
+from api import jobs
+
+
+class Command(BaseCommand):
+  help = "Ejecuta los trabajos en segundo plano de la cola api_job"
+
+  def add_arguments(self, parser):
+    parser.add_argument('--workers', type=int, default=2, help="Número de hilos worker")
+    parser.add_argument('--poll-interval', type=float, default=1.0,
+                        help="Segundos de espera cuando la cola está vacía")
+    parser.add_argument('--burst', action='store_true',
+                        help="Termina cuando la cola queda vacía")
+
+  def handle(self, *args, **options):
+    # Registrar las tareas antes de arrancar los hilos
+    import api.tasks  # noqa: F401
+
+    threads, stop_event = jobs.start_workers(
+      options['workers'], poll_interval=options['poll_interval'], burst=options['burst']
+    )
+    self.stdout.write(f"{len(threads)} workers procesando la cola (Ctrl+C para detener)")
+
+    def stop(signum, frame):
+      self.stdout.write("Deteniendo workers...")
+      stop_event.set()
+
+    signal.signal(signal.SIGINT, stop)
+    signal.signal(signal.SIGTERM, stop)
+
+    for thread in threads:
+      while thread.is_alive():
+        thread.join(timeout=0.5)
@@ -0,0 +1,48 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from api.seed import DEFAULT_BATCH_SIZE, Seeder
+
+
+class Command(BaseCommand):
+  help = "Genera un inventario sintético de gran volumen (reproducible con --seed) para pruebas de rendimiento"
+
+  def add_arguments(self, parser):
+    parser.add_argument('--items', type=int, default=100_000)
+    parser.add_argument('--categories', type=int, default=50)
+    parser.add_argument('--locations', type=int, default=30)
+    parser.add_argument('--users', type=int, default=200)
+    parser.add_argument('--admin-ratio', type=float, default=0.05, help="Fracción de usuarios con rol admin")
+    parser.add_argument('--history', type=int, default=1_000_000, help="Filas de StockHistory")
+    parser.add_argument('--movements', type=int, default=100_000, help="Filas de ItemMovement")
+    parser.add_argument('--notifications', type=int, default=500_000)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE)
+    parser.add_argument('--span-days', type=int, default=730, help="Días de historia hacia atrás")
+    parser.add_argument('--prefix', default='seed', help="Marca los nombres generados")
+    parser.add_argument('--password', help="Contraseña de los usuarios (por defecto no pueden iniciar sesión)")
+
+  def handle(self, *args, **options):
+    if options['items'] < 1 or options['categories'] < 1 or options['locations'] < 1:
+      raise CommandError("Se necesita al menos un ítem, una categoría y una ubicación")
+    if not 0 <= options['admin_ratio'] <= 1:
+      raise CommandError("--admin-ratio debe estar entre 0 y 1")
+
+    seeder = Seeder(
+      seed=options['seed'],
+      batch_size=options['batch_size'],
+      span_days=options['span_days'],
+      prefix=options['prefix'],
+      progress=self.stdout.write,
+    )
+    elapsed = seeder.run(
+      items=options['items'],
+      categories=options['categories'],
+      locations=options['locations'],
+      users=options['users'],
+      admin_ratio=options['admin_ratio'],
+      history=options['history'],
+      movements=options['movements'],
+      notifications=options['notifications'],
+      password=options['password'],
+    )
+    self.stdout.write(self.style.SUCCESS(f"Inventario sintético generado en {elapsed:.1f} s"))
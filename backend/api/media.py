@@ -0,0 +1,208 @@
+"""
+Servicio de archivos de MEDIA_ROOT (imágenes de ítems).
+
+- Los archivos se envían en bloques con FileResponse; bajo gunicorn/uwsgi eso
+  usa wsgi.file_wrapper (sendfile) y el proceso Python no copia los bytes.
+- Soporta peticiones condicionales (ETag / If-None-Match, If-Modified-Since ->
+  304) y rangos de bytes (Range / If-Range -> 206, o 416 si no se pueden
+  satisfacer).
+- Los nombres con hash de contenido (api/images.py) nunca cambian de contenido:
+  se envían con Cache-Control immutable y un año de vigencia.
+- Con MEDIA_SENDFILE = 'x-accel-redirect' (nginx) o 'x-sendfile' (Apache,
+  lighttpd) la vista solo resuelve la ruta y delega el envío al proxy.
+"""
+import mimetypes
+import os
+import posixpath
+import re
+import stat
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import FileResponse, Http404, HttpResponse, HttpResponseNotModified
+from django.utils._os import safe_join
+from django.utils.http import http_date, parse_http_date_safe, quote_etag
+from django.views.decorators.http import require_safe
+
+SENDFILE_MODES = ('x-sendfile', 'x-accel-redirect')
+
+SENDFILE = getattr(settings, 'MEDIA_SENDFILE', None)
+# Ubicación interna de nginx que apunta a MEDIA_ROOT (location ... { internal; })
+ACCEL_PREFIX = getattr(settings, 'MEDIA_ACCEL_PREFIX', '/protected-media/')
+# Vigencia en caché de los archivos cuyo nombre no lleva hash
+MAX_AGE = getattr(settings, 'MEDIA_CACHE_MAX_AGE', 3600)
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+CHUNK_SIZE = 64 * 1024
+
+# items/ab/<sha256>.jpg, items/thumbs/ab/<sha256>_list.webp
+HASHED_NAME = re.compile(r'(^|/)[0-9a-f]{64}(_[a-z]+)?\.[a-z0-9]+$')
+RANGE_HEADER = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+def is_hashed(path):
+  return bool(HASHED_NAME.search(path))
+
+
+def cache_control(path):
+  if is_hashed(path):
+    return f'public, max-age={IMMUTABLE_MAX_AGE}, immutable'
+  return f'public, max-age={MAX_AGE}'
+
+
+def file_etag(path, st):
+  if is_hashed(path):
+    # El nombre ya identifica el contenido
+    return quote_etag(posixpath.basename(path).rsplit('.', 1)[0])
+  return quote_etag(f'{st.st_size:x}-{st.st_mtime_ns:x}')
+
+
+def _etag_matches(header, etag):
+  if not header:
+    return False
+  if header.strip() == '*':
+    return True
+  # Comparación débil (RFC 9110 §13.1.2)
+  candidates = [tag.strip().removeprefix('W/') for tag in header.split(',')]
+  return etag in candidates
+
+
+def not_modified(request, etag, mtime):
+  if_none_match = request.META.get('HTTP_IF_NONE_MATCH')
+  if if_none_match:
+    # If-None-Match tiene prioridad sobre If-Modified-Since
+    return _etag_matches(if_none_match, etag)
+  since = parse_http_date_safe(request.META.get('HTTP_IF_MODIFIED_SINCE', ''))
+  return since is not None and int(mtime) <= since
+
+
+def parse_range(header, size):
+  """
+  (inicio, fin) inclusivo del rango pedido, None si hay que enviar el archivo
+  completo (sin Range, varios rangos o sintaxis no reconocida) o ValueError si
+  el rango no se puede satisfacer.
+  """
+  match = RANGE_HEADER.match(header.strip()) if header else None
+  if match is None:
+    return None
+  first, last = match.groups()
+  if not first and not last:
+    return None
+  if not first:
+    # bytes=-N: los últimos N bytes
+    length = int(last)
+    # Un archivo vacío no tiene últimos bytes que enviar
+    if length == 0 or size == 0:
+      raise ValueError(header)
+    return max(size - length, 0), size - 1
+  start = int(first)
+  end = min(int(last), size - 1) if last else size - 1
+  if start >= size or start > end:
+    raise ValueError(header)
+  return start, end
+
+
+def _range_applies(request, etag, mtime):
+  # If-Range: solo se responde con un rango si la copia del cliente sigue vigente
+  if_range = request.META.get('HTTP_IF_RANGE')
+  if not if_range:
+    return True
+  if if_range.startswith(('"', 'W/"')):
+    return if_range == etag
+  since = parse_http_date_safe(if_range)
+  return since is not None and int(mtime) <= since
+
+
+class RangeFile:
+  """Archivo abierto que solo deja leer `length` bytes a partir de `start`"""
+  def __init__(self, fileobj, start, length):
+    self.fileobj = fileobj
+    self.remaining = length
+    fileobj.seek(start)
+
+  def read(self, size=-1):
+    if self.remaining <= 0:
+      return b''
+    if size < 0 or size > self.remaining:
+      size = self.remaining
+    data = self.fileobj.read(size)
+    self.remaining -= len(data)
+    return data
+
+  def close(self):
+    self.fileobj.close()
+
+
+def _content_type(path):
+  content_type, encoding = mimetypes.guess_type(path)
+  return content_type or 'application/octet-stream', encoding
+
+
+def _sendfile_response(path, full_path, content_type):
+  response = HttpResponse(content_type=content_type)
+  if SENDFILE == 'x-accel-redirect':
+    # nginx decodifica la URI: sin codificar, un espacio, '%', '?' o un
+    # carácter no ASCII dañan la cabecera o apuntan a otro archivo
+    response['X-Accel-Redirect'] = ACCEL_PREFIX.rstrip('/') + '/' + quote(path)
+  else:
+    response['X-Sendfile'] = full_path
+  return response
+
+
+def _file_response(request, full_path, st, content_type, encoding, etag, mtime):
+  size = st.st_size
+  try:
+    byte_range = parse_range(request.META.get('HTTP_RANGE'), size) if _range_applies(request, etag, mtime) else None
+  except ValueError:
+    response = HttpResponse(status=416)
+    response['Content-Range'] = f'bytes */{size}'
+    return response
+
+  start, end = byte_range or (0, size - 1)
+  length = end - start + 1
+  if request.method == 'HEAD':
+    # Solo cabeceras: no hace falta abrir el archivo
+    response = HttpResponse(content_type=content_type, status=206 if byte_range else 200)
+  elif byte_range is None:
+    response = FileResponse(open(full_path, 'rb'), content_type=content_type)
+  else:
+    response = FileResponse(RangeFile(open(full_path, 'rb'), start, length), content_type=content_type, status=206)
+  response.block_size = CHUNK_SIZE
+  response['Content-Length'] = length
+  if byte_range:
+    response['Content-Range'] = f'bytes {start}-{end}/{size}'
+  if encoding:
+    response['Content-Encoding'] = encoding
+  return response
+
+
+@require_safe
+def serve(request, path):
+  """Envía MEDIA_ROOT/<path> (GET y HEAD)"""
+  path = posixpath.normpath(path).lstrip('/')
+  try:
+    full_path = safe_join(settings.MEDIA_ROOT, path)
+    st = os.stat(full_path)
+  except (SuspiciousFileOperation, OSError):
+    # SuspiciousFileOperation: la ruta sale de MEDIA_ROOT
+    raise Http404("Archivo no encontrado")
+  if not stat.S_ISREG(st.st_mode):
+    raise Http404("Archivo no encontrado")
+
+  etag = file_etag(path, st)
+  mtime = st.st_mtime
+  if not_modified(request, etag, mtime):
+    response = HttpResponseNotModified()
+  else:
+    content_type, encoding = _content_type(path)
+    if SENDFILE in SENDFILE_MODES:
+      # El proxy se encarga del cuerpo, de los rangos y de Content-Length
+      response = _sendfile_response(path, full_path, content_type)
+    else:
+      response = _file_response(request, full_path, st, content_type, encoding, etag, mtime)
+
+  response['ETag'] = etag
+  response['Last-Modified'] = http_date(mtime)
+  response['Cache-Control'] = cache_control(path)
+  response['Accept-Ranges'] = 'bytes'
+  return response
@@ -0,0 +1,347 @@
+"""
+Métricas de las peticiones HTTP en formato de texto de Prometheus (/metrics).
+
+MetricsMiddleware mide cada petición y la etiqueta con el nombre de la URL de
+Django y el método:
+
+- http_requests_total{view,method,status}
+- http_request_errors_total{view,method} (respuestas 5xx y excepciones)
+- http_request_duration_seconds{view,method} (histograma)
+- http_request_db_seconds{view,method} (histograma del tiempo en SQL)
+- http_response_size_bytes{view,method} (histograma)
+- http_requests_in_flight (gauge)
+- notifications_stream_connections (gauge, la lleva api/events.py)
+
+Registrar una medición no toma locks: cada hilo escribe en su propio fragmento
+(un dict) y /metrics suma los fragmentos al leerlos.
+
+Con varios procesos (gunicorn -w N) cada uno solo conoce sus peticiones. Si
+METRICS_MULTIPROCESS_DIR apunta a un directorio compartido, cada proceso vuelca
+su estado ahí cada METRICS_FLUSH_INTERVAL segundos y /metrics suma los
+archivos de todos. Los gauges de procesos que ya no existen se descartan; los
+contadores se conservan.
+"""
+import atexit
+import hmac
+import json
+import os
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden
+from django.views.decorators.http import require_safe
+
+from api import querybudget
+
+MULTIPROCESS_DIR = getattr(settings, 'METRICS_MULTIPROCESS_DIR', None)
+FLUSH_INTERVAL = getattr(settings, 'METRICS_FLUSH_INTERVAL', 5)
+# Si se define, /metrics exige "Authorization: Bearer <token>"
+TOKEN = getattr(settings, 'METRICS_TOKEN', None)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+
+# nombre -> (tipo, ayuda, límites de los buckets si es histograma)
+METRICS = {
+  'http_requests_total': ('counter', 'Peticiones atendidas', None),
+  'http_request_errors_total': ('counter', 'Peticiones con respuesta 5xx o excepción', None),
+  'http_request_duration_seconds': ('histogram', 'Duración de la petición', LATENCY_BUCKETS),
+  'http_request_db_seconds': ('histogram', 'Tiempo en consultas SQL por petición', LATENCY_BUCKETS),
+  'http_response_size_bytes': ('histogram', 'Tamaño del cuerpo de la respuesta', SIZE_BUCKETS),
+  'http_requests_in_flight': ('gauge', 'Peticiones en curso', None),
+  'notifications_stream_connections': ('gauge', 'Conexiones abiertas al canal de notificaciones en vivo', None),
+  'sqlite_write_lane_wait_seconds': ('histogram', 'Espera en el carril de escritura de SQLite', LATENCY_BUCKETS),
+}
+
+UNMATCHED = '<unmatched>'
+
+
+class Shard:
+  """Valores de un hilo. Solo ese hilo lo modifica, por eso no necesita lock"""
+  def __init__(self):
+    # (nombre, etiquetas) -> valor
+    self.values = {}
+    # (nombre, etiquetas) -> [cuenta por bucket..., cuenta +Inf, suma]
+    self.histograms = {}
+
+  def inc(self, name, labels, amount=1):
+    key = (name, labels)
+    self.values[key] = self.values.get(key, 0) + amount
+
+  def observe(self, name, labels, value):
+    key = (name, labels)
+    buckets = METRICS[name][2]
+    counts = self.histograms.get(key)
+    if counts is None:
+      counts = self.histograms[key] = [0] * (len(buckets) + 2)
+    # Bucket no acumulado; se acumula al exportar
+    index = len(buckets)
+    for i, bound in enumerate(buckets):
+      if value <= bound:
+        index = i
+        break
+    counts[index] += 1
+    counts[-1] += value
+
+
+class Registry:
+  def __init__(self):
+    self._local = threading.local()
+    self._shards = []
+    self._lock = threading.Lock()
+
+  def shard(self):
+    shard = getattr(self._local, 'shard', None)
+    if shard is None:
+      shard = self._local.shard = Shard()
+      # Solo se bloquea la primera vez que un hilo mide algo
+      with self._lock:
+        self._shards.append(shard)
+    return shard
+
+  def collect(self):
+    """(valores, histogramas) sumados de todos los hilos del proceso"""
+    with self._lock:
+      shards = list(self._shards)
+    values = {}
+    histograms = {}
+    for shard in shards:
+      # dict.copy() es atómico con el GIL aunque el hilo dueño siga escribiendo
+      for key, value in shard.values.copy().items():
+        values[key] = values.get(key, 0) + value
+      for key, counts in shard.histograms.copy().items():
+        _add_counts(histograms, key, list(counts))
+    return values, histograms
+
+  def reset(self):
+    with self._lock:
+      for shard in self._shards:
+        shard.values.clear()
+        shard.histograms.clear()
+
+
+def _add_counts(histograms, key, counts):
+  total = histograms.get(key)
+  if total is None:
+    histograms[key] = counts
+  else:
+    for i, count in enumerate(counts):
+      total[i] += count
+
+
+registry = Registry()
+
+
+# Varios procesos: volcado a archivos en METRICS_MULTIPROCESS_DIR
+
+_last_flush = 0.0
+
+
+def _process_file(pid=None):
+  return Path(MULTIPROCESS_DIR) / f'metrics_{pid or os.getpid()}.json'
+
+
+def _encode(values, histograms):
+  return {
+    'pid': os.getpid(),
+    'values': [[name, list(labels), value] for (name, labels), value in values.items()],
+    'histograms': [[name, list(labels), counts] for (name, labels), counts in histograms.items()],
+  }
+
+
+def flush():
+  """Escribe el estado de este proceso (reemplazo atómico del archivo)"""
+  global _last_flush
+  if not MULTIPROCESS_DIR:
+    return
+  _last_flush = time.monotonic()
+  directory = Path(MULTIPROCESS_DIR)
+  directory.mkdir(parents=True, exist_ok=True)
+  data = json.dumps(_encode(*registry.collect()))
+  fd, tmp = tempfile.mkstemp(dir=directory, prefix='.metrics_', suffix='.tmp')
+  with os.fdopen(fd, 'w') as f:
+    f.write(data)
+  os.replace(tmp, _process_file())
+
+
+def maybe_flush():
+  if MULTIPROCESS_DIR and time.monotonic() - _last_flush >= FLUSH_INTERVAL:
+    flush()
+
+
+def _label_key(labels):
+  # JSON convierte las parejas (clave, valor) en listas
+  return tuple(tuple(pair) for pair in labels)
+
+
+def _alive(pid):
+  try:
+    os.kill(pid, 0)
+  except ProcessLookupError:
+    return False
+  except PermissionError:
+    return True
+  return True
+
+
+def collect_all():
+  """Estado de este proceso más el volcado de los demás"""
+  values, histograms = registry.collect()
+  if not MULTIPROCESS_DIR:
+    return values, histograms
+
+  own = _process_file()
+  for path in Path(MULTIPROCESS_DIR).glob('metrics_*.json'):
+    if path == own:
+      continue
+    try:
+      data = json.loads(path.read_text())
+    except (OSError, ValueError):
+      # Archivo a medio borrar: se toma en el próximo scrape
+      continue
+    alive = _alive(data['pid'])
+    for name, labels, value in data['values']:
+      if METRICS[name][0] == 'gauge' and not alive:
+        continue
+      key = (name, _label_key(labels))
+      values[key] = values.get(key, 0) + value
+    for name, labels, counts in data['histograms']:
+      _add_counts(histograms, (name, _label_key(labels)), counts)
+  return values, histograms
+
+
+if MULTIPROCESS_DIR:
+  atexit.register(flush)
+
+
+# Formato de texto de Prometheus
+
+def _escape(value):
+  return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _labels(pairs):
+  if not pairs:
+    return ''
+  return '{' + ','.join(f'{key}="{_escape(value)}"' for key, value in pairs) + '}'
+
+
+def _number(value):
+  if isinstance(value, float):
+    return repr(value) if value != int(value) else str(int(value))
+  return str(value)
+
+
+def render(values, histograms):
+  lines = []
+  for name, (kind, help_text, buckets) in METRICS.items():
+    lines.append(f'# HELP {name} {help_text}')
+    lines.append(f'# TYPE {name} {kind}')
+    if kind == 'histogram':
+      for (metric, labels), counts in sorted(histograms.items()):
+        if metric != name:
+          continue
+        cumulative = 0
+        for bound, count in zip((*buckets, '+Inf'), counts):
+          cumulative += count
+          lines.append(f'{name}_bucket{_labels((*labels, ("le", bound)))} {cumulative}')
+        lines.append(f'{name}_sum{_labels(labels)} {_number(counts[-1])}')
+        lines.append(f'{name}_count{_labels(labels)} {cumulative}')
+    else:
+      for (metric, labels), value in sorted(values.items()):
+        if metric == name:
+          lines.append(f'{name}{_labels(labels)} {_number(value)}')
+  return '\n'.join(lines) + '\n'
+
+
+# Middleware y vista
+
+def _view_name(request):
+  match = getattr(request, 'resolver_match', None)
+  if match is None:
+    return UNMATCHED
+  return match.view_name or match.url_name or UNMATCHED
+
+
+def _response_size(response):
+  if response.streaming:
+    length = response.get('Content-Length')
+    return int(length) if length else None
+  return len(response.content)
+
+
+class MetricsMiddleware:
+  """Debe ir primero en MIDDLEWARE para que la duración incluya a los demás"""
+  sync_capable = True
+  async_capable = True
+
+  def __init__(self, get_response):
+    self.get_response = get_response
+    self.is_async = iscoroutinefunction(get_response)
+    if self.is_async:
+      markcoroutinefunction(self)
+
+  def __call__(self, request):
+    if self.is_async:
+      return self.__acall__(request)
+    shard = self.start()
+    start = time.perf_counter()
+    response = None
+    try:
+      with querybudget.track() as recorder:
+        response = self.get_response(request)
+      return response
+    finally:
+      self.finish(shard, request, response, start, recorder)
+
+  async def __acall__(self, request):
+    shard = self.start()
+    start = time.perf_counter()
+    response = None
+    try:
+      with querybudget.track() as recorder:
+        response = await self.get_response(request)
+      return response
+    finally:
+      # El resto de la medición corre en el mismo hilo del event loop
+      self.finish(shard, request, response, start, recorder)
+
+  def start(self):
+    shard = registry.shard()
+    shard.inc('http_requests_in_flight', ())
+    return shard
+
+  def finish(self, shard, request, response, start, recorder):
+    duration = time.perf_counter() - start
+    shard.inc('http_requests_in_flight', (), -1)
+    labels = (('view', _view_name(request)), ('method', request.method))
+    status = response.status_code if response is not None else 500
+    shard.inc('http_requests_total', (*labels, ('status', str(status))))
+    if status >= 500:
+      shard.inc('http_request_errors_total', labels)
+    shard.observe('http_request_duration_seconds', labels, duration)
+    shard.observe('http_request_db_seconds', labels, recorder.duration)
+    size = _response_size(response) if response is not None else None
+    if size is not None:
+      shard.observe('http_response_size_bytes', labels, size)
+    maybe_flush()
+
+
+def _authorized(request):
+  if not TOKEN:
+    return True
+  header = request.META.get('HTTP_AUTHORIZATION', '')
+  return hmac.compare_digest(header, f'Bearer {TOKEN}')
+
+
+@require_safe
+def metrics_view(request):
+  if not _authorized(request):
+    return HttpResponseForbidden()
+  return HttpResponse(render(*collect_all()), content_type=CONTENT_TYPE)
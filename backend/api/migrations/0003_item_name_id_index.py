@@ -0,0 +1,17 @@
+# Generated by Django 5.2.1 on 2026-10-18 19:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0002_alter_notification_options_item_min_stock_and_more'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='item',
+            index=models.Index(fields=['name', 'id'], name='api_item_name_id_idx'),
+        ),
+    ]
@@ -0,0 +1,73 @@
+from django.db import migrations
+
+# DDL del índice tal como era en esta migración. No se importa api.search para
+# que cambios posteriores del módulo no alteren lo que hace esta migración.
+FTS_TABLE = 'api_item_fts'
+PG_INDEX = 'api_item_search_gin'
+PG_DOCUMENT = "to_tsvector('simple', coalesce(name, '') || ' ' || coalesce(description, ''))"
+
+SQLITE_INSTALL = [
+    f"""CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+    name, description,
+    content='api_item', content_rowid='id',
+    tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+  )""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ai AFTER INSERT ON api_item BEGIN
+    INSERT INTO {FTS_TABLE}(rowid, name, description) VALUES (new.id, new.name, new.description);
+  END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ad AFTER DELETE ON api_item BEGIN
+    INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, name, description)
+    VALUES ('delete', old.id, old.name, old.description);
+  END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_au AFTER UPDATE OF name, description ON api_item BEGIN
+    INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, name, description)
+    VALUES ('delete', old.id, old.name, old.description);
+    INSERT INTO {FTS_TABLE}(rowid, name, description) VALUES (new.id, new.name, new.description);
+  END""",
+    f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')",
+]
+
+SQLITE_UNINSTALL = [
+    f"DROP TRIGGER IF EXISTS {FTS_TABLE}_ai",
+    f"DROP TRIGGER IF EXISTS {FTS_TABLE}_ad",
+    f"DROP TRIGGER IF EXISTS {FTS_TABLE}_au",
+    f"DROP TABLE IF EXISTS {FTS_TABLE}",
+]
+
+
+def _sqlite_has_fts5(cursor):
+    cursor.execute("SELECT sqlite_compileoption_used('ENABLE_FTS5')")
+    return bool(cursor.fetchone()[0])
+
+
+def install_search_index(apps, schema_editor):
+    connection = schema_editor.connection
+    with connection.cursor() as cursor:
+        if connection.vendor == 'sqlite':
+            # Sin FTS5 la búsqueda usa icontains
+            if _sqlite_has_fts5(cursor):
+                for statement in SQLITE_INSTALL:
+                    cursor.execute(statement)
+        elif connection.vendor == 'postgresql':
+            cursor.execute(f"CREATE INDEX IF NOT EXISTS {PG_INDEX} ON api_item USING GIN ({PG_DOCUMENT})")
+
+
+def uninstall_search_index(apps, schema_editor):
+    connection = schema_editor.connection
+    with connection.cursor() as cursor:
+        if connection.vendor == 'sqlite':
+            for statement in SQLITE_UNINSTALL:
+                cursor.execute(statement)
+        elif connection.vendor == 'postgresql':
+            cursor.execute(f"DROP INDEX IF EXISTS {PG_INDEX}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0003_item_name_id_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(install_search_index, uninstall_search_index),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.1 on 2026-10-18 19:51
+
+import django.db.models.functions.text
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0007_storedimage'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='item',
+            index=models.Index(fields=['qr_code'], name='api_item_qr_code_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(fields=['user', '-created_at'], name='api_notif_user_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(fields=['user', 'is_read', '-created_at'], name='api_notif_user_unread_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='status',
+            index=models.Index(django.db.models.functions.text.Lower('name'), name='api_status_name_lower_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='stockhistory',
+            index=models.Index(fields=['item', '-date'], name='api_stockhist_item_date_idx'),
+        ),
+    ]
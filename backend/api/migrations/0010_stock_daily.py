@@ -0,0 +1,81 @@
+# Generated by Django 5.2.1 on 2026-10-18 20:32
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, F, Q, Sum, Window
+from django.db.models.functions import RowNumber, TruncDate
+
+CHUNK = 2000
+
+
+def fill_rollups(apps, schema_editor):
+    # Copia de la agregación de api.history.rebuild_daily con los modelos
+    # históricos, para que cambios posteriores del módulo no alteren esta migración
+    StockHistory = apps.get_model('api', 'StockHistory')
+    StockDaily = apps.get_model('api', 'StockDaily')
+    db_alias = schema_editor.connection.alias
+
+    history = StockHistory.objects.using(db_alias)
+    item_ids = list(history.order_by('item_id').values_list('item_id', flat=True).distinct())
+    for start in range(0, len(item_ids), CHUNK):
+        chunk = history.filter(item_id__in=item_ids[start:start + CHUNK]).annotate(day=TruncDate('date'))
+        totals = chunk.values('item_id', 'day').annotate(
+            stock_in=Sum('quantity', filter=Q(action='add'), default=0),
+            stock_out=Sum('quantity', filter=~Q(action='add'), default=0),
+            movements=Count('id'),
+        ).order_by()
+        # Último movimiento de cada día: define el stock al cierre
+        closings = {
+            (row['item_id'], row['day']): row
+            for row in chunk.annotate(
+                position=Window(
+                    RowNumber(), partition_by=[F('item_id'), F('day')], order_by=[F('date').desc(), F('id').desc()],
+                ),
+            ).filter(position=1).values('item_id', 'day', 'new_stock', 'date')
+        }
+        StockDaily.objects.using(db_alias).bulk_create(
+            (
+                StockDaily(
+                    closing_stock=closings[(total['item_id'], total['day'])]['new_stock'],
+                    closing_at=closings[(total['item_id'], total['day'])]['date'],
+                    **total,
+                )
+                for total in totals
+            ),
+            batch_size=1000,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0009_notification_counter'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StockDaily',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('stock_in', models.BigIntegerField(default=0)),
+                ('stock_out', models.BigIntegerField(default=0)),
+                ('movements', models.IntegerField(default=0)),
+                ('closing_stock', models.IntegerField()),
+                ('closing_at', models.DateTimeField()),
+                ('item', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='api.item')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('item', 'day'), name='api_stockdaily_item_day_uniq')],
+            },
+        ),
+        migrations.RemoveIndex(
+            model_name='stockhistory',
+            name='api_stockhist_item_date_idx',
+        ),
+        migrations.AddIndex(
+            model_name='stockhistory',
+            index=models.Index(fields=['item', '-date', '-id'], name='api_stockhist_item_date_id_idx'),
+        ),
+        migrations.RunPython(fill_rollups, migrations.RunPython.noop),
+    ]
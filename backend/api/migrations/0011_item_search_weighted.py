@@ -0,0 +1,38 @@
+from django.db import migrations
+
+# Solo PostgreSQL: el índice GIN pasa a un tsvector con name (peso A) y
+# description (peso B) para que ts_rank favorezca las coincidencias en el
+# nombre. En SQLite el peso ya lo da bm25 al consultar.
+OLD_INDEX = 'api_item_search_gin'
+OLD_DOCUMENT = "to_tsvector('simple', coalesce(name, '') || ' ' || coalesce(description, ''))"
+NEW_INDEX = 'api_item_search_weighted_gin'
+NEW_DOCUMENT = (
+    "(setweight(to_tsvector('simple', coalesce(name, '')), 'A') || "
+    "setweight(to_tsvector('simple', coalesce(description, '')), 'B'))"
+)
+
+
+def _swap(schema_editor, drop, create, document):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(f"DROP INDEX IF EXISTS {drop}")
+    schema_editor.execute(f"CREATE INDEX IF NOT EXISTS {create} ON api_item USING GIN ({document})")
+
+
+def weight_search_index(apps, schema_editor):
+    _swap(schema_editor, OLD_INDEX, NEW_INDEX, NEW_DOCUMENT)
+
+
+def unweight_search_index(apps, schema_editor):
+    _swap(schema_editor, NEW_INDEX, OLD_INDEX, OLD_DOCUMENT)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0010_stock_daily'),
+    ]
+
+    operations = [
+        migrations.RunPython(weight_search_index, unweight_search_index),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.2.1 on 2026-10-18 21:00
+
+import time
+
+from django.db import migrations, models
+
+# Tablas de api/cache.py VERSIONED_MODELS en este momento
+TABLES = ('item', 'category', 'location', 'status', 'user')
+
+
+def create_versions(apps, schema_editor):
+    TableVersion = apps.get_model('api', 'TableVersion')
+    # A partir del reloj, como las versiones que vivían en el caché: un ETag
+    # emitido antes de la migración no coincide con ninguna nueva
+    version = time.time_ns()
+    TableVersion.objects.using(schema_editor.connection.alias).bulk_create(
+        [TableVersion(table=table, version=version) for table in TABLES], ignore_conflicts=True
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0011_item_search_weighted'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TableVersion',
+            fields=[
+                ('table', models.CharField(max_length=50, primary_key=True, serialize=False)),
+                ('version', models.BigIntegerField()),
+            ],
+        ),
+        migrations.RunPython(create_versions, migrations.RunPython.noop),
+    ]
@@ -1,6 +1,30 @@
-from django.db import models
+from django.db import models, router, transaction
+from django.db.models.functions import Lower
+from django.utils import timezone
 from django.contrib.auth.models import AbstractUser
 
+# Recuerda el valor leído de la base de datos de los campos en TRACKED_FIELDS
+# para detectar cambios al guardar (contadores, alertas de bajo stock)
+class TrackedFieldsMixin:
+    TRACKED_FIELDS = ()
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_values = {
+            field: value for field, value in zip(field_names, values)
+            if field in cls.TRACKED_FIELDS
+        }
+        return instance
+
+    def remember_state(self):
+        """Toma los valores actuales como los guardados en la base de datos"""
+        self._loaded_values = {field: getattr(self, field) for field in self.TRACKED_FIELDS}
+
+    def loaded_value(self, field):
+        """Valor de `field` la última vez que se leyó o guardó (None si no se conoce)"""
+        return getattr(self, '_loaded_values', {}).get(field)
+
 # Modelo de Usuario
 class User(AbstractUser):
     ROLES = (
@@ -13,7 +37,7 @@ class User(AbstractUser):
         return self.username
 
 # Modelo de Notificación
-class Notification(models.Model):
+class Notification(TrackedFieldsMixin, models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='notifications')
     message = models.TextField()
     is_read = models.BooleanField(default=False)
@@ -21,6 +45,17 @@ class Notification(models.Model):
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # Bandeja del usuario, de la más reciente a la más antigua
+            models.Index(fields=['user', '-created_at'], name='api_notif_user_created_idx'),
+            # No leídas del usuario (marcar todas, contador de no leídas)
+            models.Index(fields=['user', 'is_read', '-created_at'], name='api_notif_user_unread_idx'),
+            # Paginación por cursor y consulta de las nuevas (?since_id=)
+            models.Index(fields=['user', '-id'], name='api_notif_user_id_idx'),
+        ]
+
+    # Para ajustar el contador de no leídas cuando se guarda un cambio
+    TRACKED_FIELDS = ('is_read',)
 
     def __str__(self):
         return f"Notificación para {self.user.username}: {self.message}"
@@ -54,14 +89,44 @@ class Status(models.Model):
         default=StatusChoices.DISPONIBLE
     )
 
+    class Meta:
+        indexes = [
+            # Búsqueda sin distinguir mayúsculas: Status.objects.filter(name__lower=...)
+            models.Index(Lower('name'), name='api_status_name_lower_idx'),
+        ]
+
     def __str__(self):
         return self.name
 
+# `name__lower=valor` compara con LOWER(name) y usa api_status_name_lower_idx.
+# Se registra solo en este campo, no en todos los CharField del proceso.
+Status._meta.get_field('name').register_lookup(Lower)
+
+# Imagen almacenada por su hash de contenido (ver api/images.py)
+class StoredImage(models.Model):
+    digest = models.CharField(max_length=64, unique=True)
+    original = models.CharField(max_length=255)
+    # Nombre de variante -> nombre del archivo en el storage
+    variants = models.JSONField(default=dict, blank=True)
+    # Ítems que usan esta imagen; en cero se borran los archivos
+    ref_count = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return self.original
+
 # Modelo de Ítem
-class Item(models.Model):
+class Item(TrackedFieldsMixin, models.Model):
     name = models.CharField(max_length=100)
     description = models.TextField()
     image = models.ImageField(upload_to='items/', null=True, blank=True)
+    stored_image = models.ForeignKey(
+        StoredImage,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='items'
+    )
     category = models.ForeignKey(Category, on_delete=models.CASCADE, related_name='items')
     location = models.ForeignKey(Location, on_delete=models.CASCADE, related_name='items')
     status = models.ForeignKey(Status, on_delete=models.CASCADE, related_name='items')
@@ -80,8 +145,34 @@ class Item(models.Model):
         related_name='responsible_items'
     )
 
+    class Meta:
+        indexes = [
+            # Soporta la paginación por llave (name, id) del listado de ítems
+            models.Index(fields=['name', 'id'], name='api_item_name_id_idx'),
+            models.Index(fields=['qr_code'], name='api_item_qr_code_idx'),
+        ]
+
+    # Para detectar al guardar cuándo el stock cruza el mínimo o cambia el estado
+    TRACKED_FIELDS = ('stock', 'min_stock', 'status_id')
+
     def __str__(self):
         return f"{self.name} (Stock: {self.stock})"
+
+    def save(self, *args, **kwargs):
+        # Los receptores de post_save (contadores del dashboard, alertas) quedan
+        # dentro de la misma transacción que el INSERT/UPDATE del ítem
+        using = kwargs.get('using') or router.db_for_write(type(self), instance=self)
+        with transaction.atomic(using=using):
+            super().save(*args, **kwargs)
+        self.remember_state()
+
+    @property
+    def was_low_stock(self):
+        """True si el ítem ya estaba bajo de stock la última vez que se leyó o guardó"""
+        loaded = getattr(self, '_loaded_values', {})
+        if 'stock' not in loaded or 'min_stock' not in loaded:
+            return False
+        return loaded['stock'] < loaded['min_stock']
     
     @property
     def is_low_stock(self):
@@ -109,6 +200,29 @@ class StockHistory(models.Model):
 
     class Meta:
         ordering = ['-date']
+        indexes = [
+            # Historial de un ítem, del movimiento más reciente al más antiguo
+            # (id desempata la paginación por llave de /items/<id>/history/)
+            models.Index(fields=['item', '-date', '-id'], name='api_stockhist_item_date_id_idx'),
+        ]
+
+# Entradas, salidas y stock al cierre de cada día por ítem, para graficar el
+# historial sin recorrer api_stockhistory (ver api/history.py)
+class StockDaily(models.Model):
+    item = models.ForeignKey(Item, on_delete=models.CASCADE, related_name='+')
+    day = models.DateField()
+    stock_in = models.BigIntegerField(default=0)
+    stock_out = models.BigIntegerField(default=0)
+    movements = models.IntegerField(default=0)
+    closing_stock = models.IntegerField()
+    # Fecha del último movimiento del día, el que define closing_stock
+    closing_at = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            # También es el índice de las consultas por ítem y rango de días
+            models.UniqueConstraint(fields=['item', 'day'], name='api_stockdaily_item_day_uniq'),
+        ]
 
 # Modelo de Movimiento de Ítem
 class ItemMovement(models.Model):
@@ -138,4 +252,67 @@ class ItemMaintenance(models.Model):
     status = models.CharField(max_length=100)
 
     def __str__(self):
-        return f"Mantenimiento de {self.item.name}"
\ No newline at end of file
+        return f"Mantenimiento de {self.item.name}"
+
+# Modelo de Trabajo en segundo plano (cola local, ver api/jobs.py)
+class Job(models.Model):
+    class State(models.TextChoices):
+        QUEUED = 'queued', 'En cola'
+        RUNNING = 'running', 'En ejecución'
+        FAILED = 'failed', 'Fallido'
+
+    task = models.CharField(max_length=200)
+    args = models.JSONField(default=list, blank=True)
+    kwargs = models.JSONField(default=dict, blank=True)
+    # Mayor número = se atiende primero
+    priority = models.SmallIntegerField(default=0)
+    state = models.CharField(max_length=10, choices=State.choices, default=State.QUEUED)
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=3)
+    # Segundos que un worker tiene el trabajo antes de que otro pueda tomarlo
+    timeout = models.PositiveIntegerField(default=300)
+    run_at = models.DateTimeField(default=timezone.now)
+    locked_until = models.DateTimeField(null=True, blank=True)
+    locked_by = models.CharField(max_length=100, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['state', '-priority', 'run_at'], name='api_job_claim_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.task} ({self.state})"
+
+
+# Contadores materializados del dashboard (ver api/counters.py)
+class InventoryCounter(models.Model):
+    key = models.CharField(max_length=120, primary_key=True)
+    value = models.BigIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.key}: {self.value}"
+
+
+# No leídas por usuario para el globo de notificaciones (ver api/notifications.py)
+class NotificationCounter(models.Model):
+    user = models.OneToOneField(
+        User, on_delete=models.CASCADE, primary_key=True, related_name='notification_counter'
+    )
+    unread = models.IntegerField(default=0)
+    # Id de la notificación más reciente creada para el usuario
+    latest_id = models.BigIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.user_id}: {self.unread} sin leer"
+
+
+# Versión de cada tabla para los ETag y la caché de referencia (ver api/cache.py).
+# Vive en la base de datos para que todos los workers vean cada incremento.
+class TableVersion(models.Model):
+    table = models.CharField(max_length=50, primary_key=True)
+    version = models.BigIntegerField()
+
+    def __str__(self):
+        return f"{self.table}: {self.version}"
@@ -0,0 +1,187 @@
+"""
+Notificaciones de los usuarios y su contador de no leídas.
+
+api_notificationcounter guarda por usuario cuántas notificaciones tiene sin leer
+y el id de la más reciente, para que el globo de la barra de navegación se
+consulte con una sola búsqueda por llave primaria. Se mantiene en la misma
+transacción que cada alta, lectura o borrado:
+
+- Notification.objects.create() / save() / delete(): receptores de este módulo
+- bulk_create y QuerySet.update() no emiten señales: usar add_notifications()
+  y mark_read()
+
+Las notificaciones nuevas también se publican en el canal en vivo
+(api/events.py) al confirmarse la transacción.
+
+Si se desincroniza (p. ej. por SQL directo) se recalcula con
+`manage.py rebuild_notification_counters`.
+"""
+from collections import Counter
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Max, Q
+from django.db.models.functions import Greatest
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from api import events, jobs
+from api.models import Notification, NotificationCounter, User
+
+
+def low_stock_message(item_name, stock):
+  return f"¡Alerta! Producto {item_name} con bajo stock ({stock} unidades)"
+
+
+def notify_low_stock(item_name, stock, responsible_user_id=None):
+  """
+  Crea la alerta de bajo stock para los administradores y el responsable del
+  ítem con un único INSERT. Un usuario que es ambas cosas recibe una sola.
+  """
+  recipients = set(User.objects.filter(role='admin').values_list('id', flat=True))
+  if responsible_user_id:
+    recipients.add(responsible_user_id)
+
+  message = low_stock_message(item_name, stock)
+  return add_notifications([
+    Notification(user_id=user_id, message=message)
+    for user_id in sorted(recipients)
+  ])
+
+
+def notify_low_stock_many(alerts):
+  """
+  Igual que notify_low_stock para muchos ítems a la vez: `alerts` es una lista
+  de (nombre, stock, id_responsable). Un único INSERT para todas.
+  """
+  admins = list(User.objects.filter(role='admin').values_list('id', flat=True))
+  notifications = []
+  for item_name, stock, responsible_user_id in alerts:
+    recipients = set(admins)
+    if responsible_user_id:
+      recipients.add(responsible_user_id)
+    message = low_stock_message(item_name, stock)
+    notifications.extend(Notification(user_id=user_id, message=message) for user_id in sorted(recipients))
+  return add_notifications(notifications)
+
+
+def crossed_low_stock(old_stock, new_stock, min_stock):
+  """True solo cuando el stock pasa de estar en o sobre el mínimo a estar debajo"""
+  return old_stock >= min_stock and new_stock < min_stock
+
+
+def schedule_low_stock_alert(item_name, stock, responsible_user_id=None):
+  """
+  Encola la alerta en la cola de trabajos. El registro del trabajo se escribe
+  en la misma transacción que el cambio de stock (si hay rollback desaparece
+  con ella) y la creación de notificaciones ocurre fuera de la petición.
+  """
+  jobs.enqueue(
+    'api.tasks.notify_low_stock',
+    kwargs={
+      'item_name': item_name,
+      'stock': stock,
+      'responsible_user_id': responsible_user_id,
+    },
+    priority=10,
+  )
+
+
+# Contador de no leídas
+
+def bump_unread(user_id, delta, latest_id=None):
+  """
+  Suma `delta` a las no leídas de `user_id`. Las altas crean el contador si no
+  existe; las bajas nunca bajan de cero ni lo crean (el usuario puede estar
+  borrándose en la misma transacción).
+  """
+  counters = NotificationCounter.objects.filter(user_id=user_id)
+  if delta < 0:
+    counters.update(unread=Greatest(F('unread') + delta, 0))
+    return
+  changes = {'unread': F('unread') + delta}
+  if latest_id:
+    changes['latest_id'] = Greatest(F('latest_id'), latest_id)
+  if counters.update(**changes):
+    return
+  try:
+    with transaction.atomic():
+      NotificationCounter.objects.create(user_id=user_id, unread=delta, latest_id=latest_id or 0)
+  except IntegrityError:
+    # Otro escritor lo creó primero
+    counters.update(**changes)
+
+
+@transaction.atomic
+def add_notifications(notifications):
+  """bulk_create de notificaciones que además ajusta los contadores de no leídas"""
+  created = Notification.objects.bulk_create(notifications, batch_size=1000)
+  unread = Counter()
+  latest = {}
+  for notification in created:
+    if notification.is_read:
+      continue
+    unread[notification.user_id] += 1
+    # Sin RETURNING (MySQL) los ids no vuelven y latest_id se queda igual
+    if notification.pk is not None:
+      latest[notification.user_id] = max(latest.get(notification.user_id, 0), notification.pk)
+  for user_id, count in sorted(unread.items()):
+    bump_unread(user_id, count, latest.get(user_id))
+  events.publish_on_commit(created)
+  return created
+
+
+@transaction.atomic
+def mark_read(user_id, notification_id=None):
+  """
+  Marca como leídas las notificaciones de `user_id` (o solo `notification_id`).
+  Devuelve cuántas estaban sin leer.
+  """
+  notifications = Notification.objects.filter(user_id=user_id, is_read=False)
+  if notification_id is not None:
+    notifications = notifications.filter(pk=notification_id)
+  updated = notifications.update(is_read=True)
+  if updated:
+    bump_unread(user_id, -updated)
+  return updated
+
+
+def unread_summary(user_id):
+  """(no leídas, id de la más reciente) con una búsqueda por llave primaria"""
+  row = NotificationCounter.objects.filter(pk=user_id).values_list('unread', 'latest_id').first()
+  return row or (0, 0)
+
+
+@transaction.atomic
+def rebuild_unread_counters():
+  """Recalcula los contadores de todos los usuarios a partir de api_notification"""
+  rows = list(
+    Notification.objects.values('user_id')
+    .annotate(unread=Count('id', filter=Q(is_read=False)), latest_id=Max('id'))
+    .order_by()
+  )
+  NotificationCounter.objects.all().delete()
+  NotificationCounter.objects.bulk_create(
+    (NotificationCounter(**row) for row in rows), batch_size=1000
+  )
+  return len(rows)
+
+
+@receiver(post_save, sender=Notification)
+def count_notification_saved(sender, instance, created, raw=False, **kwargs):
+  if raw:
+    return
+  if created:
+    if not instance.is_read:
+      bump_unread(instance.user_id, 1, instance.pk)
+    events.publish_on_commit([instance])
+  else:
+    loaded = instance.loaded_value('is_read')
+    if loaded is not None and loaded != instance.is_read:
+      bump_unread(instance.user_id, -1 if instance.is_read else 1)
+  instance.remember_state()
+
+
+@receiver(post_delete, sender=Notification)
+def count_notification_deleted(sender, instance, **kwargs):
+  if not instance.is_read:
+    bump_unread(instance.user_id, -1)
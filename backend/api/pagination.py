@@ -0,0 +1,105 @@
+import base64
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 500
+
+
+class InvalidCursor(ValueError):
+  pass
+
+
+def encode_cursor(values):
+  """Codifica los valores de la última fila en un token opaco"""
+  raw = json.dumps(list(values), cls=DjangoJSONEncoder, separators=(',', ':'))
+  return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(token):
+  """Decodifica un token generado por encode_cursor"""
+  try:
+    padded = token + '=' * (-len(token) % 4)
+    values = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+  except (ValueError, TypeError, UnicodeError):
+    raise InvalidCursor("Cursor inválido")
+  if not isinstance(values, list):
+    raise InvalidCursor("Cursor inválido")
+  return values
+
+
+def parse_limit(value, default=DEFAULT_LIMIT, maximum=MAX_LIMIT):
+  if value in (None, ''):
+    return default
+  try:
+    limit = int(value)
+  except (ValueError, TypeError):
+    raise ValueError("El parámetro 'limit' debe ser un entero positivo")
+  if limit <= 0:
+    raise ValueError("El parámetro 'limit' debe ser un entero positivo")
+  return limit if maximum is None else min(limit, maximum)
+
+
+def keyset_filter(fields, values):
+  """
+  Construye la condición "fila posterior al cursor" para un orden compuesto.
+  Los campos con prefijo '-' se recorren en orden descendente.
+  """
+  if len(fields) != len(values):
+    raise InvalidCursor("Cursor inválido")
+
+  condition = Q()
+  equal = Q()
+  for field, value in zip(fields, values):
+    name = field.lstrip('-')
+    lookup = 'lt' if field.startswith('-') else 'gt'
+    condition |= equal & Q(**{f"{name}__{lookup}": value})
+    equal &= Q(**{name: value})
+  return condition
+
+
+def keyset_page(queryset, fields, cursor=None, limit=DEFAULT_LIMIT, datetime_fields=()):
+  """
+  Devuelve (filas, siguiente_cursor) usando paginación por llave (keyset).
+  El costo de cada página es el mismo sin importar su posición, siempre que
+  exista un índice que cubra `fields`.
+  """
+  queryset = _page_queryset(queryset, fields, cursor, datetime_fields)
+  return _split_page(list(queryset[:limit + 1]), fields, limit)
+
+
+async def akeyset_page(queryset, fields, cursor=None, limit=DEFAULT_LIMIT, datetime_fields=()):
+  """keyset_page para vistas async: la página se lee con la ORM asíncrona"""
+  queryset = _page_queryset(queryset, fields, cursor, datetime_fields)
+  return _split_page([row async for row in queryset[:limit + 1]], fields, limit)
+
+
+def _page_queryset(queryset, fields, cursor, datetime_fields):
+  queryset = queryset.order_by(*fields)
+  if cursor:
+    values = decode_cursor(cursor)
+    for position, field in enumerate(fields):
+      if field.lstrip('-') in datetime_fields and position < len(values):
+        values[position] = parse_datetime(values[position])
+    queryset = queryset.filter(keyset_filter(fields, values))
+  return queryset
+
+
+def _split_page(rows, fields, limit):
+  next_cursor = None
+  if len(rows) > limit:
+    rows = rows[:limit]
+    last = rows[-1]
+    next_cursor = encode_cursor(_cursor_values(last, fields))
+  return rows, next_cursor
+
+
+def _cursor_values(row, fields):
+  values = []
+  for field in fields:
+    name = field.lstrip('-')
+    values.append(row[name] if isinstance(row, dict) else getattr(row, name))
+  return values
@@ -0,0 +1,260 @@
+"""
+Presupuesto de consultas SQL por petición.
+
+QueryBudgetMiddleware cuenta las consultas de cada petición, su tiempo total y
+cuántas veces se repite cada "forma" de consulta (el SQL sin valores), y las
+acumula por nombre de URL en `stats`. Si una petición pasa el presupuesto de
+su URL se registra una advertencia con las formas repetidas, que es como se ve
+un N+1.
+
+Los presupuestos están en api/query_budgets.json (nombre de URL -> máximo de
+consultas). Las pruebas usan el mismo archivo con QueryBudgetTestMixin, así
+que un N+1 nuevo hace fallar la suite antes de llegar a producción. Si un
+cambio necesita más consultas a propósito, se sube el número en el archivo.
+"""
+import json
+import logging
+import re
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from pathlib import Path
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+logger = logging.getLogger(__name__)
+
+BUDGET_FILE = Path(getattr(settings, 'QUERY_BUDGET_FILE', Path(__file__).with_name('query_budgets.json')))
+# Presupuesto de las URLs que no aparecen en el archivo
+DEFAULT_BUDGET = getattr(settings, 'QUERY_BUDGET_DEFAULT', 30)
+# Formas repetidas que se muestran en el log y en los fallos de las pruebas
+REPORTED_SHAPES = 5
+
+_current = ContextVar('query_budget_recorder', default=None)
+
+_IN_LIST = re.compile(r'IN \((?:%s, )*%s\)')
+_LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+\b")
+_SPACES = re.compile(r'\s+')
+
+
+def query_shape(sql):
+  """SQL sin valores: dos consultas con la misma forma solo difieren en parámetros"""
+  sql = _IN_LIST.sub('IN (...)', sql)
+  sql = _LITERALS.sub('?', sql)
+  return _SPACES.sub(' ', sql).strip()
+
+
+class QueryRecorder:
+  def __init__(self, parent=None):
+    # Con track() anidados (una prueba alrededor del middleware) cada consulta
+    # se cuenta también en los registros exteriores
+    self.parent = parent
+    self.count = 0
+    self.duration = 0.0
+    self.shapes = Counter()
+
+  def add(self, sql, duration, shape=None):
+    shape = shape or query_shape(sql)
+    self.count += 1
+    self.duration += duration
+    self.shapes[shape] += 1
+    if self.parent is not None:
+      self.parent.add(sql, duration, shape)
+
+  def duplicates(self):
+    """[(veces, forma)] de las consultas repetidas, de la más repetida a la menos"""
+    return [(n, shape) for shape, n in self.shapes.most_common() if n > 1]
+
+  def report(self):
+    lines = [f"{self.count} consultas en {self.duration * 1000:.1f} ms"]
+    for n, shape in self.duplicates()[:REPORTED_SHAPES]:
+      lines.append(f"  {n}x {shape}")
+    return '\n'.join(lines)
+
+
+def _record_query(execute, sql, params, many, context):
+  recorder = _current.get()
+  if recorder is None:
+    return execute(sql, params, many, context)
+  start = time.perf_counter()
+  try:
+    return execute(sql, params, many, context)
+  finally:
+    recorder.add(sql, time.perf_counter() - start)
+
+
+def _install(connection):
+  if _record_query not in connection.execute_wrappers:
+    connection.execute_wrappers.append(_record_query)
+
+
+@receiver(connection_created)
+def install_on_new_connection(sender, connection, **kwargs):
+  _install(connection)
+
+
+@contextmanager
+def track():
+  """
+  Registra en un QueryRecorder las consultas hechas dentro del bloque, también
+  las que corren en hilos de sync_to_async (el ContextVar viaja con ellas).
+  """
+  for connection in connections.all(initialized_only=True):
+    _install(connection)
+  recorder = QueryRecorder(parent=_current.get())
+  token = _current.set(recorder)
+  try:
+    yield recorder
+  finally:
+    _current.reset(token)
+
+
+_budgets = None
+
+
+def budgets():
+  global _budgets
+  if _budgets is None:
+    try:
+      _budgets = json.loads(BUDGET_FILE.read_text(encoding='utf-8'))
+    except FileNotFoundError:
+      _budgets = {}
+  return _budgets
+
+
+def budget_for(url_name):
+  return budgets().get(url_name, DEFAULT_BUDGET)
+
+
+class URLStats:
+  """Acumulado por nombre de URL desde que arrancó el proceso"""
+  def __init__(self):
+    self.requests = 0
+    self.queries = 0
+    self.max_queries = 0
+    self.duration = 0.0
+    self.over_budget = 0
+    self.duplicates = Counter()
+
+
+class QueryStats:
+  def __init__(self):
+    self._lock = threading.Lock()
+    self._urls = {}
+
+  def add(self, url_name, recorder, over_budget):
+    with self._lock:
+      entry = self._urls.setdefault(url_name, URLStats())
+      entry.requests += 1
+      entry.queries += recorder.count
+      entry.max_queries = max(entry.max_queries, recorder.count)
+      entry.duration += recorder.duration
+      entry.over_budget += int(over_budget)
+      for n, shape in recorder.duplicates():
+        entry.duplicates[shape] += n
+
+  def snapshot(self):
+    with self._lock:
+      return {
+        url_name: {
+          'requests': entry.requests,
+          'queries': entry.queries,
+          'max_queries': entry.max_queries,
+          'sql_seconds': entry.duration,
+          'over_budget': entry.over_budget,
+          'duplicates': entry.duplicates.most_common(REPORTED_SHAPES),
+        }
+        for url_name, entry in self._urls.items()
+      }
+
+  def reset(self):
+    with self._lock:
+      self._urls.clear()
+
+
+stats = QueryStats()
+
+
+def _url_name(request):
+  match = getattr(request, 'resolver_match', None)
+  if match is None:
+    return None
+  return match.view_name or match.url_name
+
+
+class QueryBudgetMiddleware:
+  """
+  Mide las consultas de cada petición. Con DEBUG agrega la cabecera
+  Server-Timing (db;dur=...) para verlas en las herramientas del navegador.
+  Funciona con vistas síncronas y asíncronas.
+  """
+  sync_capable = True
+  async_capable = True
+
+  def __init__(self, get_response):
+    self.get_response = get_response
+    self.is_async = iscoroutinefunction(get_response)
+    if self.is_async:
+      markcoroutinefunction(self)
+
+  def __call__(self, request):
+    if self.is_async:
+      return self.__acall__(request)
+    with track() as recorder:
+      response = self.get_response(request)
+    self.finish(request, response, recorder)
+    return response
+
+  async def __acall__(self, request):
+    with track() as recorder:
+      response = await self.get_response(request)
+    self.finish(request, response, recorder)
+    return response
+
+  def finish(self, request, response, recorder):
+    url_name = _url_name(request)
+    if url_name is None:
+      return
+    # Las respuestas en flujo siguen consultando después de este punto; se
+    # cuenta solo lo hecho antes del primer byte
+    budget = budget_for(url_name)
+    over_budget = recorder.count > budget
+    stats.add(url_name, recorder, over_budget)
+    if over_budget:
+      logger.warning(
+        "%s %s (%s) superó el presupuesto de %d consultas: %s",
+        request.method, request.path, url_name, budget, recorder.report()
+      )
+    if settings.DEBUG:
+      response['Server-Timing'] = (
+        f'db;dur={recorder.duration * 1000:.1f};desc="{recorder.count} queries"'
+      )
+
+
+class QueryBudgetTestMixin:
+  """
+  Para TestCase: `with self.assertQueryBudget('get_all_items'): ...` falla si
+  el bloque hace más consultas que las asignadas a esa URL en
+  api/query_budgets.json (o si la URL no tiene presupuesto), mostrando las
+  formas repetidas.
+  """
+
+  @contextmanager
+  def assertQueryBudget(self, url_name):
+    self.assertIn(
+      url_name, budgets(),
+      f"'{url_name}' no tiene presupuesto en {BUDGET_FILE.name}"
+    )
+    budget = budgets()[url_name]
+    with track() as recorder:
+      yield recorder
+    self.assertLessEqual(
+      recorder.count, budget,
+      f"{url_name} superó su presupuesto de {budget} consultas: {recorder.report()}"
+    )
@@ -0,0 +1,179 @@
+"""
+Índice de búsqueda de texto completo para Item.
+
+- SQLite: tabla virtual FTS5 `api_item_fts` con contenido externo (api_item),
+  mantenida por triggers en cada INSERT/UPDATE/DELETE de api_item.
+- PostgreSQL: índice GIN sobre la expresión tsvector de name (peso A) +
+  description (peso B), que el propio motor mantiene al día. ts_rank da así
+  más relevancia a una coincidencia en el nombre, como bm25(10, 1) en SQLite.
+
+En cualquier otro motor (o si SQLite no trae FTS5) se usa icontains.
+"""
+import logging
+import re
+
+from django.db import connection, connections, router, OperationalError
+
+from api.models import Item
+
+logger = logging.getLogger(__name__)
+
+FTS_TABLE = 'api_item_fts'
+# Si cambia PG_DOCUMENT hay que cambiar también el nombre del índice y migrar
+# (ver 0011_item_search_weighted): la consulta solo usa el índice si la
+# expresión coincide exactamente
+PG_INDEX = 'api_item_search_weighted_gin'
+PG_CONFIG = 'simple'
+PG_DOCUMENT = (
+  f"(setweight(to_tsvector('{PG_CONFIG}', coalesce(name, '')), 'A') || "
+  f"setweight(to_tsvector('{PG_CONFIG}', coalesce(description, '')), 'B'))"
+)
+
+_TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+SQLITE_INSTALL = [
+  f"""CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+    name, description,
+    content='api_item', content_rowid='id',
+    tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+  )""",
+  f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ai AFTER INSERT ON api_item BEGIN
+    INSERT INTO {FTS_TABLE}(rowid, name, description) VALUES (new.id, new.name, new.description);
+  END""",
+  f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ad AFTER DELETE ON api_item BEGIN
+    INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, name, description)
+    VALUES ('delete', old.id, old.name, old.description);
+  END""",
+  f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_au AFTER UPDATE OF name, description ON api_item BEGIN
+    INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, name, description)
+    VALUES ('delete', old.id, old.name, old.description);
+    INSERT INTO {FTS_TABLE}(rowid, name, description) VALUES (new.id, new.name, new.description);
+  END""",
+]
+
+SQLITE_UNINSTALL = [
+  f"DROP TRIGGER IF EXISTS {FTS_TABLE}_ai",
+  f"DROP TRIGGER IF EXISTS {FTS_TABLE}_ad",
+  f"DROP TRIGGER IF EXISTS {FTS_TABLE}_au",
+  f"DROP TABLE IF EXISTS {FTS_TABLE}",
+]
+
+
+def tokenize(term):
+  return _TOKEN_RE.findall(term or '')
+
+
+def _sqlite_has_fts5(conn):
+  with conn.cursor() as cursor:
+    cursor.execute("SELECT sqlite_compileoption_used('ENABLE_FTS5')")
+    return bool(cursor.fetchone()[0])
+
+
+def _sqlite_index_exists(conn):
+  with conn.cursor() as cursor:
+    cursor.execute(
+      "SELECT COUNT(*) FROM sqlite_master WHERE name IN (%s, %s, %s, %s)",
+      [FTS_TABLE, f'{FTS_TABLE}_ai', f'{FTS_TABLE}_ad', f'{FTS_TABLE}_au']
+    )
+    return cursor.fetchone()[0] == 4
+
+
+def install(conn=connection):
+  """Crea el índice si no existe. Es idempotente."""
+  if conn.vendor == 'sqlite':
+    if not _sqlite_has_fts5(conn):
+      logger.warning("SQLite sin FTS5: la búsqueda usará icontains")
+      return
+    # Si una migración reconstruyó api_item, los triggers se pierden con la
+    # tabla vieja; se recrean y se reindexa todo para no dejar huecos.
+    if _sqlite_index_exists(conn):
+      return
+    with conn.cursor() as cursor:
+      for statement in SQLITE_INSTALL:
+        cursor.execute(statement)
+      cursor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+  elif conn.vendor == 'postgresql':
+    with conn.cursor() as cursor:
+      cursor.execute(
+        f"CREATE INDEX IF NOT EXISTS {PG_INDEX} ON api_item USING GIN ({PG_DOCUMENT})"
+      )
+
+
+def uninstall(conn=connection):
+  if conn.vendor == 'sqlite':
+    with conn.cursor() as cursor:
+      for statement in SQLITE_UNINSTALL:
+        cursor.execute(statement)
+  elif conn.vendor == 'postgresql':
+    with conn.cursor() as cursor:
+      cursor.execute(f"DROP INDEX IF EXISTS {PG_INDEX}")
+
+
+def rebuild(conn=connection):
+  """Reconstruye el índice completo a partir de api_item"""
+  if conn.vendor == 'sqlite':
+    if not _sqlite_has_fts5(conn):
+      return False
+    install(conn)
+    with conn.cursor() as cursor:
+      cursor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+      cursor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('optimize')")
+    return True
+  if conn.vendor == 'postgresql':
+    install(conn)
+    with conn.cursor() as cursor:
+      cursor.execute(f"REINDEX INDEX {PG_INDEX}")
+    return True
+  return False
+
+
+def _fts5_query(tokens):
+  # Cada token entre comillas (evita la sintaxis de FTS5) y con '*' para prefijo
+  return ' '.join('"%s"*' % token.replace('"', '""') for token in tokens)
+
+
+def _tsquery(tokens):
+  return ' & '.join(f"{token}:*" for token in tokens)
+
+
+def search_item_ids(term, limit=None, conn=None):
+  """
+  Devuelve los ids de los ítems que coinciden con `term`, ordenados por
+  relevancia. Todas las palabras deben aparecer (como prefijo) en el nombre o
+  la descripción. Devuelve None si el motor no tiene índice de texto completo,
+  para que el llamador use el filtro icontains.
+  """
+  tokens = tokenize(term)
+  if not tokens:
+    return []
+
+  if conn is None:
+    # La base de lectura que elija el router (la réplica, si corresponde)
+    conn = connections[router.db_for_read(Item)]
+  if conn.vendor == 'sqlite':
+    sql = (
+      f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s "
+      # bm25 con más peso para el nombre que para la descripción
+      f"ORDER BY bm25({FTS_TABLE}, 10.0, 1.0), rowid LIMIT %s"
+    )
+    params = [_fts5_query(tokens), -1 if limit is None else limit]
+  elif conn.vendor == 'postgresql':
+    sql = (
+      f"SELECT id FROM api_item WHERE {PG_DOCUMENT} @@ to_tsquery('{PG_CONFIG}', %s) "
+      f"ORDER BY ts_rank({PG_DOCUMENT}, to_tsquery('{PG_CONFIG}', %s)) DESC, id"
+    )
+    params = [_tsquery(tokens), _tsquery(tokens)]
+    if limit is not None:
+      sql += " LIMIT %s"
+      params.append(limit)
+  else:
+    return None
+
+  try:
+    with conn.cursor() as cursor:
+      cursor.execute(sql, params)
+      return [row[0] for row in cursor.fetchall()]
+  except OperationalError:
+    # Tabla FTS ausente (p. ej. SQLite compilado sin FTS5)
+    logger.warning("Índice de búsqueda no disponible, usando icontains", exc_info=True)
+    return None
@@ -0,0 +1,346 @@
+"""
+Datos sintéticos de gran volumen para pruebas de rendimiento (manage.py seed_inventory).
+
+- Reproducible: todo sale de un random.Random(seed); la misma semilla sobre la
+  misma base de datos genera las mismas filas (las fechas se cuentan hacia
+  atrás desde el día de la ejecución).
+- Distribuciones sesgadas como las reales: unos pocos ítems concentran la
+  mayoría de los movimientos (Zipf), unas categorías y ubicaciones tienen
+  muchos más ítems que otras, el stock sigue una lognormal y la actividad crece
+  hacia el presente.
+- El historial de stock es coherente: cada fila parte del new_stock anterior
+  del mismo ítem, y al final el stock de cada ítem es el de su último
+  movimiento.
+- Las filas grandes se insertan con INSERT multi-fila (executemany en SQLite)
+  por bloques, cada bloque en su transacción, sin instanciar modelos ni
+  disparar señales. Al terminar se reconstruyen el índice de búsqueda y los
+  contadores y se invalidan las cachés, que las señales habrían mantenido.
+"""
+import itertools
+import math
+import random
+import time
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.contrib.auth.hashers import make_password
+from django.db import connection, transaction
+from django.utils import timezone
+
+from api import counters, history, search
+from api.cache import VERSIONED_MODELS, bump_version
+from api.models import (
+  Category, Item, ItemMovement, Location, Notification, Status, StockHistory, User
+)
+from api.notifications import low_stock_message, rebuild_unread_counters
+
+DEFAULT_BATCH_SIZE = 20000
+# Filas por sentencia INSERT fuera de SQLite
+ROWS_PER_STATEMENT = 1000
+
+STATUS_WEIGHTS = {
+  Status.StatusChoices.DISPONIBLE: 80,
+  Status.StatusChoices.MANTENIMIENTO: 8,
+  Status.StatusChoices.NO_DISPONIBLE: 5,
+  Status.StatusChoices.BAJO_STOCK: 4,
+  Status.StatusChoices.AGOTADO: 3,
+}
+
+NOUNS = [
+  'Taladro', 'Martillo', 'Destornillador', 'Llave inglesa', 'Alicate', 'Sierra', 'Lijadora',
+  'Multímetro', 'Osciloscopio', 'Cautín', 'Monitor', 'Teclado', 'Mouse', 'Portátil', 'Router',
+  'Switch', 'Cable HDMI', 'Proyector', 'Silla', 'Escritorio', 'Archivador', 'Impresora',
+  'Tóner', 'Resma de papel', 'Guantes', 'Casco', 'Gafas de seguridad', 'Extintor', 'Botiquín',
+  'Batería', 'Cargador', 'Extensión eléctrica', 'Linterna', 'Cinta métrica', 'Nivel',
+]
+ADJECTIVES = [
+  'industrial', 'compacto', 'inalámbrico', 'profesional', 'básico', 'reforzado', 'digital',
+  'portátil', 'de repuesto', 'de laboratorio', 'ergonómico', 'heavy duty',
+]
+AREAS = ['Herramientas', 'Electrónica', 'Cómputo', 'Redes', 'Mobiliario', 'Papelería',
+         'Seguridad', 'Eléctricos', 'Laboratorio', 'Limpieza']
+PLACES = ['Bodega', 'Laboratorio', 'Sala', 'Oficina', 'Almacén', 'Taller']
+
+
+def zipf_cum_weights(n, s=1.1):
+  """Pesos acumulados de una Zipf de exponente `s` para random.choices"""
+  return list(itertools.accumulate(1 / (k ** s) for k in range(1, n + 1)))
+
+
+def insert_rows(model, columns, rows, conn=connection):
+  """
+  INSERT de `rows` (tuplas ya en el orden de `columns`) sin pasar por el ORM.
+  Se usa el cursor del driver directamente: con DEBUG el de Django guarda
+  cada sentencia en connection.queries.
+  """
+  rows = list(rows)
+  if not rows:
+    return 0
+  quote = conn.ops.quote_name
+  table = quote(model._meta.db_table)
+  names = ', '.join(quote(model._meta.get_field(column).column) for column in columns)
+  row_sql = '(' + ', '.join(['%s'] * len(columns)) + ')'
+  with conn.cursor() as cursor:
+    raw = cursor.cursor
+    if conn.vendor == 'sqlite':
+      # El bucle de executemany corre en C: más rápido que VALUES largos
+      raw.executemany(f"INSERT INTO {table} ({names}) VALUES {row_sql}", rows)
+    else:
+      for start in range(0, len(rows), ROWS_PER_STATEMENT):
+        chunk = rows[start:start + ROWS_PER_STATEMENT]
+        values = ', '.join([row_sql] * len(chunk))
+        raw.execute(
+          f"INSERT INTO {table} ({names}) VALUES {values}",
+          [value for row in chunk for value in row]
+        )
+  return len(rows)
+
+
+class Seeder:
+  def __init__(self, seed=42, batch_size=DEFAULT_BATCH_SIZE, span_days=730, prefix='seed', progress=None):
+    self.rng = random.Random(seed)
+    self.seed = seed
+    self.batch_size = max(1, batch_size)
+    self.prefix = prefix
+    self.progress = progress
+    self.end = datetime.now(dt_timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
+    self.start = self.end - timedelta(days=span_days)
+    self.span = (self.end - self.start).total_seconds()
+    self.datetime_value = connection.ops.adapt_datetimefield_value
+
+  # Utilidades
+
+  def _report(self, table, done, total, started):
+    if self.progress:
+      elapsed = time.monotonic() - started
+      rate = done / elapsed if elapsed else 0
+      self.progress(f"{table}: {done}/{total} filas ({rate:,.0f} filas/s)")
+
+  def _timeline(self, total):
+    """
+    `total` instantes en orden cronológico con densidad creciente hacia el
+    presente (la actividad crece con el tiempo), ya adaptados a la base de datos
+    """
+    span, rng = self.span, self.rng
+    if connection.vendor == 'sqlite':
+      # Lo mismo que adapt_datetimefield_value (texto en la zona de la conexión)
+      # sin convertir la zona horaria fila por fila
+      start = timezone.make_naive(self.start, connection.timezone)
+      for i in range(total):
+        yield str(start + timedelta(seconds=span * math.sqrt((i + rng.random()) / total)))
+      return
+    start = self.start
+    for i in range(total):
+      yield start + timedelta(seconds=span * math.sqrt((i + rng.random()) / total))
+
+  def _batches(self, model, columns, rows, total):
+    started = time.monotonic()
+    done = 0
+    iterator = iter(rows)
+    while True:
+      batch = list(itertools.islice(iterator, self.batch_size))
+      if not batch:
+        break
+      with transaction.atomic():
+        done += insert_rows(model, columns, batch)
+      self._report(model._meta.db_table, done, total, started)
+    return done
+
+  def _new_ids(self, model, before):
+    return list(model.objects.filter(pk__gt=before).order_by('pk').values_list('pk', flat=True))
+
+  def _max_id(self, model):
+    return model.objects.order_by('-pk').values_list('pk', flat=True).first() or 0
+
+  # Tablas de referencia (pocas filas: bulk_create)
+
+  def seed_statuses(self):
+    existing = dict(Status.objects.values_list('name', 'id'))
+    Status.objects.bulk_create(
+      Status(name=name) for name in STATUS_WEIGHTS if name not in existing
+    )
+    self.statuses = dict(Status.objects.filter(name__in=STATUS_WEIGHTS).values_list('name', 'id'))
+
+  def seed_named(self, model, count, words):
+    before = self._max_id(model)
+    model.objects.bulk_create(
+      model(name=f"{words[n % len(words)]} {n // len(words) + 1} ({self.prefix})")
+      for n in range(count)
+    )
+    ids = self._new_ids(model, before)
+    self.rng.shuffle(ids)
+    return ids
+
+  def seed_users(self, count, admin_ratio, password=None):
+    # Un único hash (o ninguno): hashear por usuario tomaría minutos
+    password_hash = make_password(password)
+    admins = round(count * admin_ratio)
+    usernames = [f"{self.prefix}_user_{n:05d}" for n in range(1, count + 1)]
+    existing = set(User.objects.filter(username__in=usernames).values_list('username', flat=True))
+    User.objects.bulk_create(
+      User(
+        username=username,
+        email=f"{username}@example.com",
+        password=password_hash,
+        role='admin' if n < admins else 'pasante',
+        date_joined=self.start,
+      )
+      for n, username in enumerate(usernames) if username not in existing
+    )
+    users = list(User.objects.filter(username__in=usernames).order_by('pk').values_list('pk', 'username', 'role'))
+    self.rng.shuffle(users)
+    return users
+
+  # Tablas grandes (INSERT directo)
+
+  def seed_items(self, count, category_ids, location_ids, users):
+    rng = self.rng
+    category_weights = zipf_cum_weights(len(category_ids), 0.8)
+    location_weights = zipf_cum_weights(len(location_ids), 0.8)
+    status_names = list(STATUS_WEIGHTS)
+    status_weights = list(itertools.accumulate(STATUS_WEIGHTS.values()))
+    user_ids = [pk for pk, _, _ in users]
+    first = self._max_id(Item) + 1
+
+    def rows():
+      for n, created_at in enumerate(self._timeline(count)):
+        number = first + n
+        min_stock = rng.choice((1, 2, 5, 5, 10, 10, 20, 50))
+        yield (
+          f"{rng.choice(NOUNS)} {rng.choice(ADJECTIVES)} #{number}",
+          f"Ítem generado ({self.prefix}, semilla {self.seed})",
+          rng.choices(category_ids, cum_weights=category_weights)[0],
+          rng.choices(location_ids, cum_weights=location_weights)[0],
+          self.statuses[rng.choices(status_names, cum_weights=status_weights)[0]],
+          f"QR-{self.prefix.upper()}-{number:08d}",
+          created_at,
+          max(0, int(rng.lognormvariate(3, 1.2))),
+          min_stock,
+          rng.choice(user_ids) if user_ids and rng.random() < 0.6 else None,
+        )
+
+    before = self._max_id(Item)
+    self._batches(Item, [
+      'name', 'description', 'category', 'location', 'status', 'qr_code', 'created_at',
+      'stock', 'min_stock', 'responsible_user',
+    ], rows(), count)
+    return dict(Item.objects.filter(pk__gt=before).values_list('pk', 'stock'))
+
+  def seed_history(self, count, stocks, users):
+    """Movimientos de stock encadenados por ítem; devuelve el stock final de cada uno"""
+    rng = self.rng
+    stocks = dict(stocks)
+    item_ids = list(stocks)
+    rng.shuffle(item_ids)
+    item_weights = zipf_cum_weights(len(item_ids))
+    usernames = [username for _, username, _ in users] or ['seed']
+    user_weights = zipf_cum_weights(len(usernames), 0.7)
+
+    def rows():
+      timeline = self._timeline(count)
+      for start in range(0, count, self.batch_size):
+        size = min(self.batch_size, count - start)
+        picks = rng.choices(item_ids, cum_weights=item_weights, k=size)
+        actors = rng.choices(usernames, cum_weights=user_weights, k=size)
+        for item_id, actor, date in zip(picks, actors, timeline):
+          old = stocks[item_id]
+          if old == 0 or rng.random() < 0.35:
+            # Reposición: pocas veces y en cantidades grandes
+            action, quantity = 'add', 1 + int(rng.expovariate(1 / 20))
+            new = old + quantity
+          else:
+            action, quantity = 'subtract', min(old, 1 + int(rng.expovariate(1 / 3)))
+            new = old - quantity
+          stocks[item_id] = new
+          yield (item_id, action, quantity, old, new, actor, date)
+
+    self._batches(StockHistory, [
+      'item', 'action', 'quantity', 'old_stock', 'new_stock', 'user', 'date',
+    ], rows(), count)
+    return stocks
+
+  def update_stocks(self, stocks, initial):
+    changed = [(stock, pk) for pk, stock in stocks.items() if stock != initial.get(pk)]
+    table = connection.ops.quote_name(Item._meta.db_table)
+    for start in range(0, len(changed), self.batch_size):
+      with transaction.atomic(), connection.cursor() as cursor:
+        cursor.cursor.executemany(
+          f"UPDATE {table} SET stock = %s WHERE id = %s", changed[start:start + self.batch_size]
+        )
+
+  def seed_movements(self, count, item_ids, location_ids, users):
+    if len(location_ids) < 2 or not users:
+      return 0
+    rng = self.rng
+    item_ids = list(item_ids)
+    rng.shuffle(item_ids)
+    item_weights = zipf_cum_weights(len(item_ids))
+    user_ids = [pk for pk, _, _ in users]
+
+    def rows():
+      for date in self._timeline(count):
+        old, new = rng.sample(location_ids, 2)
+        yield (rng.choices(item_ids, cum_weights=item_weights)[0], old, new, rng.choice(user_ids), date)
+
+    return self._batches(ItemMovement, ['item', 'old_location', 'new_location', 'user', 'date'], rows(), count)
+
+  def seed_notifications(self, count, users, item_names):
+    if not users:
+      return 0
+    rng = self.rng
+    # Los administradores reciben todas las alertas: la mayoría de las filas
+    recipients = [pk for pk, _, role in users if role == 'admin'] * 10 + [pk for pk, _, _ in users]
+    recent = self.datetime_value(self.end - timedelta(days=7))
+
+    def rows():
+      for date in self._timeline(count):
+        if rng.random() < 0.7:
+          message = low_stock_message(rng.choice(item_names), rng.randint(0, 9))
+        else:
+          message = f"Aviso del sistema de inventario ({self.prefix})"
+        # Casi todo lo viejo está leído; lo reciente, poco
+        is_read = rng.random() < (0.3 if date >= recent else 0.95)
+        yield (rng.choice(recipients), message, is_read, date)
+
+    return self._batches(Notification, ['user', 'message', 'is_read', 'created_at'], rows(), count)
+
+  # Orquestación
+
+  def run(self, items, categories, locations, users, admin_ratio, history, movements,
+          notifications, password=None):
+    started = time.monotonic()
+    sqlite = connection.vendor == 'sqlite'
+    if sqlite:
+      # Una caída a mitad de la carga solo obliga a repetirla
+      with connection.cursor() as cursor:
+        cursor.execute('PRAGMA synchronous')
+        synchronous = cursor.fetchone()[0]
+        cursor.execute('PRAGMA synchronous = OFF')
+    try:
+      self.seed_statuses()
+      category_ids = self.seed_named(Category, categories, AREAS)
+      location_ids = self.seed_named(Location, locations, PLACES)
+      seeded_users = self.seed_users(users, admin_ratio, password)
+      initial = self.seed_items(items, category_ids, location_ids, seeded_users)
+      final = self.seed_history(history, initial, seeded_users) if initial else {}
+      self.update_stocks(final, initial)
+      self.seed_movements(movements, list(initial), location_ids, seeded_users)
+      names = list(Item.objects.filter(pk__in=list(initial)[:1000]).values_list('name', flat=True))
+      self.seed_notifications(notifications, seeded_users, names or ['ítem'])
+    finally:
+      if sqlite:
+        with connection.cursor() as cursor:
+          cursor.execute(f'PRAGMA synchronous = {int(synchronous)}')
+    self.finish()
+    return time.monotonic() - started
+
+  def finish(self):
+    """Lo que las señales habrían mantenido durante los INSERT directos"""
+    if self.progress:
+      self.progress("Reconstruyendo índice de búsqueda, contadores y totales diarios")
+    search.rebuild()
+    rebuild_unread_counters()
+    history.rebuild_daily()
+    if counters.enabled():
+      counters.rebuild()
+    for table in VERSIONED_MODELS.values():
+      bump_version(table)
@@ -0,0 +1,77 @@
+"""
+Perfil de SQLite para muchos lectores y escritores a la vez.
+
+settings.py usa este backend (ENGINE 'api.sqlite') cuando DB_ENGINE es sqlite3.
+Sobre el de Django agrega:
+
+- PRAGMAs en cada conexión nueva (SQLITE_PRAGMAS, receptor de
+  connection_created). Con journal_mode=WAL los lectores no se bloquean
+  mientras alguien escribe; synchronous=NORMAL es seguro con WAL (solo una
+  caída del sistema operativo puede perder las últimas transacciones).
+  busy_timeout es cuánto espera SQLite por el bloqueo de escritura antes de
+  fallar con "database is locked".
+- Transacciones BEGIN IMMEDIATE (OPTIONS['transaction_mode'] en settings). Con
+  el BEGIN por defecto (DEFERRED) la transacción pide el bloqueo de escritura
+  recién en su primer UPDATE; si otro escritor lo tiene, SQLite no puede
+  esperar (sería un interbloqueo) y falla de inmediato sin usar busy_timeout.
+- Carril de escritura opcional (SQLITE_WRITE_LANE): un lock del proceso por
+  archivo de base de datos que se toma al empezar la transacción más externa
+  y se suelta al confirmarla o revertirla. Los escritores del mismo proceso
+  esperan en fila en lugar de reintentar contra SQLITE_BUSY, que duerme en
+  intervalos crecientes y deja pasar a quien llegó después. Entre procesos
+  sigue mandando busy_timeout.
+"""
+import threading
+import time
+
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+DEFAULT_PRAGMAS = {
+  'journal_mode': 'wal',
+  'synchronous': 'normal',
+  'busy_timeout': 5000,
+  'mmap_size': 256 * 1024 * 1024,
+  # Negativo: KiB (64 MB por conexión)
+  'cache_size': -64000,
+}
+
+_lanes = {}
+_lanes_lock = threading.Lock()
+
+
+@receiver(connection_created)
+def apply_pragmas(sender, connection, **kwargs):
+  if connection.vendor != 'sqlite':
+    return
+  pragmas = getattr(settings, 'SQLITE_PRAGMAS', DEFAULT_PRAGMAS)
+  with connection.cursor() as cursor:
+    for name, value in pragmas.items():
+      cursor.execute(f'PRAGMA {name} = {value}')
+
+
+def lane_for(name):
+  """Lock del carril de escritura del archivo `name`"""
+  name = str(name)
+  with _lanes_lock:
+    lane = _lanes.get(name)
+    if lane is None:
+      lane = _lanes[name] = threading.Lock()
+    return lane
+
+
+def lane_timeout():
+  """Espera máxima en el carril; pasado ese tiempo se deja decidir a SQLite"""
+  pragmas = getattr(settings, 'SQLITE_PRAGMAS', DEFAULT_PRAGMAS)
+  return pragmas.get('busy_timeout', 5000) / 1000
+
+
+def enter_lane(lane):
+  """True si se tomó el lock. Registra la espera en /metrics"""
+  from api.metrics import registry
+
+  start = time.perf_counter()
+  acquired = lane.acquire(timeout=lane_timeout())
+  registry.shard().observe('sqlite_write_lane_wait_seconds', (), time.perf_counter() - start)
+  return acquired
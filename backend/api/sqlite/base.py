@@ -0,0 +1,47 @@
+from django.conf import settings
+from django.db.backends.sqlite3 import base
+
+from api.sqlite import enter_lane, lane_for
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+  """Backend sqlite3 de Django con el carril de escritura (ver api/sqlite)"""
+
+  def __init__(self, *args, **kwargs):
+    super().__init__(*args, **kwargs)
+    self._lane = None
+
+  def _start_transaction_under_autocommit(self):
+    # Solo la transacción más externa: los atomic() anidados son savepoints
+    if getattr(settings, 'SQLITE_WRITE_LANE', False):
+      lane = lane_for(self.settings_dict['NAME'])
+      if enter_lane(lane):
+        self._lane = lane
+    try:
+      super()._start_transaction_under_autocommit()
+    except Exception:
+      self._leave_lane()
+      raise
+
+  def _leave_lane(self):
+    if self._lane is not None:
+      self._lane.release()
+      self._lane = None
+
+  def _commit(self):
+    try:
+      super()._commit()
+    finally:
+      self._leave_lane()
+
+  def _rollback(self):
+    try:
+      super()._rollback()
+    finally:
+      self._leave_lane()
+
+  def _close(self):
+    try:
+      super()._close()
+    finally:
+      self._leave_lane()
@@ -0,0 +1,193 @@
+import sqlite3
+from collections import namedtuple
+
+from django.db import connections, router
+from django.db.models import F
+from django.utils import timezone
+
+from api import history
+from api.cache import bump_on_commit
+from api.models import Item, StockHistory
+
+ACTIONS = ('add', 'subtract')
+# Máximo de operaciones aceptadas en una sola petición por lotes
+BATCH_MAX_OPERATIONS = 5000
+
+StockChange = namedtuple(
+  'StockChange',
+  ['item_id', 'old_stock', 'new_stock', 'min_stock', 'name', 'responsible_user_id']
+)
+
+
+class InsufficientStock(Exception):
+  def __init__(self, available, requested):
+    self.available = available
+    self.requested = requested
+    super().__init__(f"Stock insuficiente (disponible: {available}, requerido: {requested})")
+
+
+def parse_quantity(value):
+  """Convierte la cantidad recibida a entero positivo o lanza ValueError"""
+  try:
+    quantity = int(value)
+  except (ValueError, TypeError):
+    raise ValueError("La cantidad debe ser un número entero positivo")
+  if quantity <= 0:
+    raise ValueError("La cantidad debe ser un número entero positivo")
+  return quantity
+
+
+def _supports_update_returning(connection):
+  if connection.vendor == 'postgresql':
+    return True
+  if connection.vendor == 'sqlite':
+    return sqlite3.sqlite_version_info >= (3, 35, 0)
+  return False
+
+
+def apply_stock_change(item_id, action_type, quantity):
+  """
+  Suma o resta `quantity` al stock de un ítem con un único UPDATE condicional
+  (stock = stock ± n WHERE stock >= n), escribiendo solo la columna stock.
+  Dos escritores concurrentes sobre el mismo ítem nunca pierden actualizaciones
+  ni dejan el stock negativo.
+
+  Debe llamarse dentro de una transacción. Lanza Item.DoesNotExist si el ítem
+  no existe e InsufficientStock si no alcanza para restar.
+  """
+  if action_type not in ACTIONS:
+    raise ValueError(f"Tipo de acción inválida: {action_type}")
+
+  delta = quantity if action_type == 'add' else -quantity
+  connection = connections[router.db_for_write(Item)]
+
+  if _supports_update_returning(connection):
+    table = connection.ops.quote_name(Item._meta.db_table)
+    sql = f"UPDATE {table} SET stock = stock + %s WHERE id = %s"
+    params = [delta, item_id]
+    if delta < 0:
+      sql += " AND stock >= %s"
+      params.append(quantity)
+    sql += " RETURNING stock, min_stock, name, responsible_user_id"
+    with connection.cursor() as cursor:
+      cursor.execute(sql, params)
+      row = cursor.fetchone()
+  else:
+    # Sin RETURNING: bloquear la fila, aplicar el UPDATE con F() y releerla
+    row = None
+    rows = Item.objects.select_for_update().filter(pk=item_id)
+    if delta < 0:
+      rows = rows.filter(stock__gte=quantity)
+    if rows.update(stock=F('stock') + delta):
+      row = Item.objects.filter(pk=item_id).values_list(
+        'stock', 'min_stock', 'name', 'responsible_user_id'
+      ).get()
+
+  if row is None:
+    available = Item.objects.filter(pk=item_id).values_list('stock', flat=True).first()
+    if available is None:
+      raise Item.DoesNotExist(f"Item {item_id} no existe")
+    raise InsufficientStock(available, quantity)
+
+  # El UPDATE directo no dispara post_save: invalidar aquí los ETag de ítems
+  bump_on_commit('item')
+
+  new_stock, min_stock, name, responsible_user_id = row
+  return StockChange(item_id, new_stock - delta, new_stock, min_stock, name, responsible_user_id)
+
+
+def apply_stock_batch(operations, username):
+  """
+  Aplica una lista de operaciones {item_id, type, quantity} en una sola
+  transacción: una consulta id__in para validar, un bulk_update de stock y un
+  bulk_create del historial. Es todo o nada: si alguna operación es inválida
+  no se aplica ninguna.
+
+  Devuelve (aplicado, resultados, cambios) donde `resultados` tiene una entrada
+  por operación en el mismo orden y `cambios` es la lista de StockChange por
+  ítem (stock inicial y final del lote). Debe llamarse dentro de una transacción.
+  """
+  results = []
+  parsed = []
+  for index, operation in enumerate(operations):
+    result = {'index': index, 'item_id': None, 'success': False}
+    results.append(result)
+    if not isinstance(operation, dict):
+      result['error'] = "La operación debe ser un objeto"
+      continue
+    result['item_id'] = operation.get('item_id')
+    action_type = str(operation.get('type', '')).lower()
+    try:
+      item_id = int(operation.get('item_id'))
+    except (ValueError, TypeError):
+      result['error'] = "item_id inválido"
+      continue
+    if action_type not in ACTIONS:
+      result['error'] = f"Tipo de acción inválida: {action_type}"
+      continue
+    try:
+      quantity = parse_quantity(operation.get('quantity'))
+    except ValueError as e:
+      result['error'] = str(e)
+      continue
+    result['item_id'] = item_id
+    parsed.append((result, item_id, action_type, quantity))
+
+  items = (
+    Item.objects.select_for_update()
+    .only('id', 'stock', 'min_stock', 'name', 'responsible_user_id')
+    .in_bulk({item_id for _, item_id, _, _ in parsed})
+  )
+
+  # Stock corriente por ítem: varias operaciones sobre el mismo ítem se encadenan
+  running = {item_id: item.stock for item_id, item in items.items()}
+  entries = []
+  now = timezone.now()
+  for result, item_id, action_type, quantity in parsed:
+    if item_id not in items:
+      result['error'] = "Ítem no encontrado"
+      continue
+    old_stock = running[item_id]
+    if action_type == 'subtract' and old_stock < quantity:
+      result['error'] = f"Stock insuficiente (disponible: {old_stock}, requerido: {quantity})"
+      continue
+    new_stock = old_stock + quantity if action_type == 'add' else old_stock - quantity
+    running[item_id] = new_stock
+    result.update(success=True, old_stock=old_stock, stock=new_stock)
+    entries.append(StockHistory(
+      item_id=item_id,
+      action=action_type,
+      quantity=quantity,
+      old_stock=old_stock,
+      new_stock=new_stock,
+      user=username,
+      date=now
+    ))
+
+  if any(not result['success'] for result in results):
+    for result in results:
+      if result['success']:
+        result.update(success=False, error="No aplicada: el lote contiene operaciones inválidas")
+    return False, results, []
+
+  changes = []
+  touched = []
+  for item_id, item in items.items():
+    delta = running[item_id] - item.stock
+    if delta:
+      changes.append(StockChange(
+        item_id, item.stock, running[item_id], item.min_stock, item.name, item.responsible_user_id
+      ))
+      # Se escribe como stock + delta para no pisar cambios de otros escritores
+      item.stock = F('stock') + delta
+      touched.append(item)
+  Item.objects.bulk_update(touched, ['stock'], batch_size=500)
+  bump_on_commit('item')
+
+  created = StockHistory.objects.bulk_create(entries, batch_size=500)
+  # bulk_create no emite post_save
+  history.record(created)
+  for result, entry in zip((r for r in results if r['success']), created):
+    result['history_id'] = entry.pk
+
+  return True, results, changes
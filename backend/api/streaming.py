@@ -0,0 +1,85 @@
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import StreamingHttpResponse
+
+# Filas que se traen de la base de datos por cada viaje del cursor
+STREAM_CHUNK_SIZE = getattr(settings, 'STREAM_CHUNK_SIZE', 2000)
+# Bytes acumulados antes de entregar un bloque al servidor
+STREAM_BUFFER_SIZE = 64 * 1024
+
+
+def wants_stream(request):
+  return request.GET.get('stream', '').lower() in ('1', 'true', 'yes')
+
+
+class _JSONArrayBuffer:
+  """
+  Arreglo JSON armado fila por fila: add() devuelve un bloque cada vez que se
+  acumulan STREAM_BUFFER_SIZE caracteres y close() el resto con el ']' final.
+  Lo comparten las versiones síncrona y asíncrona del iterador.
+  """
+  def __init__(self, encoder):
+    self.dumps = encoder().encode
+    self.parts = ['[']
+    self.size = 1
+    self.separator = ''
+
+  def add(self, row):
+    chunk = self.separator + self.dumps(row)
+    self.separator = ','
+    self.parts.append(chunk)
+    self.size += len(chunk)
+    return self._flush() if self.size >= STREAM_BUFFER_SIZE else None
+
+  def close(self):
+    self.parts.append(']')
+    return self._flush()
+
+  def _flush(self):
+    block = ''.join(self.parts)
+    self.parts = []
+    self.size = 0
+    return block
+
+
+def iter_json_array(rows, encoder=DjangoJSONEncoder):
+  """Serializa `rows` como un arreglo JSON, fila por fila"""
+  buffer = _JSONArrayBuffer(encoder)
+  for row in rows:
+    block = buffer.add(row)
+    if block:
+      yield block
+  yield buffer.close()
+
+
+async def aiter_json_array(rows, encoder=DjangoJSONEncoder):
+  """iter_json_array para un iterable asíncrono (p. ej. queryset.aiterator())"""
+  buffer = _JSONArrayBuffer(encoder)
+  async for row in rows:
+    block = buffer.add(row)
+    if block:
+      yield block
+  yield buffer.close()
+
+
+def stream_json_array(rows, encoder=DjangoJSONEncoder):
+  """
+  Respuesta JSON que se envía a medida que se leen las filas, de modo que la
+  memoria no crece con el tamaño del resultado y el primer byte sale de
+  inmediato. `rows` debe ser un iterable perezoso (p. ej. queryset.iterator()).
+  """
+  return StreamingHttpResponse(
+    iter_json_array(rows, encoder=encoder),
+    content_type='application/json'
+  )
+
+
+def astream_json_array(rows, encoder=DjangoJSONEncoder):
+  """
+  stream_json_array para vistas async bajo ASGI: con un iterador síncrono
+  Django leería todo el resultado antes de enviar el primer byte.
+  """
+  return StreamingHttpResponse(
+    aiter_json_array(rows, encoder=encoder),
+    content_type='application/json'
+  )
@@ -0,0 +1,30 @@
+# Tareas que se ejecutan fuera del ciclo de la petición (ver api/jobs.py)
+from django.core.files.storage import default_storage
+
+from api import images, jobs, notifications
+
+
+@jobs.task
+def notify_low_stock(item_name, stock, responsible_user_id=None):
+  notifications.notify_low_stock(item_name, stock, responsible_user_id)
+
+
+@jobs.task
+def notify_low_stock_many(alerts):
+  notifications.notify_low_stock_many(alerts)
+
+
+@jobs.task
+def delete_stored_file(name):
+  if name and default_storage.exists(name):
+    default_storage.delete(name)
+
+
+@jobs.task
+def generate_image_variants(stored_image_id):
+  images.generate_variants(stored_image_id)
+
+
+@jobs.task
+def collect_image(stored_image_id):
+  images.collect(stored_image_id)
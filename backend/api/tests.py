@@ -1,3 +1,1598 @@
-from django.test import TestCase
+import asyncio
+import csv
+import gzip
+import io
+import json
+import shutil
+import tempfile
+import threading
+import time
+from datetime import timedelta
+from pathlib import Path
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import async_to_sync, sync_to_async
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection, router, transaction
+from django.http import HttpResponse, StreamingHttpResponse
+from django.test import AsyncRequestFactory, RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.urls import ResolverMatch
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from api.models import (
+  Category, Item, Job, Location, Notification, NotificationCounter, Status, StockDaily, StockHistory, StoredImage,
+  TableVersion, User,
+)
+from api.notifications import (
+  add_notifications, crossed_low_stock, notify_low_stock, notify_low_stock_many, rebuild_unread_counters,
+  unread_summary,
+)
+from api.export import ITEM_COLUMNS, STOCK_HISTORY_COLUMNS
+from api.importer import MAX_INTEGER, ImportFormatError, ItemImporter
+from api.events import RESYNC, Subscriber, hub, make_ticket, stream_application
+from api import counters, dbrouter, history, images, jobs, media, metrics, search, streaming, views
+from api.cache import bump_version, cached_json, table_versions
+from api.querybudget import QueryBudgetTestMixin, query_shape
+from api.sqlite import lane_for
+from api import stock as stock_module
+from api.stock import InsufficientStock, apply_stock_batch, apply_stock_change
+
+
+def query_plan(queryset):
+  """
+  Plan de ejecución de `queryset` como lista de líneas. En PostgreSQL se
+  desactiva el Seq Scan para que con tablas casi vacías el planificador no lo
+  prefiera: si aun así aparece es porque ningún índice sirve.
+  """
+  with transaction.atomic():
+    if connection.vendor == 'postgresql':
+      with connection.cursor() as cursor:
+        cursor.execute('SET LOCAL enable_seqscan = off')
+    return queryset.explain().splitlines()
+
+
+def full_scans(plan):
+  """Líneas del plan que recorren una tabla completa u ordenan en memoria"""
+  bad = []
+  for line in plan:
+    if connection.vendor == 'sqlite':
+      # "SCAN api_item USING INDEX ..." recorre el índice en orden (válido con
+      # LIMIT); "SCAN api_item" a secas lee toda la tabla
+      detail = line.split(' ', 3)[-1]
+      if (detail.startswith('SCAN') and 'USING' not in detail) or 'TEMP B-TREE' in detail:
+        bad.append(line)
+    elif 'Seq Scan' in line or line.strip().startswith('->  Sort') or line.startswith('Sort'):
+      bad.append(line)
+  return bad
+
+
+class HotQueryPlanTests(TestCase):
+  """
+  Las consultas más frecuentes deben resolverse con índices. Si un cambio en
+  los modelos o en las vistas hace que alguna recorra la tabla completa (o la
+  ordene en memoria), la prueba falla mostrando el plan.
+  """
+
+  @classmethod
+  def setUpTestData(cls):
+    cls.user = User.objects.create(username='planner')
+    cls.status = Status.objects.create(name=Status.StatusChoices.DISPONIBLE)
+    cls.item = Item.objects.create(
+      name='Taladro',
+      description='',
+      category=Category.objects.create(name='Herramientas'),
+      location=Location.objects.create(name='Bodega'),
+      status=cls.status,
+      qr_code='QR-1',
+    )
+
+  def assertUsesIndex(self, queryset):
+    plan = query_plan(queryset)
+    self.assertEqual(full_scans(plan), [], "Recorrido completo en el plan:\n" + '\n'.join(plan))
+
+  def test_item_list_first_page(self):
+    self.assertUsesIndex(Item.objects.order_by('name', 'id')[:50])
+
+  def test_item_list_next_page(self):
+    self.assertUsesIndex(
+      Item.objects.filter(name__gt='Taladro').order_by('name', 'id')[:50]
+    )
+
+  def test_item_list_with_relations(self):
+    self.assertUsesIndex(
+      Item.objects.select_related(
+        'category', 'location', 'status', 'responsible_user', 'stored_image'
+      ).order_by('name', 'id')[:50]
+    )
+
+  def test_item_by_qr_code(self):
+    self.assertUsesIndex(Item.objects.filter(qr_code='QR-1'))
+
+  def test_user_notifications(self):
+    self.assertUsesIndex(Notification.objects.filter(user=self.user).order_by('-created_at'))
+
+  def test_user_unread_notifications(self):
+    self.assertUsesIndex(
+      Notification.objects.filter(user=self.user, is_read=False).order_by('-created_at')
+    )
+
+  def test_user_notifications_by_id(self):
+    self.assertUsesIndex(Notification.objects.filter(user=self.user).order_by('-id')[:51])
+
+  def test_user_notifications_since_id(self):
+    self.assertUsesIndex(Notification.objects.filter(user=self.user, id__gt=10).order_by('id')[:51])
+
+  def test_item_stock_history(self):
+    self.assertUsesIndex(StockHistory.objects.filter(item=self.item).order_by('-date'))
+
+  def test_item_stock_history_page(self):
+    self.assertUsesIndex(
+      StockHistory.objects.filter(item=self.item, date__gte='2026-01-01').order_by('-date', '-id')[:51]
+    )
+
+  def test_item_daily_rollup(self):
+    self.assertUsesIndex(
+      StockDaily.objects.filter(item=self.item, day__gte='2026-01-01', day__lte='2026-12-31').order_by('day')
+    )
+
+  def test_status_by_name_case_insensitive(self):
+    self.assertUsesIndex(Status.objects.filter(name__lower='disponible'))
+
+  def test_lower_lookup_only_on_status_name(self):
+    self.assertIsNotNone(Status._meta.get_field('name').get_transform('lower'))
+    self.assertIsNone(Category._meta.get_field('name').get_transform('lower'))
+
+  def test_full_scan_is_detected(self):
+    # Control: una consulta sin índice aplicable debe marcarse
+    plan = query_plan(Item.objects.filter(description='x'))
+    self.assertNotEqual(full_scans(plan), [])
+
+
+class QueryBudgetTests(QueryBudgetTestMixin, TestCase):
+  """
+  Consultas por endpoint contra api/query_budgets.json. Cada prueba trabaja
+  sobre ITEMS ítems: un N+1 las haría crecer con el número de filas y superar
+  el presupuesto.
+  """
+  ITEMS = 10
+
+  @classmethod
+  def setUpTestData(cls):
+    cls.user = User.objects.create(username='budget', role='admin', is_staff=True, is_superuser=True)
+    cls.status = Status.objects.create(name=Status.StatusChoices.DISPONIBLE)
+    cls.category = Category.objects.create(name='Herramientas')
+    cls.location = Location.objects.create(name='Bodega')
+    cls.items = [
+      Item.objects.create(
+        name=f'Taladro {i}',
+        description='Percutor',
+        category=cls.category,
+        location=cls.location,
+        status=cls.status,
+        responsible_user=cls.user,
+        stock=10,
+      )
+      for i in range(cls.ITEMS)
+    ]
+    add_notifications([Notification(user=cls.user, message=f'Aviso {i}') for i in range(cls.ITEMS)])
+
+  def setUp(self):
+    # Las versiones de la caché sobreviven entre pruebas
+    cache.clear()
+    self.client = APIClient()
+    self.client.force_authenticate(self.user)
+
+  def get(self, url_name, url):
+    with self.assertQueryBudget(url_name):
+      response = self.client.get(url)
+    self.assertEqual(response.status_code, 200)
+    return response
+
+  def test_item_list(self):
+    self.assertEqual(len(self.get('get_all_items', '/items/all/').json()), self.ITEMS)
+
+  def test_item_list_page(self):
+    self.get('get_all_items', '/items/all/?limit=5')
+
+  def test_item_search(self):
+    self.assertEqual(len(self.get('search_items', '/items/search/?q=taladro').json()), self.ITEMS)
+
+  def test_item_detail(self):
+    self.get('item-detail', f'/items/{self.items[0].id}/')
+
+  def test_notifications(self):
+    self.get('get_notifications', '/notifications/')
+
+  def test_notifications_unread_count(self):
+    # Con el JWT real: el usuario no se consulta, solo el contador
+    client = APIClient()
+    client.credentials(HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(self.user)}')
+    with self.assertQueryBudget('notifications-unread-count'):
+      response = client.get('/notifications/unread-count/')
+    self.assertEqual(response.status_code, 200)
+    self.assertEqual(response.json()['unread'], self.ITEMS)
+
+  def test_dashboard(self):
+    self.get('dashboard-summary', '/dashboard/summary/')
+
+  def test_reference_lists(self):
+    for url_name, url in [
+      ('get_all_category', '/category/all/'),
+      ('get_all_location', '/location/all/'),
+      ('get_all_status', '/status/all/'),
+      ('get_all_users', '/users/all/'),
+    ]:
+      with self.subTest(url_name):
+        self.get(url_name, url)
+
+  def test_item_history(self):
+    item = self.items[0]
+    self.client.post(f'/items/{item.id}/update-stock/', {'type': 'add', 'quantity': 2}, format='json')
+    self.get('item-history', f'/items/{item.id}/history/?limit=5')
+    self.get('item-history', f'/items/{item.id}/history/?group=week')
+
+  def test_update_stock(self):
+    with self.assertQueryBudget('update-stock'):
+      response = self.client.post(
+        f'/items/{self.items[0].id}/update-stock/', {'type': 'add', 'quantity': 2}, format='json'
+      )
+    self.assertEqual(response.status_code, 200)
+
+  def test_update_stock_batch(self):
+    operations = [{'item_id': item.id, 'type': 'subtract', 'quantity': 1} for item in self.items]
+    with self.assertQueryBudget('update-stock-batch'):
+      response = self.client.post('/items/update-stock/batch/', {'operations': operations}, format='json')
+    self.assertEqual(response.status_code, 200)
+
+  def test_update_stock_batch_crossing_minimum(self):
+    # Todos los ítems quedan bajo el mínimo: las alertas van en un solo trabajo
+    operations = [{'item_id': item.id, 'type': 'subtract', 'quantity': 10} for item in self.items]
+    with self.assertQueryBudget('update-stock-batch'):
+      response = self.client.post('/items/update-stock/batch/', {'operations': operations}, format='json')
+    self.assertEqual(response.status_code, 200)
+    job = Job.objects.get()
+    self.assertEqual(job.task, 'api.tasks.notify_low_stock_many')
+    self.assertEqual(
+      sorted(job.args[0]), sorted([item.name, 0, self.user.id] for item in self.items)
+    )
+
+  def test_update_item(self):
+    self.client.force_login(self.user)
+    item = self.items[0]
+    data = {
+      'name': 'Taladro inalámbrico',
+      'stock': 3,
+      'min_stock': 1,
+      'category': self.category.id,
+      'location': self.location.id,
+      'status': self.status.id,
+      'responsible_user': self.user.id,
+    }
+    with self.assertQueryBudget('item-update'):
+      response = self.client.put(f'/items/update/{item.id}/', json.dumps(data), content_type='application/json')
+    self.assertEqual(response.status_code, 200)
+
+  def test_budget_detects_n_plus_one(self):
+    # Control: recorrer una relación sin select_related repite la misma consulta
+    with self.assertRaises(AssertionError):
+      with self.assertQueryBudget('get_all_items'):
+        [item.category.name for item in Item.objects.all()]
+
+  def test_query_shape_ignores_values(self):
+    self.assertEqual(
+      query_shape('SELECT * FROM api_item WHERE id IN (%s, %s, %s) AND name = \'x\''),
+      query_shape('SELECT * FROM api_item WHERE id IN (%s) AND name = \'y\''),
+    )
+
+
+class NotificationCounterTests(TestCase):
+  """El contador de no leídas debe coincidir con la tabla después de cada operación"""
+
+  @classmethod
+  def setUpTestData(cls):
+    cls.user = User.objects.create(username='lector', role='admin')
+    cls.other = User.objects.create(username='otro', role='pasante')
+
+  def setUp(self):
+    self.client = APIClient()
+    self.client.force_authenticate(self.user)
+
+  def assertCounterMatches(self, user=None):
+    user = user or self.user
+    notifications = Notification.objects.filter(user=user)
+    latest = notifications.order_by('-id').values_list('id', flat=True).first()
+    self.assertEqual(unread_summary(user.id), (notifications.filter(is_read=False).count(), latest or 0))
+
+  def test_create_and_bulk_create(self):
+    Notification.objects.create(user=self.user, message='Aviso')
+    notify_low_stock('Taladro', 1, responsible_user_id=self.other.id)
+    self.assertCounterMatches()
+    self.assertCounterMatches(self.other)
+    self.assertEqual(unread_summary(self.user.id)[0], 2)
+
+  def test_mark_as_read_and_delete(self):
+    first, second, third = (Notification.objects.create(user=self.user, message=f'Aviso {i}') for i in range(3))
+    self.client.post(f'/notifications/mark/{first.id}/')
+    # Marcarla otra vez no descuenta dos veces
+    response = self.client.post(f'/notifications/mark/{first.id}/')
+    self.assertEqual(response.json()['status'], 'info')
+    self.assertCounterMatches()
+
+    self.client.delete(f'/notifications/delete/{second.id}/')
+    self.client.delete(f'/notifications/delete/{first.id}/')
+    self.assertCounterMatches()
+    self.assertEqual(unread_summary(self.user.id)[0], 1)
+
+    self.client.post('/notifications/mark-all/')
+    self.assertCounterMatches()
+    self.assertEqual(self.client.post(f'/notifications/mark/{third.id}/').json()['status'], 'info')
+    self.assertEqual(self.client.post('/notifications/mark/999999/').status_code, 404)
+
+  def test_save_changes_read_state(self):
+    notification = Notification.objects.create(user=self.user, message='Aviso')
+    notification = Notification.objects.get(pk=notification.pk)
+    self.assertIs(notification.loaded_value('is_read'), False)
+    notification.is_read = True
+    notification.save()
+    self.assertIs(notification.loaded_value('is_read'), True)
+    self.assertCounterMatches()
+    notification.is_read = False
+    notification.save()
+    self.assertCounterMatches()
+
+  def test_rebuild(self):
+    Notification.objects.bulk_create(Notification(user=self.other, message=f'Aviso {i}') for i in range(3))
+    NotificationCounter.objects.all().delete()
+    rebuild_unread_counters()
+    self.assertCounterMatches(self.other)
+
+  def test_cursor_and_since_id(self):
+    ids = [Notification.objects.create(user=self.user, message=f'Aviso {i}').id for i in range(5)]
+    Notification.objects.create(user=self.other, message='Ajena')
+
+    first = self.client.get('/notifications/?limit=3').json()
+    self.assertEqual([n['id'] for n in first['notifications']], ids[:1:-1])
+    second = self.client.get('/notifications/', {'limit': 3, 'cursor': first['next']}).json()
+    self.assertEqual([n['id'] for n in second['notifications']], ids[1::-1])
+    self.assertIsNone(second['next'])
+
+    newer = self.client.get('/notifications/', {'since_id': ids[2]}).json()
+    self.assertEqual([n['id'] for n in newer['notifications']], ids[3:])
+    self.assertEqual(self.client.get('/notifications/?since_id=x').status_code, 400)
+
+
+class NotificationStreamTests(TestCase):
+  """Canal SSE de api/events.py, llamado como aplicación ASGI"""
+
+  @classmethod
+  def setUpTestData(cls):
+    cls.user = User.objects.create(username='oyente')
+
+  async def open_stream(self, query=b'', headers=()):
+    """Abre el canal y devuelve (cola de recepción, mensajes enviados, tarea)"""
+    receive_queue = asyncio.Queue()
+    await receive_queue.put({'type': 'http.request', 'body': b''})
+    sent = []
+    scope = {
+      'type': 'http', 'method': 'GET', 'path': '/notifications/stream/', 'root_path': '',
+      'query_string': query, 'headers': list(headers),
+    }
+
+    async def send(message):
+      sent.append(message)
+
+    task = asyncio.ensure_future(stream_application(scope, receive_queue.get, send))
+    return receive_queue, sent, task
+
+  async def wait_for_body(self, sent, text):
+    for _ in range(200):
+      body = b''.join(m.get('body', b'') for m in sent if m['type'] == 'http.response.body')
+      if text.encode() in body:
+        return body.decode()
+      await asyncio.sleep(0.01)
+    self.fail(f"No llegó {text!r}: {sent!r}")
+
+  async def test_replay_and_live_event(self):
+    first, second = await sync_to_async(lambda: [
+      Notification.objects.create(user=self.user, message=f'Aviso {i}').id for i in range(2)
+    ])()
+    ticket = make_ticket(self.user.id)
+    receive_queue, sent, task = await self.open_stream(
+      f'ticket={ticket}'.encode(), [(b'last-event-id', str(first).encode())]
+    )
+    body = await self.wait_for_body(sent, f'id: {second}\n')
+    self.assertNotIn('Aviso 0', body)
+    self.assertEqual(sent[0]['status'], 200)
+
+    # Publicación en vivo; la repetida (por sondeo) no se reenvía
+    event = {'id': second + 1, 'message': 'En vivo', 'is_read': False, 'created_at': '2026-01-01 00:00:00'}
+    hub.publish(self.user.id, event)
+    hub.publish(self.user.id, event)
+    body = await self.wait_for_body(sent, 'En vivo')
+    self.assertEqual(body.count('En vivo'), 1)
+
+    await receive_queue.put({'type': 'http.disconnect'})
+    await asyncio.wait_for(task, 1)
+    self.assertEqual(hub.subscriber_count(), 0)
+
+  async def test_requires_credentials(self):
+    _, sent, task = await self.open_stream(b'ticket=falso')
+    await asyncio.wait_for(task, 1)
+    self.assertEqual(sent[0]['status'], 401)
+
+  async def test_slow_client_is_resynced(self):
+    subscriber = Subscriber(self.user.id, asyncio.get_running_loop(), maxsize=2)
+    for i in range(5):
+      subscriber.offer({'id': i})
+    self.assertIs(subscriber.queue.get_nowait(), RESYNC)
+    self.assertTrue(subscriber.queue.empty())
+
+  def test_unavailable_under_wsgi(self):
+    self.assertEqual(self.client.get('/notifications/stream/').status_code, 503)
+
+
+class AsyncItemViewTests(TestCase):
+  """Las vistas async de lectura de ítems responden lo mismo que las síncronas"""
+
+  @classmethod
+  def setUpTestData(cls):
+    cls.user = User.objects.create(username='lector_async', role='admin')
+    status = Status.objects.create(name=Status.StatusChoices.DISPONIBLE)
+    category = Category.objects.create(name='Herramientas')
+    location = Location.objects.create(name='Bodega')
+    cls.items = [
+      Item.objects.create(
+        name=f'Taladro {i}', description='Percutor', category=category, location=location,
+        status=status, responsible_user=cls.user if i % 2 else None, stock=i, min_stock=2,
+      )
+      for i in range(5)
+    ]
+    cls.auth = {'headers': {'Authorization': f'Bearer {AccessToken.for_user(cls.user)}'}}
+
+  def setUp(self):
+    cache.clear()
+
+  def call_both(self, sync_view, async_view, path, **kwargs):
+    response = sync_view(RequestFactory().get(path, **self.auth), **kwargs)
+    if hasattr(response, 'render'):
+      response.render()
+    async_response = async_to_sync(async_view)(AsyncRequestFactory().get(path, **self.auth), **kwargs)
+    self.assertEqual(async_response.status_code, response.status_code)
+    return json.loads(response.content), json.loads(async_response.content)
+
+  def assertSameResponse(self, sync_view, async_view, path, **kwargs):
+    expected, actual = self.call_both(sync_view, async_view, path, **kwargs)
+    self.assertEqual(actual, expected)
+    return actual
+
+  def test_item_list(self):
+    self.assertEqual(len(self.assertSameResponse(views.get_all_item, views.aget_all_item, '/items/all/')), 5)
+    page = self.assertSameResponse(views.get_all_item, views.aget_all_item, '/items/all/?limit=2')
+    self.assertSameResponse(
+      views.get_all_item, views.aget_all_item, f'/items/all/?limit=2&cursor={page["next"]}'
+    )
+
+  def test_item_detail(self):
+    for item in self.items[:2]:
+      self.assertSameResponse(views.item_detail, views.aitem_detail, f'/items/{item.id}/', id=item.id)
+    self.assertSameResponse(views.item_detail, views.aitem_detail, '/items/0/', id=0)
+
+  def test_search(self):
+    self.assertEqual(len(self.assertSameResponse(views.search_items, views.asearch_items, '/items/search/?q=taladro')), 5)
+    self.assertSameResponse(views.search_items, views.asearch_items, '/items/search/?q=')
+
+  def test_dashboard(self):
+    self.assertSameResponse(views.dashboard_summary, views.adashboard_summary, '/dashboard/summary/')
+
+  def test_item_etag(self):
+    path = f'/items/{self.items[0].id}/'
+    etag = views.item_detail(RequestFactory().get(path, **self.auth), id=self.items[0].id)['ETag']
+    request = AsyncRequestFactory().get(path, headers={**self.auth['headers'], 'If-None-Match': etag})
+    self.assertEqual(async_to_sync(views.aitem_detail)(request, id=self.items[0].id).status_code, 304)
+    response = async_to_sync(views.aget_all_item)(AsyncRequestFactory().get('/items/all/', **self.auth))
+    self.assertTrue(response.has_header('ETag'))
+
+  def test_requires_authentication(self):
+    response = async_to_sync(views.aget_all_item)(AsyncRequestFactory().get('/items/all/'))
+    self.assertEqual(response.status_code, 401)
+    bad = AsyncRequestFactory().get('/items/all/', headers={'Authorization': 'Bearer nope'})
+    self.assertEqual(async_to_sync(views.aget_all_item)(bad).status_code, 401)
+
+
+@mock.patch.object(dbrouter, 'replica_configured', return_value=True)
+class ReplicaRoutingTests(TestCase):
+  """Qué base elige el router para las lecturas, con una réplica configurada"""
+
+  def setUp(self):
+    cache.clear()
+
+  def route(self, method, url_name, token='a', write=False, versions=(), cookies=None):
+    """Base de una lectura hecha por la vista, después de escribir si `write`"""
+    request = RequestFactory().generic(method, '/', headers={'Authorization': f'Bearer {token}'})
+    request.COOKIES.update(cookies or {})
+    request.resolver_match = ResolverMatch(None, (), {}, url_name=url_name)
+    used = []
+
+    def view(request):
+      middleware.process_view(request, view, (), {})
+      if versions:
+        table_versions(*versions)
+      if write:
+        router.db_for_write(Item)
+      used.append(router.db_for_read(Item))
+      return HttpResponse()
+
+    middleware = dbrouter.ReplicaRoutingMiddleware(view)
+    self.response = middleware(request)
+    return used[0]
+
+  def test_listed_reads_go_to_replica(self, _):
+    self.assertEqual(self.route('GET', 'get_all_items'), 'replica')
+    self.assertEqual(self.route('GET', 'get_notifications'), 'default')
+    self.assertEqual(self.route('POST', 'get_all_items'), 'default')
+    # Fuera de una petición
+    self.assertEqual(router.db_for_read(Item), 'default')
+
+  def test_reads_after_write_use_primary(self, _):
+    self.assertEqual(self.route('GET', 'get_all_items', write=True), 'default')
+
+  def test_client_pinned_after_write(self, _):
+    self.route('POST', 'update-stock', token='a', write=True)
+    self.assertEqual(self.route('GET', 'get_all_items', token='a'), 'default')
+    self.assertEqual(self.route('GET', 'get_all_items', token='b'), 'replica')
+    cache.delete(dbrouter._client_key(RequestFactory().get('/', headers={'Authorization': 'Bearer a'})))
+    self.assertEqual(self.route('GET', 'get_all_items', token='a'), 'replica')
+
+  def test_pin_cookie_works_across_workers(self, _):
+    self.route('POST', 'update-stock', token='a', write=True)
+    cookie = self.response.cookies[dbrouter.PIN_COOKIE]
+    self.assertEqual(cookie['max-age'], dbrouter.PIN_SECONDS)
+    # Otro worker: su caché local no tiene el pin, pero el cliente trae la cookie
+    cache.clear()
+    pin = {dbrouter.PIN_COOKIE: cookie.value}
+    self.assertEqual(self.route('GET', 'get_all_items', token='a', cookies=pin), 'default')
+    self.assertNotIn(dbrouter.PIN_COOKIE, self.response.cookies)
+    self.assertEqual(self.route('GET', 'get_all_items', token='a'), 'replica')
+    # Vencida o alterada no fija
+    later = time.time() + dbrouter.PIN_SECONDS + 1
+    with mock.patch('django.core.signing.time.time', return_value=later):
+      self.assertEqual(self.route('GET', 'get_all_items', cookies=pin), 'replica')
+    self.assertEqual(self.route('GET', 'get_all_items', cookies={dbrouter.PIN_COOKIE: '1'}), 'replica')
+
+  def test_local_cache_warning(self, _):
+    self.assertEqual([w.id for w in dbrouter.check_replica_cache(None)], ['api.W001'])
+    with mock.patch('api.cache.cache_is_shared', return_value=True):
+      self.assertEqual(dbrouter.check_replica_cache(None), [])
+
+  def test_recently_changed_tables_read_from_primary(self, _):
+    bump_version('item')
+    self.assertEqual(self.route('GET', 'get_all_items', versions=('item',)), 'default')
+    self.assertEqual(self.route('GET', 'get_all_items', versions=('category',)), 'replica')
+
+  def test_without_replica(self, configured):
+    configured.return_value = False
+    self.assertEqual(self.route('GET', 'get_all_items'), 'default')
+
+
+class SQLiteProfileTests(TransactionTestCase):
+  """PRAGMAs, BEGIN IMMEDIATE y carril de escritura del backend api.sqlite"""
+
+  def setUp(self):
+    if connection.vendor != 'sqlite':
+      self.skipTest('solo SQLite')
+
+  def test_connection_profile(self):
+    with connection.cursor() as cursor:
+      cursor.execute('PRAGMA busy_timeout')
+      self.assertEqual(cursor.fetchone()[0], 5000)
+      cursor.execute('PRAGMA synchronous')
+      self.assertEqual(cursor.fetchone()[0], 1)
+    self.assertEqual(connection.transaction_mode, 'IMMEDIATE')
+
+  @override_settings(SQLITE_WRITE_LANE=True)
+  def test_write_lane_held_by_outermost_transaction(self):
+    lane = lane_for(connection.settings_dict['NAME'])
+    with transaction.atomic():
+      self.assertTrue(lane.locked())
+      with transaction.atomic():
+        pass
+      self.assertTrue(lane.locked())
+    self.assertFalse(lane.locked())
+    with self.assertRaises(ValueError):
+      with transaction.atomic():
+        raise ValueError
+    self.assertFalse(lane.locked())
+
+  @override_settings(SQLITE_WRITE_LANE=True)
+  def test_writers_wait_in_lane(self):
+    order = []
+
+    def second_writer():
+      with transaction.atomic():
+        order.append('second')
+      connection.close()
+
+    with transaction.atomic():
+      Category.objects.create(name='Primera')
+      writer = threading.Thread(target=second_writer)
+      writer.start()
+      time.sleep(0.2)
+      order.append('first')
+    writer.join()
+    self.assertEqual(order, ['first', 'second'])
+
+
+class StockHistoryApiTests(TestCase):
+  """Historial paginado y totales diarios de /items/<id>/history/"""
+
+  @classmethod
+  def setUpTestData(cls):
+    cls.user = User.objects.create(username='historial')
+    cls.item = Item.objects.create(
+      name='Taladro', description='', category=Category.objects.create(name='Herramientas'),
+      location=Location.objects.create(name='Bodega'),
+      status=Status.objects.create(name=Status.StatusChoices.DISPONIBLE), stock=0,
+    )
+    # Lunes 5, martes 6 y lunes 12 de enero; date es auto_now_add
+    cls.moves = [
+      ('2026-01-05T09:00', 'add', 10),
+      ('2026-01-05T18:00', 'subtract', 3),
+      ('2026-01-06T10:00', 'subtract', 2),
+      ('2026-01-12T08:00', 'add', 5),
+    ]
+    stock = 0
+    for moment, action, quantity in cls.moves:
+      new_stock = stock + quantity if action == 'add' else stock - quantity
+      with mock.patch('django.utils.timezone.now', return_value=history.parse_bound(moment)):
+        StockHistory.objects.create(
+          item=cls.item, action=action, quantity=quantity, old_stock=stock, new_stock=new_stock, user='x',
+        )
+      stock = new_stock
+    Item.objects.filter(pk=cls.item.pk).update(stock=stock)
+
+  def setUp(self):
+    self.client = APIClient()
+    self.client.force_authenticate(self.user)
+
+  def fetch(self, query='', status=200):
+    response = self.client.get(f'/items/{self.item.id}/history/{query}')
+    self.assertEqual(response.status_code, status, response.content)
+    return response.json()
+
+  def daily(self):
+    return list(StockDaily.objects.filter(item=self.item).order_by('day').values(
+      'day', 'stock_in', 'stock_out', 'movements', 'closing_stock', 'closing_at'
+    ))
+
+  def test_pages_newest_first(self):
+    page = self.fetch('?limit=3')
+    self.assertEqual([row['quantity'] for row in page['results']], [5, 2, 3])
+    rest = self.fetch(f'?limit=3&cursor={page["next"]}')
+    self.assertEqual([row['quantity'] for row in rest['results']], [10])
+    self.assertIsNone(rest['next'])
+
+  def test_range_filter(self):
+    page = self.fetch('?from=2026-01-06&to=2026-01-06')
+    self.assertEqual([row['quantity'] for row in page['results']], [2])
+    page = self.fetch('?from=2026-01-05T12:00')
+    self.assertEqual(len(page['results']), 3)
+
+  def test_daily_totals(self):
+    data = self.fetch('?group=day&from=2026-01-01&to=2026-01-31')
+    self.assertEqual(data['opening_stock'], 0)
+    self.assertEqual(data['results'], [
+      {'period': '2026-01-05', 'in': 10, 'out': 3, 'movements': 2, 'closing_stock': 7},
+      {'period': '2026-01-06', 'in': 0, 'out': 2, 'movements': 1, 'closing_stock': 5},
+      {'period': '2026-01-12', 'in': 5, 'out': 0, 'movements': 1, 'closing_stock': 10},
+    ])
+    # El stock al abrir sale del cierre del día anterior al rango
+    self.assertEqual(self.fetch('?group=day&from=2026-01-06&to=2026-01-31')['opening_stock'], 7)
+
+  def test_weekly_totals(self):
+    data = self.fetch('?group=week&from=2026-01-01&to=2026-01-31')
+    self.assertEqual(data['results'], [
+      {'period': '2026-01-05', 'in': 10, 'out': 5, 'movements': 3, 'closing_stock': 5},
+      {'period': '2026-01-12', 'in': 5, 'out': 0, 'movements': 1, 'closing_stock': 10},
+    ])
+
+  def test_batch_updates_rollup(self):
+    with transaction.atomic():
+      applied, _, _ = apply_stock_batch([
+        {'item_id': self.item.id, 'type': 'subtract', 'quantity': 4},
+        {'item_id': self.item.id, 'type': 'add', 'quantity': 1},
+      ], 'x')
+    self.assertTrue(applied)
+    today = self.daily()[-1]
+    self.assertEqual((today['stock_in'], today['stock_out'], today['movements'], today['closing_stock']), (1, 4, 2, 7))
+
+  def test_rebuild_matches_incremental(self):
+    incremental = self.daily()
+    StockDaily.objects.all().delete()
+    self.assertEqual(history.rebuild_daily(), 3)
+    self.assertEqual(self.daily(), incremental)
+
+  def test_errors(self):
+    self.fetch('?from=ayer', status=400)
+    self.fetch('?group=month', status=400)
+    self.fetch('?group=day&from=2026-02-01&to=2026-01-01', status=400)
+    self.fetch('?cursor=x', status=400)
+    self.fetch('?to=9999-12-31', status=400)
+    self.fetch('?group=day&to=9999-12-31', status=400)
+    self.fetch('?group=day&to=0001-01-02', status=400)
+    self.fetch('?from=0001-01-01T00:00:00%2B14:00', status=400)
+    response = self.client.get('/items/0/history/')
+    self.assertEqual(response.status_code, 404)
+
+
+@override_settings(INVENTORY_COUNTERS=True)
+class InventoryCounterTests(TestCase):
+  """Los contadores materializados deben coincidir con la agregación sobre api_item"""
+
+  @classmethod
+  def setUpTestData(cls):
+    cls.category = Category.objects.create(name='Herramientas')
+    cls.location = Location.objects.create(name='Bodega')
+    cls.available = Status.objects.create(name=Status.StatusChoices.DISPONIBLE)
+    cls.repair = Status.objects.create(name=Status.StatusChoices.MANTENIMIENTO)
+
+  def create(self, name, status):
+    return Item.objects.create(
+      name=name, description='', category=self.category, location=self.location, status=status,
+    )
+
+  def assertCountersMatch(self):
+    self.assertEqual(counters.counter_summary(), counters.aggregate_summary())
+
+  def test_summary_is_one_query(self):
+    self.create('Taladro', self.available)
+    with self.assertNumQueries(1):
+      counters.counter_summary()
+    with self.assertNumQueries(1):
+      counters.aggregate_summary()
+    with self.assertNumQueries(1), override_settings(INVENTORY_COUNTERS=False):
+      counters.dashboard_summary()
+
+  def test_create_delete_and_status_change(self):
+    drill = self.create('Taladro', self.available)
+    saw = self.create('Sierra', self.available)
+    self.create('Lija', self.repair)
+    self.assertCountersMatch()
+    self.assertEqual(counters.counter_summary()['Disponible'], 2)
+
+    saw = Item.objects.get(pk=saw.pk)
+    saw.status = self.repair
+    saw.save()
+    self.assertCountersMatch()
+    self.assertEqual(counters.counter_summary()['Mantenimiento'], 2)
+
+    drill.delete()
+    self.assertCountersMatch()
+    self.assertEqual(counters.counter_summary()['total_items'], 2)
+
+  def test_status_rename_rebuilds(self):
+    self.create('Taladro', self.available)
+    self.create('Lija', self.repair)
+    with self.captureOnCommitCallbacks(execute=True):
+      self.repair.name = Status.StatusChoices.NO_DISPONIBLE
+      self.repair.save()
+    self.assertCountersMatch()
+    self.assertEqual(counters.counter_summary()['no_disponibles'], 1)
+    self.assertEqual(counters.counter_summary()['Mantenimiento'], 0)
+
+
+class LowStockAlertTests(TestCase):
+  """La alerta de bajo stock se encola solo al cruzar el mínimo y con la transacción"""
+
+  @classmethod
+  def setUpTestData(cls):
+    cls.admins = [User.objects.create(username=f'admin{i}', role='admin') for i in range(2)]
+    cls.responsible = User.objects.create(username='encargado', role='pasante')
+    cls.category = Category.objects.create(name='Herramientas')
+    cls.location = Location.objects.create(name='Bodega')
+    cls.status = Status.objects.create(name=Status.StatusChoices.DISPONIBLE)
+
+  def create(self, stock, min_stock=2):
+    return Item.objects.create(
+      name='Taladro', description='', category=self.category, location=self.location, status=self.status,
+      stock=stock, min_stock=min_stock, responsible_user=self.responsible,
+    )
+
+  def alerts(self):
+    return list(Job.objects.filter(task='api.tasks.notify_low_stock').values_list('kwargs', flat=True))
+
+  def test_crossed_low_stock(self):
+    self.assertTrue(crossed_low_stock(2, 1, 2))
+    self.assertTrue(crossed_low_stock(5, 0, 2))
+    self.assertFalse(crossed_low_stock(1, 0, 2))
+    self.assertFalse(crossed_low_stock(3, 2, 2))
+    self.assertFalse(crossed_low_stock(1, 3, 2))
+
+  def test_saving_already_low_item_sends_no_alert(self):
+    self.create(stock=1)
+    self.assertEqual(len(self.alerts()), 1)
+    item = Item.objects.get(name='Taladro')
+    item.description = 'Percutor'
+    item.save()
+    item.stock = 0
+    item.save()
+    self.assertEqual(len(self.alerts()), 1)
+
+  def test_crossing_sends_exactly_one_alert(self):
+    item = self.create(stock=5)
+    self.assertEqual(self.alerts(), [])
+    item = Item.objects.get(pk=item.pk)
+    item.stock = 1
+    item.save()
+    item.save()
+    self.assertEqual(
+      self.alerts(), [{'item_name': 'Taladro', 'stock': 1, 'responsible_user_id': self.responsible.id}]
+    )
+
+  def test_nothing_enqueued_on_rollback(self):
+    item = self.create(stock=5)
+    with self.assertRaises(RuntimeError), transaction.atomic():
+      item.stock = 0
+      item.save()
+      raise RuntimeError
+    self.assertEqual(self.alerts(), [])
+
+  def test_notify_many_uses_one_bulk_insert(self):
+    recipients = [*self.admins, self.responsible]
+    # Con los contadores ya creados cada receptor cuesta un UPDATE
+    NotificationCounter.objects.bulk_create(NotificationCounter(user=user) for user in recipients)
+    alerts = [('Taladro', 1, self.responsible.id), ('Sierra', 0, self.admins[0].id), ('Lija', 0, None)]
+    # Administradores + SAVEPOINT + INSERT + un UPDATE por receptor + RELEASE
+    with self.assertNumQueries(4 + len(recipients)) as ctx:
+      created = notify_low_stock_many(alerts)
+    inserts = [q['sql'] for q in ctx.captured_queries if q['sql'].startswith('INSERT')]
+    self.assertEqual(len(inserts), 1)
+    # El responsable que también es administrador recibe una sola alerta
+    self.assertEqual(len(created), 3 + 2 + 2)
+    self.assertEqual(
+      sorted(Notification.objects.filter(user=self.responsible).values_list('message', flat=True)),
+      ['¡Alerta! Producto Taladro con bajo stock (1 unidades)'],
+    )
+    for user in recipients:
+      self.assertEqual(unread_summary(user.id)[0], Notification.objects.filter(user=user).count())
+
+
+class JobQueueTests(TestCase):
+  """Trabajos cuyo worker murió sin registrar el resultado"""
+
+  def expired(self, attempts, max_attempts=3):
+    return Job.objects.create(
+      task='api.tasks.noop', state=Job.State.RUNNING, attempts=attempts, max_attempts=max_attempts,
+      locked_by='muerto', locked_until=timezone.now() - timedelta(seconds=1),
+    )
+
+  def test_expired_job_is_reclaimed(self):
+    job = self.expired(attempts=1)
+    claimed = jobs.claim('vivo')
+    self.assertEqual(claimed.id, job.id)
+    self.assertEqual((claimed.attempts, claimed.locked_by), (2, 'vivo'))
+
+  def test_expired_job_without_attempts_fails(self):
+    job = self.expired(attempts=3)
+    self.assertIsNone(jobs.claim('vivo'))
+    job.refresh_from_db()
+    self.assertEqual((job.state, job.attempts, job.locked_until), (Job.State.FAILED, 3, None))
+    self.assertTrue(job.last_error)
+
+  def test_skip_locked_path(self):
+    self.expired(attempts=3)
+    job = self.expired(attempts=0)
+    with mock.patch.object(connection.features, 'has_select_for_update_skip_locked', True):
+      self.assertEqual(jobs.claim('vivo').id, job.id)
+      self.assertIsNone(jobs.claim('vivo'))
+    self.assertEqual(Job.objects.filter(state=Job.State.FAILED).count(), 1)
+
+
+class StockChangeTests(TestCase):
+  """UPDATE condicional de apply_stock_change, con RETURNING y sin él"""
+
+  @classmethod
+  def setUpTestData(cls):
+    cls.item = Item.objects.create(
+      name='Taladro', description='', category=Category.objects.create(name='Herramientas'),
+      location=Location.objects.create(name='Bodega'),
+      status=Status.objects.create(name=Status.StatusChoices.DISPONIBLE), stock=5, min_stock=2,
+    )
+
+  def stock(self):
+    return Item.objects.values_list('stock', flat=True).get(pk=self.item.pk)
+
+  def check_contract(self):
+    with transaction.atomic():
+      change = apply_stock_change(self.item.id, 'add', 3)
+    self.assertEqual((change.item_id, change.old_stock, change.new_stock), (self.item.id, 5, 8))
+    self.assertEqual((change.min_stock, change.name), (2, 'Taladro'))
+
+    with transaction.atomic():
+      change = apply_stock_change(self.item.id, 'subtract', 8)
+    self.assertEqual((change.old_stock, change.new_stock), (8, 0))
+
+    with self.assertRaises(InsufficientStock) as raised, transaction.atomic():
+      apply_stock_change(self.item.id, 'subtract', 1)
+    self.assertEqual((raised.exception.available, raised.exception.requested), (0, 1))
+    self.assertEqual(self.stock(), 0)
+
+    with self.assertRaises(Item.DoesNotExist), transaction.atomic():
+      apply_stock_change(0, 'add', 1)
+    with self.assertRaises(ValueError):
+      apply_stock_change(self.item.id, 'transfer', 1)
+
+  def test_update_returning(self):
+    if not stock_module._supports_update_returning(connection):
+      self.skipTest("La base de pruebas no soporta UPDATE ... RETURNING")
+    self.check_contract()
+
+  def test_select_for_update_fallback(self):
+    with mock.patch.object(stock_module, '_supports_update_returning', return_value=False):
+      self.check_contract()
+
+
+class StockBatchTests(TestCase):
+  """Contrato de /items/update-stock/batch/: todo o nada y un resultado por operación"""
+
+  @classmethod
+  def setUpTestData(cls):
+    cls.user = User.objects.create(username='lotes')
+    category = Category.objects.create(name='Herramientas')
+    location = Location.objects.create(name='Bodega')
+    status = Status.objects.create(name=Status.StatusChoices.DISPONIBLE)
+    cls.first, cls.second = [
+      Item.objects.create(
+        name=name, description='', category=category, location=location, status=status, stock=5,
+      )
+      for name in ('Taladro', 'Sierra')
+    ]
+
+  def setUp(self):
+    self.client = APIClient()
+    self.client.force_authenticate(self.user)
+
+  def post(self, operations, status=200):
+    response = self.client.post('/items/update-stock/batch/', {'operations': operations}, format='json')
+    self.assertEqual(response.status_code, status, response.content)
+    return response.json()
+
+  def stocks(self):
+    return dict(Item.objects.filter(pk__in=[self.first.pk, self.second.pk]).values_list('id', 'stock'))
+
+  def test_same_item_operations_chain(self):
+    data = self.post([
+      {'item_id': self.first.id, 'type': 'add', 'quantity': 3},
+      {'item_id': self.first.id, 'type': 'subtract', 'quantity': 8},
+      {'item_id': self.second.id, 'type': 'subtract', 'quantity': 1},
+    ])
+    self.assertTrue(data['success'])
+    self.assertEqual(
+      [(r['index'], r['old_stock'], r['stock']) for r in data['results']], [(0, 5, 8), (1, 8, 0), (2, 5, 4)]
+    )
+    self.assertEqual(self.stocks(), {self.first.id: 0, self.second.id: 4})
+    entries = StockHistory.objects.filter(item=self.first).order_by('id')
+    self.assertEqual([e.pk for e in entries], [r['history_id'] for r in data['results'][:2]])
+    self.assertEqual([(e.old_stock, e.new_stock, e.user) for e in entries], [(5, 8, 'lotes'), (8, 0, 'lotes')])
+
+  def test_invalid_operation_rolls_back_batch(self):
+    data = self.post([
+      {'item_id': self.first.id, 'type': 'add', 'quantity': 1},
+      {'item_id': self.second.id, 'type': 'subtract', 'quantity': 6},
+    ], status=400)
+    self.assertFalse(data['success'])
+    self.assertEqual(self.stocks(), {self.first.id: 5, self.second.id: 5})
+    self.assertFalse(StockHistory.objects.exists())
+
+  def test_errors_per_operation(self):
+    data = self.post([
+      {'item_id': self.first.id, 'type': 'add', 'quantity': 1},
+      {'item_id': 'x', 'type': 'add', 'quantity': 1},
+      {'item_id': self.first.id, 'type': 'transfer', 'quantity': 1},
+      {'item_id': self.first.id, 'type': 'add', 'quantity': 0},
+      {'item_id': 0, 'type': 'add', 'quantity': 1},
+      {'item_id': self.second.id, 'type': 'subtract', 'quantity': 6},
+      'borrar',
+    ], status=400)
+    errors = [r.get('error', '') for r in data['results']]
+    self.assertEqual([r['index'] for r in data['results']], list(range(7)))
+    self.assertFalse(any(r['success'] for r in data['results']))
+    self.assertIn('No aplicada', errors[0])
+    self.assertEqual(errors[1], 'item_id inválido')
+    self.assertIn('Tipo de acción inválida', errors[2])
+    self.assertIn('entero positivo', errors[3])
+    self.assertEqual(errors[4], 'Ítem no encontrado')
+    self.assertIn('Stock insuficiente (disponible: 5, requerido: 6)', errors[5])
+    self.assertEqual(errors[6], 'La operación debe ser un objeto')
+    self.assertEqual(self.stocks(), {self.first.id: 5, self.second.id: 5})
+
+  def test_empty_or_oversized_batch(self):
+    self.post([], status=400)
+    with mock.patch.object(views, 'BATCH_MAX_OPERATIONS', 1):
+      self.post([{'item_id': self.first.id, 'type': 'add', 'quantity': 1}] * 2, status=400)
+
+
+class VersionedCacheTests(TestCase):
+  """Versiones de tabla, ETag y 304 de api/cache.py"""
+
+  @classmethod
+  def setUpTestData(cls):
+    cls.user = User.objects.create(username='etag')
+    cls.category = Category.objects.create(name='Herramientas')
+    cls.item = Item.objects.create(
+      name='Taladro', description='', category=cls.category, location=Location.objects.create(name='Bodega'),
+      status=Status.objects.create(name=Status.StatusChoices.DISPONIBLE), stock=5,
+    )
+
+  def setUp(self):
+    cache.clear()
+    self.client = APIClient()
+    self.client.force_authenticate(self.user)
+
+  def test_save_and_delete_bump_version(self):
+    before, = table_versions('category')
+    with self.captureOnCommitCallbacks(execute=True):
+      Category.objects.create(name='Pinturas')
+    after_save, = table_versions('category')
+    self.assertNotEqual(before, after_save)
+    with self.captureOnCommitCallbacks(execute=True):
+      Category.objects.filter(name='Pinturas').delete()
+    self.assertNotEqual(table_versions('category')[0], after_save)
+
+  def test_cached_json_rebuilds_after_bump(self):
+    calls = []
+    build = lambda: calls.append(1) or {'n': len(calls)}
+    self.assertEqual(cached_json('prueba', ['category'], build), cached_json('prueba', ['category'], build))
+    self.assertEqual(len(calls), 1)
+    bump_version('category')
+    self.assertEqual(json.loads(cached_json('prueba', ['category'], build)), {'n': 2})
+
+  def test_reference_list_not_modified(self):
+    first = self.client.get('/category/all/')
+    etag = first['ETag']
+    self.assertEqual(self.client.get('/category/all/', HTTP_IF_NONE_MATCH=etag).status_code, 304)
+    bump_version('category')
+    second = self.client.get('/category/all/', HTTP_IF_NONE_MATCH=etag)
+    self.assertEqual(second.status_code, 200)
+    self.assertNotEqual(second['ETag'], etag)
+
+  def test_item_etag_with_process_local_cache(self):
+    url = f'/items/{self.item.id}/'
+    etag = self.client.get(url)['ETag']
+    self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+    # Otro worker: su LocMemCache está vacío pero lee las mismas versiones
+    cache.clear()
+    self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+    with self.captureOnCommitCallbacks(execute=True), transaction.atomic():
+      apply_stock_change(self.item.id, 'add', 1)
+    response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+    self.assertEqual(response.status_code, 200)
+    self.assertEqual(response.json()['stock'], 6)
+
+  def test_versions_live_in_database(self):
+    before, = table_versions('item')
+    self.assertEqual(TableVersion.objects.get(table='item').version, before)
+    cache.clear()
+    bump_version('item')
+    self.assertEqual(table_versions('item'), (before + 1,))
+    # Si falta la fila se crea con una versión nueva
+    TableVersion.objects.all().delete()
+    self.assertNotIn(table_versions('item')[0], (before, before + 1))
+
+class ItemImportTests(TestCase):
+  """Errores por fila y archivos inválidos en la importación masiva"""
+
+  HEADER = 'name,category,location,stock\n'
+
+  @classmethod
+  def setUpTestData(cls):
+    cls.user = User.objects.create(username='importa')
+    Status.objects.create(name=Status.StatusChoices.DISPONIBLE)
+
+  def run_import(self, body, chunk_size=1000):
+    return ItemImporter(chunk_size=chunk_size).run(io.BytesIO(body), 'csv')
+
+  def test_integer_out_of_range_is_row_error(self):
+    summary = self.run_import((
+      self.HEADER + f'Taladro,Herramientas,Bodega,{MAX_INTEGER}\n'
+      'Sierra,Herramientas,Bodega,99999999999999999999999\n'
+    ).encode())
+    self.assertEqual((summary['created'], summary['failed']), (1, 1))
+    self.assertEqual(summary['errors'], [{'row': 3, 'errors': [f'stock debe ser menor o igual a {MAX_INTEGER}']}])
+
+  def test_insert_overflow_is_row_error(self):
+    # Si un valor fuera de rango llega igual al INSERT, se aísla la fila
+    with mock.patch('api.importer.MAX_INTEGER', 2 ** 80):
+      summary = self.run_import((
+        self.HEADER + 'Taladro,Herramientas,Bodega,3\nSierra,Herramientas,Bodega,99999999999999999999999\n'
+      ).encode())
+    self.assertEqual((summary['created'], summary['failed']), (1, 1))
+    self.assertEqual(summary['errors'][0]['row'], 3)
+    self.assertEqual(list(Item.objects.values_list('name', flat=True)), ['Taladro'])
+
+  def test_not_utf8(self):
+    with self.assertRaisesMessage(ImportFormatError, 'UTF-8'):
+      self.run_import((self.HEADER + 'Martillo de acero,Herramientas,Bodega,2\n').encode('utf-16'))
+    self.assertFalse(Item.objects.exists())
+
+  def test_partial_failure_is_reported(self):
+    # Una fila en Latin-1 después de más de un búfer de lectura en UTF-8
+    good = ''.join(f'Taladro {i},Herramientas,Bodega,1\n' for i in range(400)).encode()
+    body = self.HEADER.encode() + good + 'Señal,Herramientas,Bodega,1\n'.encode('latin-1')
+    client = APIClient()
+    client.force_authenticate(self.user)
+    upload = SimpleUploadedFile('items.csv', body, content_type='text/csv')
+    response = client.post('/items/import/', {'file': upload, 'chunk_size': 100}, format='multipart')
+    self.assertEqual(response.status_code, 400)
+    data = response.json()
+    self.assertIn('UTF-8', data['error'])
+    self.assertGreater(data['created'], 0)
+    self.assertEqual(data['created'], Item.objects.count())
+    self.assertEqual(data['rows_read'], data['created'] + data['failed'])
+
+
+class ExportTests(TestCase):
+  """Exportación en flujo de /export/items/ y /export/stock-history/"""
+
+  @classmethod
+  def setUpTestData(cls):
+    cls.user = User.objects.create(username='exporta')
+    category = Category.objects.create(name='Herramientas')
+    location = Location.objects.create(name='Bodega')
+    status = Status.objects.create(name=Status.StatusChoices.DISPONIBLE)
+    cls.items = [
+      Item.objects.create(
+        name=f'Taladro "{i}", ñ', description='', category=category, location=location, status=status,
+        stock=i, responsible_user=cls.user,
+      )
+      for i in range(30)
+    ]
+    for item in cls.items[:2]:
+      StockHistory.objects.create(item=item, action='add', quantity=1, old_stock=0, new_stock=1, user='exporta')
+
+  def setUp(self):
+    self.client = APIClient()
+    self.client.force_authenticate(self.user)
+
+  def export(self, url):
+    response = self.client.get(url)
+    self.assertEqual(response.status_code, 200)
+    self.assertTrue(response.streaming)
+    return response, b''.join(response.streaming_content)
+
+  def test_items_csv(self):
+    response, body = self.export('/export/items/')
+    self.assertEqual(response['Content-Type'], 'text/csv; charset=utf-8')
+    self.assertRegex(response['Content-Disposition'], r'^attachment; filename="items-\d{8}\.csv"$')
+    rows = list(csv.reader(io.StringIO(body.decode('utf-8'))))
+    self.assertEqual(rows[0], [name for name, _ in ITEM_COLUMNS])
+    self.assertEqual(len(rows), 31)
+    first = dict(zip(rows[0], rows[1]))
+    self.assertEqual((first['name'], first['category'], first['responsible_user']), ('Taladro "0", ñ', 'Herramientas', 'exporta'))
+    self.assertEqual(first['created_at'], self.items[0].created_at.isoformat())
+
+  def test_items_jsonl_gzip(self):
+    response, body = self.export('/export/items/?type=jsonl&gzip=1')
+    self.assertEqual(response['Content-Type'], 'application/gzip')
+    self.assertTrue(response['Content-Disposition'].endswith('.jsonl.gz"'))
+    rows = [json.loads(line) for line in gzip.decompress(body).decode('utf-8').splitlines()]
+    self.assertEqual([row['id'] for row in rows], [item.id for item in self.items])
+    self.assertEqual(rows[5]['stock'], 5)
+
+  def test_rows_are_streamed_in_blocks(self):
+    with mock.patch('api.export.STREAM_BUFFER_SIZE', 256):
+      response = self.client.get('/export/items/')
+      chunks = list(response.streaming_content)
+    self.assertGreater(len(chunks), 5)
+    # Cada bloque termina en un fin de fila: nunca se parte una línea
+    self.assertTrue(all(chunk.endswith(b'\r\n') for chunk in chunks))
+
+  def test_stock_history(self):
+    item = self.items[1]
+    _, body = self.export(f'/export/stock-history/?type=jsonl&item={item.id}')
+    rows = [json.loads(line) for line in body.decode('utf-8').splitlines()]
+    self.assertEqual([(row['item_id'], row['item'], row['new_stock']) for row in rows], [(item.id, item.name, 1)])
+    _, body = self.export('/export/stock-history/')
+    self.assertEqual(body.decode('utf-8').splitlines()[0], ','.join(name for name, _ in STOCK_HISTORY_COLUMNS))
+
+  def test_invalid_options(self):
+    self.assertEqual(self.client.get('/export/items/?type=xml').status_code, 400)
+    self.assertEqual(self.client.get('/export/stock-history/?item=x').status_code, 400)
+
+
+def png_bytes(size=(64, 64), color='red'):
+  from PIL import Image
+  buffer = io.BytesIO()
+  Image.new('RGB', size, color).save(buffer, 'PNG')
+  return buffer.getvalue()
+
+
+class ItemImageTests(TestCase):
+  """Validación de subidas y conteo de referencias de api/images.py"""
+
+  @classmethod
+  def setUpTestData(cls):
+    cls.item = Item.objects.create(
+      name='Taladro', description='', category=Category.objects.create(name='Herramientas'),
+      location=Location.objects.create(name='Bodega'),
+      status=Status.objects.create(name=Status.StatusChoices.DISPONIBLE),
+    )
+
+  def setUp(self):
+    media = tempfile.mkdtemp()
+    self.addCleanup(shutil.rmtree, media, ignore_errors=True)
+    settings = override_settings(MEDIA_ROOT=media)
+    settings.enable()
+    self.addCleanup(settings.disable)
+
+  def upload(self, content=None):
+    return SimpleUploadedFile('foto.png', content or png_bytes(), content_type='image/png')
+
+  def test_invalid_files(self):
+    with self.assertRaisesMessage(images.InvalidImage, 'no es una imagen'):
+      images.store_upload(self.upload(b'no soy una imagen'))
+    with mock.patch('PIL.Image.MAX_IMAGE_PIXELS', 100):
+      # Más del doble del límite: PIL lanza DecompressionBombError
+      with self.assertRaisesMessage(images.InvalidImage, 'demasiados píxeles'):
+        images.store_upload(self.upload())
+
+  def test_same_content_is_stored_once(self):
+    first = images.store_upload(self.upload())
+    second = images.store_upload(self.upload())
+    self.assertEqual(first.pk, second.pk)
+    self.assertTrue(images.default_storage.exists(first.original))
+
+  def test_attach_and_collect(self):
+    images.attach(self.item, self.upload())
+    self.item.save()
+    stored = StoredImage.objects.get()
+    self.assertEqual(stored.ref_count, 1)
+
+    images.detach(self.item)
+    self.item.save()
+    stored.refresh_from_db()
+    self.assertEqual(stored.ref_count, 0)
+    self.assertTrue(Job.objects.filter(task='api.tasks.collect_image', args=[stored.pk]).exists())
+    images.collect(stored.pk)
+    self.assertFalse(StoredImage.objects.exists())
+    self.assertFalse(images.default_storage.exists(stored.original))
+
+  def test_attach_recreates_image_collected_concurrently(self):
+    stored = images.store_upload(self.upload())
+    real_store_upload = images.store_upload
+    calls = []
+
+    def store_then_collect(upload):
+      # collect() confirma entre el get_or_create de attach y su incremento
+      result = real_store_upload(upload)
+      if not calls:
+        images.collect(result.pk)
+      calls.append(result.pk)
+      return result
+
+    with mock.patch.object(images, 'store_upload', side_effect=store_then_collect):
+      images.attach(self.item, self.upload())
+    self.item.save()
+    self.assertEqual(calls[0], stored.pk)
+    recreated = StoredImage.objects.get()
+    self.assertNotEqual(recreated.pk, stored.pk)
+    self.assertEqual((recreated.ref_count, self.item.stored_image_id), (1, recreated.pk))
+    self.assertTrue(images.default_storage.exists(recreated.original))
+
+
+class MediaServeTests(TestCase):
+  """Rangos, peticiones condicionales y 416 de api/media.py"""
+
+  def setUp(self):
+    root = tempfile.mkdtemp()
+    self.addCleanup(shutil.rmtree, root, ignore_errors=True)
+    settings = override_settings(MEDIA_ROOT=root)
+    settings.enable()
+    self.addCleanup(settings.disable)
+    self.root = Path(root)
+    (self.root / 'doc.txt').write_bytes(b'0123456789')
+    (self.root / 'vacio.txt').write_bytes(b'')
+
+  def get(self, path, **headers):
+    response = self.client.get(f'/media/{path}', **headers)
+    body = b''.join(response.streaming_content) if response.streaming else response.content
+    return response, body
+
+  def test_full_file(self):
+    response, body = self.get('doc.txt')
+    self.assertEqual((response.status_code, body), (200, b'0123456789'))
+    self.assertEqual((response['Content-Length'], response['Accept-Ranges']), ('10', 'bytes'))
+    self.assertEqual(response['Cache-Control'], f'public, max-age={media.MAX_AGE}')
+
+  def test_ranges(self):
+    for header, content_range, expected in [
+      ('bytes=2-5', 'bytes 2-5/10', b'2345'),
+      ('bytes=7-', 'bytes 7-9/10', b'789'),
+      ('bytes=-3', 'bytes 7-9/10', b'789'),
+      ('bytes=8-100', 'bytes 8-9/10', b'89'),
+    ]:
+      with self.subTest(header):
+        response, body = self.get('doc.txt', HTTP_RANGE=header)
+        self.assertEqual((response.status_code, response['Content-Range'], body), (206, content_range, expected))
+        self.assertEqual(response['Content-Length'], str(len(expected)))
+    # Varios rangos: se envía el archivo completo
+    self.assertEqual(self.get('doc.txt', HTTP_RANGE='bytes=0-1,4-5')[0].status_code, 200)
+
+  def test_unsatisfiable_ranges(self):
+    for path, header, size in [
+      ('doc.txt', 'bytes=10-', 10), ('doc.txt', 'bytes=5-2', 10), ('doc.txt', 'bytes=-0', 10),
+      ('vacio.txt', 'bytes=-5', 0), ('vacio.txt', 'bytes=0-', 0),
+    ]:
+      with self.subTest(path=path, header=header):
+        response, _ = self.get(path, HTTP_RANGE=header)
+        self.assertEqual((response.status_code, response['Content-Range']), (416, f'bytes */{size}'))
+
+  def test_if_range(self):
+    etag = self.get('doc.txt')[0]['ETag']
+    response, body = self.get('doc.txt', HTTP_RANGE='bytes=0-1', HTTP_IF_RANGE=etag)
+    self.assertEqual((response.status_code, body), (206, b'01'))
+    # Copia del cliente desactualizada: el archivo completo
+    response, body = self.get('doc.txt', HTTP_RANGE='bytes=0-1', HTTP_IF_RANGE='"otro"')
+    self.assertEqual((response.status_code, body), (200, b'0123456789'))
+
+  def test_conditional_requests(self):
+    first = self.get('doc.txt')[0]
+    self.assertEqual(self.get('doc.txt', HTTP_IF_NONE_MATCH=first['ETag'])[0].status_code, 304)
+    self.assertEqual(self.get('doc.txt', HTTP_IF_MODIFIED_SINCE=first['Last-Modified'])[0].status_code, 304)
+    self.assertEqual(self.get('doc.txt', HTTP_IF_NONE_MATCH='"otro"')[0].status_code, 200)
+
+  def test_hashed_names_are_immutable(self):
+    name = f'items/ab/{"ab" * 32}.png'
+    (self.root / 'items' / 'ab').mkdir(parents=True)
+    (self.root / name).write_bytes(b'png')
+    response, _ = self.get(name)
+    self.assertIn('immutable', response['Cache-Control'])
+    self.assertEqual(response['ETag'], f'"{"ab" * 32}"')
+
+  def test_sendfile_headers(self):
+    name = 'fotos/año 2024/50% ?.txt'
+    (self.root / 'fotos' / 'año 2024').mkdir(parents=True)
+    (self.root / name).write_bytes(b'x')
+    with mock.patch.object(media, 'SENDFILE', 'x-accel-redirect'):
+      response = self.client.get('/media/fotos/a%C3%B1o%202024/50%25%20%3F.txt')
+    self.assertEqual(response.status_code, 200)
+    self.assertEqual(response['X-Accel-Redirect'], '/protected-media/fotos/a%C3%B1o%202024/50%25%20%3F.txt')
+    self.assertEqual(response.content, b'')
+    with mock.patch.object(media, 'SENDFILE', 'x-sendfile'):
+      response = self.client.get('/media/doc.txt')
+    self.assertEqual(response['X-Sendfile'], str(self.root / 'doc.txt'))
+
+  def test_outside_media_root(self):
+    self.assertEqual(self.get('../manage.py')[0].status_code, 404)
+    (self.root / 'carpeta').mkdir()
+    self.assertEqual(self.get('carpeta')[0].status_code, 404)
+
+
+class MetricsTests(TestCase):
+  """Exposición de /metrics y suma de los fragmentos por hilo y por proceso"""
+
+  @classmethod
+  def setUpTestData(cls):
+    cls.user = User.objects.create(username='metricas')
+    Status.objects.create(name=Status.StatusChoices.DISPONIBLE)
+
+  def setUp(self):
+    metrics.registry.reset()
+    self.addCleanup(metrics.registry.reset)
+
+  def scrape(self):
+    response = self.client.get('/metrics')
+    self.assertEqual(response.status_code, 200)
+    self.assertEqual(response['Content-Type'], metrics.CONTENT_TYPE)
+    samples = {}
+    for line in response.content.decode('utf-8').splitlines():
+      if line and not line.startswith('#'):
+        name, value = line.rsplit(' ', 1)
+        samples[name] = float(value)
+    return samples, response.content.decode('utf-8')
+
+  def test_request_counters_and_histograms(self):
+    for _ in range(3):
+      self.assertEqual(self.client.get('/status/all/').status_code, 200)
+    self.client.get('/no-existe/')
+    samples, text = self.scrape()
+
+    labels = 'view="get_all_status",method="GET"'
+    self.assertEqual(samples[f'http_requests_total{{{labels},status="200"}}'], 3)
+    self.assertEqual(samples['http_requests_total{view="<unmatched>",method="GET",status="404"}'], 1)
+    self.assertIn('# TYPE http_request_duration_seconds histogram', text)
+    # Buckets acumulados: no decrecen y +Inf coincide con la cuenta
+    buckets = [
+      samples[f'http_request_duration_seconds_bucket{{{labels},le="{bound}"}}']
+      for bound in (*metrics.LATENCY_BUCKETS, '+Inf')
+    ]
+    self.assertEqual(buckets, sorted(buckets))
+    self.assertEqual(buckets[-1], samples[f'http_request_duration_seconds_count{{{labels}}}'])
+    self.assertEqual(buckets[-1], 3)
+    self.assertGreater(samples[f'http_response_size_bytes_sum{{{labels}}}'], 0)
+    # La propia petición a /metrics está en curso mientras se genera
+    self.assertEqual(samples['http_requests_in_flight'], 1)
+
+  def test_errors_are_counted(self):
+    with mock.patch.object(views, '_all_statuses', side_effect=RuntimeError('falla')):
+      cache.clear()
+      client = self.client_class(raise_request_exception=False)
+      self.assertEqual(client.get('/status/all/').status_code, 500)
+    samples, _ = self.scrape()
+    self.assertEqual(samples['http_request_errors_total{view="get_all_status",method="GET"}'], 1)
+
+  def test_thread_shards_are_summed(self):
+    def observe():
+      shard = metrics.registry.shard()
+      for value in (0.001, 0.2, 20):
+        shard.observe('http_request_duration_seconds', (('view', 'x'),), value)
+      shard.inc('http_requests_total', (('view', 'x'),))
+
+    threads = [threading.Thread(target=observe) for _ in range(4)]
+    for thread in threads:
+      thread.start()
+    for thread in threads:
+      thread.join()
+    values, histograms = metrics.registry.collect()
+    self.assertEqual(values[('http_requests_total', (('view', 'x'),))], 4)
+    counts = histograms[('http_request_duration_seconds', (('view', 'x'),))]
+    self.assertEqual((counts[0], counts[metrics.LATENCY_BUCKETS.index(0.25)], counts[-2]), (4, 4, 4))
+    self.assertAlmostEqual(counts[-1], 4 * 20.201)
+
+  def test_other_processes_are_merged(self):
+    directory = tempfile.mkdtemp()
+    self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+    # Un proceso que ya terminó: se conservan sus contadores, no sus gauges
+    dead = {
+      'pid': 2 ** 22 + 1,
+      'values': [
+        ['http_requests_total', [['view', 'x']], 5],
+        ['http_requests_in_flight', [], 2],
+      ],
+      'histograms': [],
+    }
+    Path(directory, 'metrics_1.json').write_text(json.dumps(dead))
+    metrics.registry.shard().inc('http_requests_total', (('view', 'x'),), 2)
+    with mock.patch.object(metrics, 'MULTIPROCESS_DIR', directory):
+      values, _ = metrics.collect_all()
+    self.assertEqual(values[('http_requests_total', (('view', 'x'),))], 7)
+    self.assertNotIn(('http_requests_in_flight', ()), values)
+
+
+class StreamingListTests(TestCase):
+  """?stream=1 en /items/all/ y /items/search/: mismo JSON, enviado por bloques"""
+
+  @classmethod
+  def setUpTestData(cls):
+    cls.user = User.objects.create(username='flujo')
+    category = Category.objects.create(name='Herramientas')
+    location = Location.objects.create(name='Bodega')
+    status = Status.objects.create(name=Status.StatusChoices.DISPONIBLE)
+    for i in range(40):
+      Item.objects.create(
+        name=f'Taladro {i:02}', description='Percutor' if i else 'Sierra circular',
+        category=category, location=location, status=status,
+      )
+
+  def setUp(self):
+    self.client = APIClient()
+    self.client.force_authenticate(self.user)
+
+  def assertSameAsPlain(self, url):
+    plain = self.client.get(url)
+    self.assertEqual(plain.status_code, 200)
+    streamed = self.client.get(url + ('&' if '?' in url else '?') + 'stream=1')
+    self.assertIsInstance(streamed, StreamingHttpResponse)
+    self.assertEqual(streamed['Content-Type'], 'application/json')
+    body = json.loads(b''.join(streamed.streaming_content))
+    self.assertEqual(body, plain.json())
+    return body
+
+  def test_item_list(self):
+    self.assertEqual(len(self.assertSameAsPlain('/items/all/')), 40)
+
+  def test_search(self):
+    self.assertEqual(len(self.assertSameAsPlain('/items/search/?q=taladro&limit=500')), 40)
+    self.assertEqual(len(self.assertSameAsPlain('/items/search/?q=sierra')), 1)
+    self.assertEqual(self.assertSameAsPlain('/items/search/?q=martillo'), [])
+
+  def test_empty_list(self):
+    Item.objects.all().delete()
+    self.assertEqual(self.assertSameAsPlain('/items/all/'), [])
+
+  def test_chunks_break_at_buffer_size(self):
+    with mock.patch('api.streaming.STREAM_BUFFER_SIZE', 512):
+      response = self.client.get('/items/search/?q=taladro&stream=1')
+      chunks = [chunk.decode('utf-8') for chunk in response.streaming_content]
+    self.assertGreater(len(chunks), 3)
+    # Todos menos el último llegan al tamaño del búfer sin pasarlo en más de una fila
+    row = len(json.dumps(json.loads(''.join(chunks))[0]))
+    for chunk in chunks[:-1]:
+      self.assertGreaterEqual(len(chunk), 512)
+      self.assertLess(len(chunk), 512 + row + 50)
+    self.assertTrue(chunks[-1].endswith(']'))
+
+  def test_async_iterator_matches_sync(self):
+    rows = [{'id': i, 'name': f'Taladro {i}'} for i in range(200)]
+
+    async def arows():
+      for row in rows:
+        yield row
+
+    async def collect():
+      return [block async for block in streaming.aiter_json_array(arows())]
+
+    with mock.patch('api.streaming.STREAM_BUFFER_SIZE', 256):
+      blocks = list(streaming.iter_json_array(rows))
+      self.assertEqual(async_to_sync(collect)(), blocks)
+    self.assertGreater(len(blocks), 1)
+    self.assertEqual(json.loads(''.join(blocks)), rows)
+    self.assertEqual(list(streaming.iter_json_array([])), ['[]'])
+
+
+class ItemSearchTests(TestCase):
+  """Índice de texto completo de api/search.py y /items/search/"""
+
+  @classmethod
+  def setUpTestData(cls):
+    cls.user = User.objects.create(username='busca')
+    cls.category = Category.objects.create(name='Herramientas')
+    cls.location = Location.objects.create(name='Bodega')
+    cls.status = Status.objects.create(name=Status.StatusChoices.DISPONIBLE)
+
+  def setUp(self):
+    if search.search_item_ids('x') is None:
+      self.skipTest("Sin índice de texto completo en esta base")
+    self.client = APIClient()
+    self.client.force_authenticate(self.user)
+
+  def create(self, name, description=''):
+    return Item.objects.create(
+      name=name, description=description, category=self.category, location=self.location, status=self.status,
+    )
+
+  def test_triggers_follow_insert_update_delete(self):
+    item = self.create('Taladro percutor')
+    self.assertEqual(search.search_item_ids('percutor'), [item.id])
+    item.name = 'Sierra circular'
+    item.save()
+    self.assertEqual(search.search_item_ids('percutor'), [])
+    self.assertEqual(search.search_item_ids('circular'), [item.id])
+    Item.objects.filter(pk=item.pk).update(description='Hoja de widia')
+    self.assertEqual(search.search_item_ids('widia'), [item.id])
+    item.delete()
+    self.assertEqual(search.search_item_ids('circular'), [])
+
+  def test_prefix_and_all_words(self):
+    drill = self.create('Taladro inalámbrico', 'Batería de litio')
+    self.create('Taladro de banco')
+    self.assertEqual(search.search_item_ids('tala inal'), [drill.id])
+    # Sin tildes también coincide (remove_diacritics)
+    self.assertEqual(search.search_item_ids('bateria'), [drill.id])
+    self.assertEqual(search.search_item_ids('ladro'), [])
+    self.assertEqual(search.search_item_ids('  '), [])
+
+  def test_name_hit_ranks_before_description_hit(self):
+    in_description = self.create('Caja de herramientas', 'Incluye martillo')
+    in_name = self.create('Martillo de goma')
+    self.assertEqual(search.search_item_ids('martillo'), [in_name.id, in_description.id])
+    response = self.client.get('/items/search/?q=martillo')
+    self.assertEqual([row['id'] for row in response.json()], [in_name.id, in_description.id])
+
+  def test_limit(self):
+    for i in range(5):
+      self.create(f'Tornillo {i}')
+    self.assertEqual(len(self.client.get('/items/search/?q=tornillo&limit=2').json()), 2)
+    self.assertEqual(len(search.search_item_ids('tornillo', limit=3)), 3)
+    self.assertEqual(self.client.get('/items/search/?q=tornillo&limit=x').status_code, 400)
+
+  def test_icontains_fallback(self):
+    drill = self.create('Taladro', 'Percutor')
+    search.uninstall(connection)
+    # Sin la tabla FTS la búsqueda avisa con None y la vista usa icontains
+    with self.assertLogs('api.search', 'WARNING'):
+      self.assertIsNone(search.search_item_ids('taladro'))
+      response = self.client.get('/items/search/?q=ladr')
+    self.assertEqual([row['id'] for row in response.json()], [drill.id])
@@ -1,8 +1,23 @@
 from rest_framework.response import Response
-from rest_framework.decorators import api_view, permission_classes
+from rest_framework.decorators import api_view, authentication_classes, permission_classes
 from rest_framework.permissions import IsAuthenticated, IsAdminUser
 from api.models import Notification, User, Location, Category, Item, StockHistory, Status
-from django.http import JsonResponse
+from api.asyncauth import async_login_required
+from api.pagination import InvalidCursor, akeyset_page, keyset_page, parse_limit
+from api.streaming import STREAM_CHUNK_SIZE, astream_json_array, stream_json_array, wants_stream
+from api import counters, export, history, images, jobs, search
+from api.export import FORMATS as EXPORT_FORMATS
+from api.cache import cached_json_response, versioned_condition, versioned_etag
+from api.importer import (
+  DEFAULT_CHUNK_SIZE as DEFAULT_IMPORT_CHUNK_SIZE, FORMATS as IMPORT_FORMATS, ImportFormatError,
+  ItemImporter, detect_format
+)
+from api.notifications import crossed_low_stock, mark_read, schedule_low_stock_alert, unread_summary
+from api.stock import (
+  ACTIONS, BATCH_MAX_OPERATIONS, InsufficientStock, apply_stock_batch, apply_stock_change,
+  parse_quantity
+)
+from django.http import Http404, JsonResponse, StreamingHttpResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.core.exceptions import ObjectDoesNotExist
 import json
@@ -16,10 +31,32 @@ from django.core.serializers.json import DjangoJSONEncoder
 from rest_framework import status
 from django.utils import timezone
 from rest_framework.views import APIView
+from rest_framework.settings import api_settings
+from rest_framework_simplejwt.authentication import JWTStatelessUserAuthentication
 from django.db import transaction
 import logging
 from django.http import JsonResponse
-from django.views.decorators.http import require_http_methods
+from django.views.decorators.http import condition, require_http_methods, require_safe
+from asgiref.sync import sync_to_async
+from rest_framework.utils.encoders import JSONEncoder as DRFJSONEncoder
+from django.utils.decorators import method_decorator
+
+# Listas de datos de referencia. Se sirven desde api/cache.py: solo se vuelven a
+# consultar cuando cambia la versión de su tabla.
+def _all_categories():
+  return list(Category.objects.all().values("id", "name"))
+
+def _all_locations():
+  return list(Location.objects.all().values("id", "name"))
+
+def _all_statuses():
+  return list(Status.objects.all().values("id", "name"))
+
+def _all_users():
+  return list(User.objects.all().values("id", "username", "email", "role"))
+
+def _user_choices():
+  return list(User.objects.all().values("id", "username"))
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
@@ -30,32 +67,52 @@ def get_user(request):
     "role": user.role
   })
 
-# Obtener todas las notificaciones del usuario autenticado
+# Notificaciones del usuario autenticado, de la más reciente a la más antigua,
+# paginadas con cursor (?limit=&cursor=). Con ?since_id=N devuelve solo las
+# posteriores a N en orden de llegada: el cliente agrega las nuevas sin releer
+# toda la bandeja.
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def get_notifications(request):
-  notifications = Notification.objects.filter(user=request.user).order_by('-created_at')
-    
-  notifications_data = [
-    {
-      "id": notif.id,
-      "message": notif.message,
-      "is_read": notif.is_read,
-      "created_at": notif.created_at.strftime("%Y-%m-%d %H:%M:%S"),
-    }
-    for notif in notifications
-  ]
-    
-  return Response({"notifications": notifications_data})
+  notifications = Notification.objects.filter(user=request.user).values(
+    'id', 'message', 'is_read', 'created_at'
+  )
+  order = ('-id',)
+  try:
+    limit = parse_limit(request.GET.get('limit'))
+    since_id = request.GET.get('since_id')
+    if since_id not in (None, ''):
+      try:
+        since_id = int(since_id)
+      except ValueError:
+        raise ValueError("El parámetro 'since_id' debe ser un entero")
+      notifications = notifications.filter(id__gt=since_id)
+      order = ('id',)
+    page, next_cursor = keyset_page(
+      notifications, order, cursor=request.GET.get('cursor'), limit=limit
+    )
+  except (InvalidCursor, ValueError) as e:
+    return Response({'error': str(e)}, status=400)
+
+  for notif in page:
+    notif['created_at'] = notif['created_at'].strftime("%Y-%m-%d %H:%M:%S")
+  return Response({"notifications": page, "next": next_cursor})
+
+# Globo de notificaciones: no leídas e id de la más reciente. El token JWT se
+# valida sin consultar al usuario, así que la respuesta cuesta una sola
+# búsqueda por llave primaria en api_notificationcounter.
+@api_view(['GET'])
+@authentication_classes([JWTStatelessUserAuthentication, *api_settings.DEFAULT_AUTHENTICATION_CLASSES])
+@permission_classes([IsAuthenticated])
+def notifications_unread_count(request):
+  unread, latest_id = unread_summary(request.user.id)
+  return Response({"unread": unread, "latest_id": latest_id})
 
 # Marcar todas las notificaciones como leídas
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
 def mark_all_as_read(request):
-  updated = Notification.objects.filter(
-    user=request.user, 
-    is_read=False
-  ).update(is_read=True)
+  updated = mark_read(request.user.id)
     
   return Response({
     "status": "success",
@@ -67,23 +124,21 @@ def mark_all_as_read(request):
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
 def mark_as_read(request, notif_id):
-  notification = get_object_or_404(Notification, id=notif_id, user=request.user)
-    
-  if not notification.is_read:
-    notification.is_read = True
-    notification.save()
+  if mark_read(request.user.id, notif_id):
     return Response({
       "status": "success",
       "message": "Notificación marcada como leída",
       "notification_id": notif_id
     })
+  get_object_or_404(Notification, id=notif_id, user=request.user)
   return Response({
     "status": "info",
     "message": "La notificación ya estaba marcada como leída",
     "notification_id": notif_id
   })
 
-# Eliminar una notificación específica
+# Eliminar una notificación específica. El receptor post_delete de
+# api/notifications.py descuenta las no leídas.
 @api_view(['DELETE'])
 @permission_classes([IsAuthenticated])
 def delete_notification(request, notif_id):
@@ -117,10 +172,12 @@ def send_notification(request):
         status=404
       )
         
-    notification = Notification.objects.create(
-      user=user,
-      message=message
-    )
+    # El contador de no leídas se ajusta en la misma transacción
+    with transaction.atomic():
+      notification = Notification.objects.create(
+        user=user,
+        message=message
+      )
         
     return Response({
       "status": "success",
@@ -140,30 +197,17 @@ def send_notification(request):
 
 
 @receiver(post_save, sender=Item)
-def check_low_stock(sender, instance, **kwargs):
-  # Notificar cuando el stock esté bajo
-  if instance.is_low_stock:
-    # Notificar al usuario responsable si existe
-    if instance.responsible_user:
-      Notification.objects.create(
-        user=instance.responsible_user,
-        message=f"¡Alerta! Producto {instance.name} con bajo stock ({instance.stock} unidades)"
-      )
-        
-    # Notificar también a los administradores
-    admins = User.objects.filter(role='admin')
-    for admin in admins:
-      Notification.objects.create(
-        user=admin,
-        message=f"¡Alerta! Producto {instance.name} con bajo stock ({instance.stock} unidades)"
-      )
+def check_low_stock(sender, instance, created, **kwargs):
+  # Notificar solo cuando el stock cruza el mínimo, no en cada guardado de un
+  # ítem que ya estaba bajo
+  if instance.is_low_stock and (created or not instance.was_low_stock):
+    schedule_low_stock_alert(instance.name, instance.stock, instance.responsible_user_id)
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
+@condition(etag_func=versioned_etag('user'))
 def get_all_users(request):
-  users = list(User.objects.all().values("id", "username", "email", "role"))
-  print(users)
-  return Response(users)
+  return cached_json_response(request, 'users-all', ['user'], _all_users)
 
 # Crear un nuevo usuario
 @csrf_exempt
@@ -255,9 +299,9 @@ def delete_user(request, pk):
 # Obtener todas las ubicaciones
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
+@condition(etag_func=versioned_etag('location'))
 def get_all_location(request):
-  locations = Location.objects.all().values("id", "name")
-  return Response(list(locations))
+  return cached_json_response(request, 'locations', ['location'], _all_locations)
 
 # Crear una nueva ubicación
 @api_view(['POST'])
@@ -310,9 +354,9 @@ def delete_location(request, pk):
 # Obtiene todas las categorías
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
+@condition(etag_func=versioned_etag('category'))
 def get_all_category(request):
-  categories = Category.objects.all().values("id", "name")
-  return Response(list(categories))
+  return cached_json_response(request, 'categories', ['category'], _all_categories)
 
 # Crear una nueva categoría
 @api_view(['POST'])
@@ -362,77 +406,150 @@ def delete_category(request, pk):
   except Exception as e:
     return Response({"error": str(e)}, status=500)
 
+SEARCH_DEFAULT_LIMIT = 50
+SEARCH_MAX_LIMIT = 500
+
 # Buscar items por nombre o descripción
+# Usa el índice de texto completo (FTS5 / tsvector) ordenado por relevancia;
+# cada palabra coincide por prefijo. ?limit= acota el número de resultados.
 @csrf_exempt
 def search_items(request):
-  term = request.GET.get('q', '')
-  items = Item.objects.filter(Q(name__icontains=term) | Q(description__icontains=term))
-
-  data = [
-    {
-      "id": item.id,
-      "name": item.name,
-      "description": item.description,
-      "location": item.location.name,
-      "category": item.category.name,
-      "status": item.status.name,
-    }
-    for item in items
-  ]
+  term = request.GET.get('q', '').strip()
+  stream = wants_stream(request)
+
+  try:
+    # En modo stream no hay límite por defecto
+    limit = parse_limit(
+      request.GET.get('limit'),
+      default=None if stream else SEARCH_DEFAULT_LIMIT,
+      maximum=None if stream else SEARCH_MAX_LIMIT
+    )
+  except ValueError as e:
+    return JsonResponse({"error": str(e)}, status=400)
+
+  items = Item.objects.select_related('location', 'category', 'status')
+  ids = search.search_item_ids(term, limit) if term else None
+
+  if ids is None:
+    # Sin término o sin índice de texto completo
+    items = items.filter(Q(name__icontains=term) | Q(description__icontains=term)).order_by('name', 'id')
+    if limit is not None:
+      items = items[:limit]
+    rows = items.iterator(chunk_size=STREAM_CHUNK_SIZE) if stream else items
+  else:
+    rows = _items_in_order(items, ids)
+
+  if stream:
+    return stream_json_array(_search_row(item) for item in rows)
+
+  data = [_search_row(item) for item in rows]
 
   return JsonResponse(data, safe=False)
 
+def _search_row(item):
+  return {
+    "id": item.id,
+    "name": item.name,
+    "description": item.description,
+    "location": item.location.name,
+    "category": item.category.name,
+    "status": item.status.name,
+  }
+
+def _items_in_order(queryset, ids):
+  # Trae los ítems por bloques respetando el orden de relevancia de `ids`
+  for start in range(0, len(ids), STREAM_CHUNK_SIZE):
+    chunk = ids[start:start + STREAM_CHUNK_SIZE]
+    found = queryset.in_bulk(chunk)
+    for item_id in chunk:
+      if item_id in found:
+        yield found[item_id]
+
 # Tarjetas del dashboard
+# Una sola consulta de agregación condicional, o una lectura por llave primaria
+# de los contadores materializados si INVENTORY_COUNTERS está activo
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def dashboard_summary(request):
-  total = Item.objects.count()
-  disponible = Item.objects.filter(status__name__iexact="Disponible").count()
-  mantenimiento = Item.objects.filter(status__name__iexact="Mantenimiento").count()
-  no_disponibles = Item.objects.filter(status__name__iexact="No disponible").count()
-
-  return Response({
-    "total_items": total,
-    "Disponible": disponible,
-    "Mantenimiento": mantenimiento,
-    "no_disponibles": no_disponibles
-  })
+  return Response(counters.dashboard_summary())
 
 class ItemPagination(PageNumberPagination):
   page_size = 10
   page_size_query_param = 'page_size'
   max_page_size = 100
 
+# Tablas cuyo contenido aparece en las respuestas de ítems (para el ETag)
+ITEM_TABLES = ('item', 'category', 'location', 'status', 'user')
+
+def _item_list_row(request, item):
+  image = images.image_urls(request, item)
+  return {
+    'id': item.id,
+    'name': item.name,
+    'description': item.description,
+    'image': image['list'] if image else None,
+    'image_original': image['original'] if image else None,
+    'category': item.category.name if item.category else None,
+    'location': item.location.name if item.location else None,
+    'status': item.status.name if item.status else None,
+    'qr_code': item.qr_code,
+    'created_at': item.created_at.strftime('%Y-%m-%d %H:%M:%S'),
+    'stock': item.stock,
+    'min_stock': item.min_stock,
+    'is_low_stock': item.is_low_stock,
+    'stock_status': item.stock_status,
+    'responsible_user': item.responsible_user.username if item.responsible_user else None
+  }
+
+def _item_queryset():
+  return Item.objects.select_related(
+    'category', 
+    'location', 
+    'status',
+    'responsible_user',
+    'stored_image'
+  )
+
+def _item_list_queryset(request):
+  items = _item_queryset().all()
+  # ?qr_code= devuelve el ítem de un código escaneado (índice api_item_qr_code_idx)
+  qr_code = request.GET.get('qr_code')
+  if qr_code:
+    items = items.filter(qr_code=qr_code)
+  return items
+
 # Obtener todos los items
+# Con ?limit= o ?cursor= se pagina por llave (name, id): cada página cuesta lo
+# mismo sin importar cuántas se hayan recorrido antes.
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
+@versioned_condition(*ITEM_TABLES)
 def get_all_item(request):
-  items = Item.objects.select_related(
-    'category', 
-    'location', 
-    'status',
-    'responsible_user'
-  ).all().order_by('name')
-    
-  data = []
-  for item in items:
-    item_data = {
-      'id': item.id,
-      'name': item.name,
-      'description': item.description,
-      'image': request.build_absolute_uri(item.image.url) if item.image else None,
-      'category': item.category.name if item.category else None,
-      'location': item.location.name if item.location else None,
-      'status': item.status.name if item.status else None,
-      'qr_code': item.qr_code,
-      'created_at': item.created_at.strftime('%Y-%m-%d %H:%M:%S'),
-      'stock': item.stock,
-      'min_stock': item.min_stock,
-      'is_low_stock': item.is_low_stock,
-      'stock_status': item.stock_status,
-      'responsible_user': item.responsible_user.username if item.responsible_user else None
-    }
-    data.append(item_data)
+  items = _item_list_queryset(request)
+
+  if 'limit' in request.GET or 'cursor' in request.GET:
+    try:
+      limit = parse_limit(request.GET.get('limit'))
+      page, next_cursor = keyset_page(
+        items, ('name', 'id'), cursor=request.GET.get('cursor'), limit=limit
+      )
+    except (InvalidCursor, ValueError) as e:
+      return JsonResponse({'error': str(e)}, status=400)
+
+    return JsonResponse({
+      'results': [_item_list_row(request, item) for item in page],
+      'next': next_cursor,
+    }, encoder=DjangoJSONEncoder)
+
+  items = items.order_by('name', 'id')
+
+  # ?stream=1 envía el arreglo fila por fila sin cargarlo completo en memoria
+  if wants_stream(request):
+    return stream_json_array(
+      _item_list_row(request, item) for item in items.iterator(chunk_size=STREAM_CHUNK_SIZE)
+    )
+
+  data = [_item_list_row(request, item) for item in items]
     
   return JsonResponse(data, safe=False, encoder=DjangoJSONEncoder)
 
@@ -458,49 +575,11 @@ def delete_item(request, item_id):
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
+@versioned_condition(*ITEM_TABLES)
 def item_detail(request, id):
   try:
-    item = Item.objects.select_related(
-      'category', 
-      'location', 
-      'status',
-      'responsible_user'
-    ).get(pk=id)
-
-    data = {
-      'id': item.id,
-      'name': item.name,
-      'description': item.description,
-      'stock': item.stock,
-      'min_stock': item.min_stock,
-      'is_low_stock': item.is_low_stock,
-      'stock_status': item.stock_status,
-      'category': {
-        'id': item.category.id,
-        'name': item.category.name
-      },
-      'location': {
-        'id': item.location.id,
-        'name': item.location.name
-      },
-      'status': {
-        'id': item.status.id,
-        'name': item.status.name
-      },
-      'qr_code': item.qr_code,
-      'created_at': item.created_at,
-      'responsible_user': None,
-      'image': request.build_absolute_uri(item.image.url) if item.image else None
-    }
-
-    if item.responsible_user:
-      data['responsible_user'] = {
-        'id': item.responsible_user.id,
-        'username': item.responsible_user.username,
-        'role': item.responsible_user.role or 'Usuario'
-      }
-            
-    return Response(data)
+    item = _item_queryset().get(pk=id)
+    return Response(_item_detail_data(request, item))
         
   except Item.DoesNotExist:
     return Response(
@@ -513,6 +592,74 @@ def item_detail(request, id):
       status=status.HTTP_500_INTERNAL_SERVER_ERROR
     )
 
+def _item_detail_data(request, item):
+  image = images.image_urls(request, item)
+
+  data = {
+    'id': item.id,
+    'name': item.name,
+    'description': item.description,
+    'stock': item.stock,
+    'min_stock': item.min_stock,
+    'is_low_stock': item.is_low_stock,
+    'stock_status': item.stock_status,
+    'category': {
+      'id': item.category.id,
+      'name': item.category.name
+    },
+    'location': {
+      'id': item.location.id,
+      'name': item.location.name
+    },
+    'status': {
+      'id': item.status.id,
+      'name': item.status.name
+    },
+    'qr_code': item.qr_code,
+    'created_at': item.created_at,
+    'responsible_user': None,
+    'image': image['detail'] if image else None,
+    'image_original': image['original'] if image else None,
+    'image_variants': image
+  }
+
+  if item.responsible_user:
+    data['responsible_user'] = {
+      'id': item.responsible_user.id,
+      'username': item.responsible_user.username,
+      'role': item.responsible_user.role or 'Usuario'
+    }
+  return data
+
+# Historial de stock de un ítem
+# Sin ?group= devuelve los movimientos del más reciente al más antiguo,
+# paginados por llave (?limit=, ?cursor=). Con ?group=day o ?group=week devuelve
+# entradas, salidas y stock al cierre por período, leídos de los totales
+# diarios. ?from= y ?to= (fecha o fecha y hora ISO 8601) acotan el rango.
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def item_history(request, item_id):
+  if not Item.objects.filter(pk=item_id).exists():
+    return JsonResponse({'error': 'Ítem no encontrado'}, status=404)
+
+  group = request.GET.get('group')
+  try:
+    since = history.parse_bound(request.GET.get('from'))
+    until = history.parse_bound(request.GET.get('to'), end=True)
+    if group:
+      if group not in history.GROUPS:
+        raise ValueError(f"El parámetro 'group' debe ser uno de: {', '.join(history.GROUPS)}")
+      return JsonResponse(history.aggregated(item_id, since, until, group), encoder=DjangoJSONEncoder)
+
+    page, next_cursor = history.history_page(
+      item_id, since, until,
+      cursor=request.GET.get('cursor'), limit=parse_limit(request.GET.get('limit')),
+    )
+  except (InvalidCursor, ValueError) as e:
+    return JsonResponse({'error': str(e)}, status=400)
+
+  return JsonResponse({'results': page, 'next': next_cursor}, encoder=DjangoJSONEncoder)
+
 logger = logging.getLogger(__name__)
 class UpdateStockView(APIView):
   permission_classes = [IsAuthenticated]
@@ -528,14 +675,13 @@ class UpdateStockView(APIView):
           status=status.HTTP_400_BAD_REQUEST
         )
 
-      item = get_object_or_404(Item, id=item_id)
       action_type = request.data.get('type', '').lower()
       quantity = request.data.get('quantity')
 
       logger.info(f"Intento de actualización: {action_type} {quantity} unidades para ítem {item_id}")
 
       # Validación exhaustiva
-      if action_type not in ['add', 'subtract']:
+      if action_type not in ACTIONS:
         error_msg = f"Tipo de acción inválida: {action_type}"
         logger.warning(error_msg)
         return Response(
@@ -544,46 +690,43 @@ class UpdateStockView(APIView):
         )
 
       try:
-        quantity = int(quantity)
-        if quantity <= 0:
-          raise ValueError("La cantidad debe ser positiva")
-      except (ValueError, TypeError) as e:
+        quantity = parse_quantity(quantity)
+      except ValueError as e:
         logger.warning(f"Error en cantidad: {str(e)}")
         return Response(
           {'error': 'La cantidad debe ser un número entero positivo'},
           status=status.HTTP_400_BAD_REQUEST
         )
 
-      # Lógica de actualización de stock
-      old_stock = item.stock
-            
-      if action_type == 'add':
-        new_stock = old_stock + quantity
-      else:  # subtract
-        if old_stock < quantity:
-          error_msg = f"Stock insuficiente (disponible: {old_stock}, requerido: {quantity})"
-          logger.warning(error_msg)
-          return Response(
-            {'error': error_msg},
-            status=status.HTTP_400_BAD_REQUEST
-          )
-        new_stock = old_stock - quantity
-
-      # Actualización en base de datos
-      item.stock = new_stock
-      item.save()
+      # Actualización atómica: un solo UPDATE condicional sobre la columna stock
+      try:
+        change = apply_stock_change(item_id, action_type, quantity)
+      except Item.DoesNotExist:
+        raise Http404("Ítem no encontrado")
+      except InsufficientStock as e:
+        error_msg = str(e)
+        logger.warning(error_msg)
+        return Response(
+          {'error': error_msg},
+          status=status.HTTP_400_BAD_REQUEST
+        )
+      new_stock = change.new_stock
 
       # Registrar en historial
       history_entry = StockHistory.objects.create(
-        item=item,
+        item_id=item_id,
         action=action_type,
         quantity=quantity,
-        old_stock=old_stock,
+        old_stock=change.old_stock,
         new_stock=new_stock,
         user=request.user.username,
         date=timezone.now()
       )
 
+      # El UPDATE directo no dispara post_save: la alerta se evalúa aquí
+      if crossed_low_stock(change.old_stock, new_stock, change.min_stock):
+        schedule_low_stock_alert(change.name, new_stock, change.responsible_user_id)
+
       logger.info(f"Stock actualizado correctamente para ítem {item_id}. Nuevo stock: {new_stock}")
 
       return Response({
@@ -593,6 +736,8 @@ class UpdateStockView(APIView):
         'history_id': history_entry.id
       }, status=status.HTTP_200_OK)
 
+    except Http404:
+      raise
     except Exception as e:
       logger.error(f"Error crítico al actualizar stock: {str(e)}", exc_info=True)
       return Response(
@@ -600,30 +745,80 @@ class UpdateStockView(APIView):
         status=status.HTTP_500_INTERNAL_SERVER_ERROR
       )
 
+# Movimientos de stock por lotes (p. ej. una recepción de mercancía completa)
+class BatchUpdateStockView(APIView):
+  permission_classes = [IsAuthenticated]
+
+  def post(self, request):
+    operations = request.data.get('operations') if isinstance(request.data, dict) else request.data
+    if not isinstance(operations, list) or not operations:
+      return Response(
+        {'error': "Se requiere una lista 'operations' con al menos una operación"},
+        status=status.HTTP_400_BAD_REQUEST
+      )
+    if len(operations) > BATCH_MAX_OPERATIONS:
+      return Response(
+        {'error': f"Máximo {BATCH_MAX_OPERATIONS} operaciones por lote"},
+        status=status.HTTP_400_BAD_REQUEST
+      )
+
+    try:
+      with transaction.atomic():
+        applied, results, changes = apply_stock_batch(operations, request.user.username)
+        # Un solo trabajo para todos los ítems que cruzaron el mínimo
+        alerts = [
+          (change.name, change.new_stock, change.responsible_user_id)
+          for change in changes
+          if crossed_low_stock(change.old_stock, change.new_stock, change.min_stock)
+        ]
+        if alerts:
+          jobs.enqueue('api.tasks.notify_low_stock_many', args=[alerts], priority=10)
+    except Exception as e:
+      logger.error(f"Error crítico al aplicar lote de stock: {str(e)}", exc_info=True)
+      return Response(
+        {'error': 'Error interno del servidor'},
+        status=status.HTTP_500_INTERNAL_SERVER_ERROR
+      )
+
+    if not applied:
+      return Response({
+        'success': False,
+        'message': 'El lote contiene operaciones inválidas; no se aplicó ningún cambio',
+        'results': results
+      }, status=status.HTTP_400_BAD_REQUEST)
+
+    logger.info(f"Lote de stock aplicado: {len(results)} operaciones sobre {len(changes)} ítems")
+
+    return Response({
+      'success': True,
+      'message': 'Stock actualizado correctamente',
+      'results': results
+    }, status=status.HTTP_200_OK)
+
 # Vistas para el formulario de creación
 class CategoryListAPIView(APIView):
+  @method_decorator(condition(etag_func=versioned_etag('category')))
   def get(self, request):
-    categories = Category.objects.all().values('id', 'name')
-    return Response(list(categories))
+    return cached_json_response(request, 'categories', ['category'], _all_categories)
 
 class LocationListAPIView(APIView):
+  @method_decorator(condition(etag_func=versioned_etag('location')))
   def get(self, request):
-    locations = Location.objects.all().values('id', 'name')
-    return Response(list(locations))
+    return cached_json_response(request, 'locations', ['location'], _all_locations)
 
 class StatusListAPIView(APIView):
+  @method_decorator(condition(etag_func=versioned_etag('status')))
   def get(self, request):
-    statuses = Status.objects.all().values('id', 'name')
-    return Response(list(statuses))
+    return cached_json_response(request, 'statuses', ['status'], _all_statuses)
 
 class UserListAPIView(APIView):
+  @method_decorator(condition(etag_func=versioned_etag('user')))
   def get(self, request):
-    users = User.objects.all().values('id', 'username')
-    return Response(list(users))
+    return cached_json_response(request, 'users-list', ['user'], _user_choices)
 
+@condition(etag_func=versioned_etag('status'))
 def get_all_status(request):
-  statuses = Status.objects.all().values('id', 'name')
-  return JsonResponse(list(statuses), safe=False)
+  return cached_json_response(request, 'statuses', ['status'], _all_statuses)
 
 class ItemCreateAPIView(APIView):
   def post(self, request):
@@ -641,7 +836,7 @@ class ItemCreateAPIView(APIView):
           }, status=400)
             
       # Crear el ítem
-      item = Item.objects.create(
+      item = Item(
         name=data.get('name'),
         description=data.get('description', ''),
         category_id=data.get('category'),
@@ -652,10 +847,11 @@ class ItemCreateAPIView(APIView):
         responsible_user_id=data.get('responsible_user'),
         qr_code=data.get('qr_code', '')
       )
-            
-      # Procesar la imagen si existe
-      if 'image' in request.FILES:
-        item.image = request.FILES['image']
+
+      with transaction.atomic():
+        # Procesar la imagen si existe (un solo INSERT junto con el ítem)
+        if 'image' in request.FILES:
+          images.attach(item, request.FILES['image'])
         item.save()
             
       return Response({
@@ -670,6 +866,77 @@ class ItemCreateAPIView(APIView):
         'message': str(e)
       }, status=400)
 
+# Importación masiva de ítems (CSV o JSONL) en bloques con bulk_create
+# Con ?stream=1 responde NDJSON: una línea de progreso por bloque y al final el resumen
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def import_items(request):
+  upload = request.FILES.get('file')
+  if upload is None:
+    return Response({'error': "Se requiere el archivo en el campo 'file'"}, status=400)
+
+  fmt = (request.data.get('format') or detect_format(upload.name)).lower()
+  if fmt not in IMPORT_FORMATS:
+    return Response({'error': f"Formato no soportado: {fmt}"}, status=400)
+  try:
+    chunk_size = parse_limit(request.data.get('chunk_size'), default=DEFAULT_IMPORT_CHUNK_SIZE, maximum=10000)
+  except ValueError:
+    return Response({'error': "chunk_size debe ser un entero positivo"}, status=400)
+
+  importer = ItemImporter(
+    chunk_size=chunk_size,
+    create_missing=str(request.data.get('create_missing', 'true')).lower() not in ('0', 'false', 'no')
+  )
+
+  if wants_stream(request):
+    def events():
+      try:
+        for progress in importer.iter_run(upload, fmt):
+          yield json.dumps({'event': 'progress', **progress}) + '\n'
+        yield json.dumps({'event': 'done', **importer.summary()}) + '\n'
+      except ImportFormatError as e:
+        # Los bloques anteriores al error ya quedaron confirmados
+        yield json.dumps({'event': 'error', 'error': str(e), **importer.summary()}) + '\n'
+    return StreamingHttpResponse(events(), content_type='application/x-ndjson')
+
+  try:
+    summary = importer.run(upload, fmt)
+  except ImportFormatError as e:
+    # Los bloques anteriores al error ya quedaron confirmados
+    return Response({'error': str(e), **importer.summary()}, status=400)
+
+  logger.info(f"Importación de ítems: {summary['created']} creados, {summary['failed']} con error")
+  return Response(summary, status=status.HTTP_200_OK if summary['created'] or not summary['failed'] else status.HTTP_400_BAD_REQUEST)
+
+# Exportación en flujo: ?type=csv|jsonl (no ?format=, que DRF reserva para
+# elegir el renderer) y ?gzip=1 para comprimir
+def _export_options(request):
+  fmt = request.GET.get('type', 'csv').lower()
+  if fmt not in EXPORT_FORMATS:
+    raise ValueError(f"Formato no soportado: {fmt}")
+  return fmt, request.GET.get('gzip', '').lower() in ('1', 'true', 'yes')
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def export_items(request):
+  try:
+    fmt, gzip = _export_options(request)
+  except ValueError as e:
+    return Response({'error': str(e)}, status=400)
+  return export.export_response('items', export.ITEM_COLUMNS, export.item_rows(), fmt, gzip)
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def export_stock_history(request):
+  try:
+    fmt, gzip = _export_options(request)
+    item_id = int(request.GET['item']) if request.GET.get('item') else None
+  except ValueError as e:
+    return Response({'error': str(e)}, status=400)
+  return export.export_response(
+    'stock-history', export.STOCK_HISTORY_COLUMNS, export.stock_history_rows(item_id), fmt, gzip
+  )
+
 @csrf_exempt
 @require_http_methods(["PUT", "PATCH", "POST"])
 def update_item(request, item_id):
@@ -720,29 +987,36 @@ def update_item(request, item_id):
     item.stock = stock
     item.min_stock = min_stock
 
-    # Update relationships
-    item.category = Category.objects.get(id=category_id)
-    item.location = Location.objects.get(id=location_id)
-    item.status = Status.objects.get(id=status_id)
+    # Update relationships: solo se consulta (y valida) la relación que cambia
+    if item.category_id != category_id:
+      item.category = Category.objects.get(id=category_id)
+    if item.location_id != location_id:
+      item.location = Location.objects.get(id=location_id)
+    if item.status_id != status_id:
+      item.status = Status.objects.get(id=status_id)
 
     # Handle responsible user
     responsible_user = data.get('responsible_user', '')
     if responsible_user and str(responsible_user).isdigit():
-      item.responsible_user = User.objects.get(id=int(responsible_user))
+      if item.responsible_user_id != int(responsible_user):
+        item.responsible_user = User.objects.get(id=int(responsible_user))
     else:
       item.responsible_user = None
 
-    # Handle image
-    if 'image' in files:
-      if item.image:
-        item.image.delete(save=False)
-      item.image = files['image']
-    elif data.get('image') == '':
-      if item.image:
-        item.image.delete(save=False)
-      item.image = None
-
-    item.save()
+    # Handle image: se guarda por contenido y la anterior se libera por conteo
+    # de referencias (sus archivos se borran en segundo plano)
+    legacy_image = item.image.name if item.image and not item.stored_image_id else None
+    with transaction.atomic():
+      if 'image' in files:
+        images.attach(item, files['image'])
+      elif data.get('image') == '':
+        images.detach(item)
+
+      item.save()
+
+      # Imágenes subidas antes del almacenamiento por contenido
+      if legacy_image and legacy_image != (item.image.name if item.image else None):
+        jobs.enqueue('api.tasks.delete_stored_file', args=[legacy_image])
         
     return JsonResponse({
       'success': True,
@@ -750,8 +1024,104 @@ def update_item(request, item_id):
       'item_id': item.id
     })
 
+  except images.InvalidImage as e:
+    return JsonResponse({'error': str(e)}, status=400)
   except Exception as e:
     return JsonResponse({
       'error': 'Error updating item',
       'details': str(e)
-    }, status=500)
\ No newline at end of file
+    }, status=500)
+
+
+# Lecturas de ítems para ASGI
+# Mismas respuestas que item_detail, get_all_item, search_items y
+# dashboard_summary, pero como vistas `async def` con la ORM asíncrona y la
+# autenticación de api/asyncauth.py: bajo ASGI no pasan por sync_to_async ni
+# por DRF. inventario/urls.py las usa cuando ASYNC_ITEM_VIEWS está activo.
+
+@require_safe
+@async_login_required
+@versioned_condition(*ITEM_TABLES)
+async def aget_all_item(request):
+  items = _item_list_queryset(request)
+
+  if 'limit' in request.GET or 'cursor' in request.GET:
+    try:
+      limit = parse_limit(request.GET.get('limit'))
+      page, next_cursor = await akeyset_page(
+        items, ('name', 'id'), cursor=request.GET.get('cursor'), limit=limit
+      )
+    except (InvalidCursor, ValueError) as e:
+      return JsonResponse({'error': str(e)}, status=400)
+
+    return JsonResponse({
+      'results': [_item_list_row(request, item) for item in page],
+      'next': next_cursor,
+    }, encoder=DjangoJSONEncoder)
+
+  items = items.order_by('name', 'id')
+
+  if wants_stream(request):
+    return astream_json_array(
+      _item_list_row(request, item) async for item in items.aiterator(chunk_size=STREAM_CHUNK_SIZE)
+    )
+
+  data = [_item_list_row(request, item) async for item in items]
+  return JsonResponse(data, safe=False, encoder=DjangoJSONEncoder)
+
+@require_safe
+@async_login_required
+@versioned_condition(*ITEM_TABLES)
+async def aitem_detail(request, id):
+  try:
+    item = await _item_queryset().aget(pk=id)
+  except Item.DoesNotExist:
+    return JsonResponse({"error": "Ítem no encontrado"}, status=404)
+  # El codificador de DRF, para que created_at salga igual que en item_detail
+  return JsonResponse(_item_detail_data(request, item), encoder=DRFJSONEncoder)
+
+@require_safe
+@async_login_required
+async def asearch_items(request):
+  term = request.GET.get('q', '').strip()
+  stream = wants_stream(request)
+
+  try:
+    limit = parse_limit(
+      request.GET.get('limit'),
+      default=None if stream else SEARCH_DEFAULT_LIMIT,
+      maximum=None if stream else SEARCH_MAX_LIMIT
+    )
+  except ValueError as e:
+    return JsonResponse({"error": str(e)}, status=400)
+
+  items = Item.objects.select_related('location', 'category', 'status')
+  # El índice de texto completo se consulta con SQL directo (sin API async)
+  ids = await sync_to_async(search.search_item_ids)(term, limit) if term else None
+
+  if ids is None:
+    items = items.filter(Q(name__icontains=term) | Q(description__icontains=term)).order_by('name', 'id')
+    if limit is not None:
+      items = items[:limit]
+    rows = items.aiterator(chunk_size=STREAM_CHUNK_SIZE) if stream else items
+  else:
+    rows = _aitems_in_order(items, ids)
+
+  if stream:
+    return astream_json_array(_search_row(item) async for item in rows)
+
+  data = [_search_row(item) async for item in rows]
+  return JsonResponse(data, safe=False)
+
+async def _aitems_in_order(queryset, ids):
+  for start in range(0, len(ids), STREAM_CHUNK_SIZE):
+    chunk = ids[start:start + STREAM_CHUNK_SIZE]
+    found = await queryset.ain_bulk(chunk)
+    for item_id in chunk:
+      if item_id in found:
+        yield found[item_id]
+
+@require_safe
+@async_login_required
+async def adashboard_summary(request):
+  return JsonResponse(await counters.adashboard_summary())
@@ -0,0 +1,260 @@
+"""
+Compara las vistas síncronas y async de lectura de ítems bajo ASGI.
+
+Levanta uvicorn con un solo worker dos veces (ASYNC_ITEM_VIEWS=0 y =1) sobre
+la base de datos de desarrollo y abre --connections conexiones keep-alive
+concurrentes contra cada endpoint durante --duration segundos.
+
+Preparación (una vez), desde backend/:
+
+  python manage.py provision_loadtest --users 1 --items 500
+
+Uso:
+
+  python benchmarks/async_views.py --connections 1000 --duration 20
+
+Reporta por modo y endpoint: peticiones por segundo, latencia p50/p95/p99,
+errores y el máximo de hilos que tuvo el proceso del servidor.
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import random
+import resource
+import signal
+import socket
+import subprocess
+import sys
+import time
+import urllib.request
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+ENDPOINTS = {
+  'detail': '/items/{id}/',
+  'list': '/items/all/?limit=50',
+  'search': '/items/search/?q=sku',
+  'dashboard': '/dashboard/summary/',
+}
+
+
+# Cliente HTTP/1.1 mínimo sobre asyncio (sin dependencias)
+
+async def read_response(reader):
+  head = await reader.readuntil(b'\r\n\r\n')
+  lines = head.decode('latin-1').split('\r\n')
+  status = int(lines[0].split()[1])
+  headers = {}
+  for line in lines[1:]:
+    if ':' in line:
+      key, value = line.split(':', 1)
+      headers[key.strip().lower()] = value.strip()
+  if 'content-length' in headers:
+    await reader.readexactly(int(headers['content-length']))
+  elif headers.get('transfer-encoding') == 'chunked':
+    while True:
+      size = int((await reader.readline()).strip(), 16)
+      await reader.readexactly(size + 2)
+      if size == 0:
+        break
+  return status
+
+
+async def connection_loop(host, port, paths, token, deadline, latencies, errors):
+  try:
+    reader, writer = await asyncio.open_connection(host, port)
+  except OSError:
+    errors.append('connect')
+    return
+  try:
+    while time.monotonic() < deadline:
+      path = random.choice(paths)
+      request = (
+        f'GET {path} HTTP/1.1\r\nHost: localhost\r\n'
+        f'Authorization: Bearer {token}\r\n\r\n'
+      ).encode()
+      start = time.perf_counter()
+      writer.write(request)
+      await writer.drain()
+      status = await read_response(reader)
+      if status == 200:
+        latencies.append(time.perf_counter() - start)
+      else:
+        errors.append(status)
+  except (OSError, asyncio.IncompleteReadError, ValueError) as e:
+    errors.append(type(e).__name__)
+  finally:
+    writer.close()
+
+
+def client_process(host, port, paths, token, connections, duration, queue):
+  resource.setrlimit(resource.RLIMIT_NOFILE, _nofile_limit())
+  latencies, errors = [], []
+
+  async def main():
+    deadline = time.monotonic() + duration
+    await asyncio.gather(*[
+      connection_loop(host, port, paths, token, deadline, latencies, errors)
+      for _ in range(connections)
+    ])
+  asyncio.run(main())
+  queue.put((latencies, errors))
+
+
+def run_load(host, port, paths, token, connections, duration, processes):
+  queue = multiprocessing.Queue()
+  per_process = [connections // processes + (1 if i < connections % processes else 0) for i in range(processes)]
+  workers = [
+    multiprocessing.Process(target=client_process, args=(host, port, paths, token, n, duration, queue))
+    for n in per_process if n
+  ]
+  for worker in workers:
+    worker.start()
+  latencies, errors = [], []
+  for _ in workers:
+    worker_latencies, worker_errors = queue.get()
+    latencies.extend(worker_latencies)
+    errors.extend(worker_errors)
+  for worker in workers:
+    worker.join()
+  return latencies, errors
+
+
+# Servidor
+
+def _nofile_limit():
+  soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+  return (hard, hard)
+
+
+def free_port():
+  with socket.socket() as s:
+    s.bind(('127.0.0.1', 0))
+    return s.getsockname()[1]
+
+
+def start_server(port, async_views):
+  env = dict(os.environ, ASYNC_ITEM_VIEWS='1' if async_views else '0', DJANGO_SETTINGS_MODULE='inventario.settings')
+  process = subprocess.Popen(
+    [sys.executable, '-m', 'uvicorn', 'inventario.asgi:application', '--port', str(port),
+     '--workers', '1', '--log-level', 'warning', '--no-access-log', '--backlog', '4096'],
+    cwd=BACKEND_DIR, env=env, preexec_fn=lambda: resource.setrlimit(resource.RLIMIT_NOFILE, _nofile_limit()),
+  )
+  for _ in range(100):
+    try:
+      with socket.create_connection(('127.0.0.1', port), timeout=0.2):
+        return process
+    except OSError:
+      time.sleep(0.1)
+  process.kill()
+  raise RuntimeError("uvicorn no arrancó")
+
+
+def thread_count(pid):
+  try:
+    return len(os.listdir(f'/proc/{pid}/task'))
+  except OSError:
+    return None
+
+
+def get_json(url, data=None, token=None):
+  headers = {'Content-Type': 'application/json'}
+  if token:
+    headers['Authorization'] = f'Bearer {token}'
+  body = json.dumps(data).encode() if data is not None else None
+  with urllib.request.urlopen(urllib.request.Request(url, body, headers)) as response:
+    return json.loads(response.read())
+
+
+def percentile(values, fraction):
+  if not values:
+    return None
+  values = sorted(values)
+  return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+def measure(mode, port, args, token, item_ids):
+  results = {}
+  for name in args.endpoints:
+    template = ENDPOINTS[name]
+    paths = [template.format(id=item_id) for item_id in item_ids] if '{id}' in template else [template]
+    # Calentamiento: conexiones a la base, cachés de versiones
+    run_load('127.0.0.1', port, paths, token, min(args.connections, 50), 2, 1)
+
+    sampler = multiprocessing.Process(
+      target=_sample_threads, args=(args.server_pid, args.duration + 2, args.sample_file)
+    )
+    sampler.start()
+    started = time.monotonic()
+    latencies, errors = run_load(
+      '127.0.0.1', port, paths, token, args.connections, args.duration, args.client_processes
+    )
+    elapsed = time.monotonic() - started
+    sampler.join()
+    peak_threads = int(Path(args.sample_file).read_text() or 0)
+    results[name] = {
+      'requests': len(latencies),
+      'rps': round(len(latencies) / elapsed, 1),
+      'p50_ms': round(percentile(latencies, 0.50) * 1000, 1) if latencies else None,
+      'p95_ms': round(percentile(latencies, 0.95) * 1000, 1) if latencies else None,
+      'p99_ms': round(percentile(latencies, 0.99) * 1000, 1) if latencies else None,
+      'errors': len(errors),
+      'peak_threads': peak_threads,
+    }
+    print(f"{mode:5} {name:9} {json.dumps(results[name])}", flush=True)
+  return results
+
+
+def _sample_threads(pid, duration, path):
+  peak = 0
+  deadline = time.monotonic() + duration
+  while time.monotonic() < deadline:
+    peak = max(peak, thread_count(pid) or 0)
+    time.sleep(0.05)
+  Path(path).write_text(str(peak))
+
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+  parser.add_argument('--connections', type=int, default=1000)
+  parser.add_argument('--duration', type=int, default=20, help="Segundos por endpoint")
+  parser.add_argument('--endpoints', nargs='+', choices=sorted(ENDPOINTS), default=list(ENDPOINTS))
+  parser.add_argument('--modes', nargs='+', choices=('sync', 'async'), default=['sync', 'async'])
+  parser.add_argument('--client-processes', type=int, default=max(1, (os.cpu_count() or 2) // 2))
+  parser.add_argument('--username', default='loadtest_001')
+  parser.add_argument('--password', default='loadtest-123')
+  parser.add_argument('--output', default='', help="Guardar los resultados en JSON")
+  args = parser.parse_args()
+  args.sample_file = f'/tmp/async_views_threads_{os.getpid()}'
+
+  report = {'connections': args.connections, 'duration': args.duration, 'results': {}}
+  for mode in args.modes:
+    port = free_port()
+    server = start_server(port, async_views=(mode == 'async'))
+    args.server_pid = server.pid
+    try:
+      base = f'http://127.0.0.1:{port}'
+      token = get_json(f'{base}/api/token/', {'username': args.username, 'password': args.password})['access']
+      page = get_json(f'{base}/items/all/?limit=500', token=token)
+      item_ids = [row['id'] for row in page['results']]
+      report['results'][mode] = measure(mode, port, args, token, item_ids)
+    finally:
+      server.send_signal(signal.SIGINT)
+      server.wait(timeout=30)
+
+  if len(report['results']) == 2:
+    print("\nasync frente a sync (req/s):")
+    for name in args.endpoints:
+      sync_rps = report['results']['sync'][name]['rps']
+      async_rps = report['results']['async'][name]['rps']
+      change = (async_rps / sync_rps - 1) * 100 if sync_rps else float('nan')
+      print(f"  {name:9} {sync_rps:8.1f} -> {async_rps:8.1f} ({change:+.0f}%)")
+  if args.output:
+    Path(args.output).write_text(json.dumps(report, indent=2))
+
+
+if __name__ == '__main__':
+  main()
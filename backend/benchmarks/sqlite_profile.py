@@ -0,0 +1,219 @@
+"""
+Lecturas por segundo en SQLite mientras hay una tormenta de escrituras.
+
+Compara tres configuraciones sobre una copia de la base de desarrollo:
+
+  default       SQLite de fábrica: journal de rollback, BEGIN diferido
+                (SQLITE_PROFILE=0)
+  profile       WAL, synchronous=NORMAL, busy_timeout, mmap, cache_size y
+                BEGIN IMMEDIATE (api/sqlite)
+  profile+lane  lo anterior más el carril de escritura (SQLITE_WRITE_LANE=1)
+
+En cada una corren --processes procesos (como los workers de gunicorn), cada
+uno con --readers hilos que leen una página del listado de ítems y --writers
+hilos que hacen movimientos de stock como UpdateStockView (UPDATE del stock e
+INSERT en el historial, en una transacción).
+
+Uso, desde backend/:
+
+  python benchmarks/sqlite_profile.py --duration 10 --readers 4 --writers 4
+
+Reporta lecturas y escrituras por segundo, latencias p50/p99 y los errores
+"database is locked" de cada configuración.
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+MODES = {
+  'default': {'SQLITE_PROFILE': '0', 'SQLITE_WRITE_LANE': '0'},
+  'profile': {'SQLITE_PROFILE': '1', 'SQLITE_WRITE_LANE': '0'},
+  'profile+lane': {'SQLITE_PROFILE': '1', 'SQLITE_WRITE_LANE': '1'},
+}
+PAGE_SIZE = 50
+
+
+def percentile(values, fraction):
+  if not values:
+    return None
+  values = sorted(values)
+  return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+# Proceso de carga (con Django configurado sobre la copia)
+
+def reader(deadline, stats):
+  from django.db import connection
+  from api.views import _item_queryset
+
+  while time.monotonic() < deadline:
+    start = time.perf_counter()
+    try:
+      list(_item_queryset().order_by('name', 'id')[:PAGE_SIZE])
+    except Exception as e:
+      stats['read_errors'].append(str(e))
+      continue
+    stats['reads'].append(time.perf_counter() - start)
+  connection.close()
+
+
+def writer(deadline, item_ids, stats):
+  from django.db import connection, transaction
+  from django.utils import timezone
+  from api.models import StockHistory
+  from api.stock import apply_stock_change
+
+  while time.monotonic() < deadline:
+    item_id = random.choice(item_ids)
+    start = time.perf_counter()
+    try:
+      with transaction.atomic():
+        # Suma y resta en la misma transacción para no agotar el stock
+        for action in ('add', 'subtract'):
+          change = apply_stock_change(item_id, action, 1)
+          StockHistory.objects.create(
+            item_id=item_id, action=action, quantity=1, old_stock=change.old_stock,
+            new_stock=change.new_stock, user='benchmark', date=timezone.now(),
+          )
+    except Exception as e:
+      stats['write_errors'].append(str(e))
+      continue
+    stats['writes'].append(time.perf_counter() - start)
+  connection.close()
+
+
+def load_process(args, item_ids, queue):
+  import django
+  django.setup()
+
+  stats = {'reads': [], 'writes': [], 'read_errors': [], 'write_errors': []}
+  deadline = time.monotonic() + args.duration
+  threads = [threading.Thread(target=reader, args=(deadline, stats)) for _ in range(args.readers)]
+  threads += [threading.Thread(target=writer, args=(deadline, item_ids, stats)) for _ in range(args.writers)]
+  for thread in threads:
+    thread.start()
+  for thread in threads:
+    thread.join()
+  queue.put(stats)
+
+
+def run_mode(args):
+  """Se ejecuta en un subproceso con las variables de entorno del modo"""
+  import django
+  django.setup()
+  from api.models import Item
+
+  item_ids = list(Item.objects.order_by('id').values_list('id', flat=True)[:args.hot_items])
+  queue = multiprocessing.Queue()
+  workers = [
+    multiprocessing.Process(target=load_process, args=(args, item_ids, queue))
+    for _ in range(args.processes)
+  ]
+  started = time.monotonic()
+  for worker in workers:
+    worker.start()
+  stats = {'reads': [], 'writes': [], 'read_errors': [], 'write_errors': []}
+  for _ in workers:
+    for key, values in queue.get().items():
+      stats[key].extend(values)
+  for worker in workers:
+    worker.join()
+  elapsed = time.monotonic() - started
+
+  locked = sum('locked' in error for error in stats['read_errors'] + stats['write_errors'])
+  result = {
+    'reads_per_s': round(len(stats['reads']) / elapsed, 1),
+    'read_p50_ms': _ms(percentile(stats['reads'], 0.50)),
+    'read_p99_ms': _ms(percentile(stats['reads'], 0.99)),
+    'writes_per_s': round(len(stats['writes']) / elapsed, 1),
+    'write_p50_ms': _ms(percentile(stats['writes'], 0.50)),
+    'write_p99_ms': _ms(percentile(stats['writes'], 0.99)),
+    'read_errors': len(stats['read_errors']),
+    'write_errors': len(stats['write_errors']),
+    'locked_errors': locked,
+  }
+  print(json.dumps(result), flush=True)
+
+
+def _ms(seconds):
+  return round(seconds * 1000, 1) if seconds is not None else None
+
+
+# Coordinador
+
+def copy_database(source, target, journal_mode):
+  """Copia consistente (API de backup) con el modo de journal pedido"""
+  src, dst = sqlite3.connect(source), sqlite3.connect(target)
+  try:
+    src.backup(dst)
+    dst.execute(f'PRAGMA journal_mode = {journal_mode}')
+  finally:
+    src.close()
+    dst.close()
+
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+  parser.add_argument('--database', default=str(BACKEND_DIR / 'db.sqlite3'))
+  parser.add_argument('--modes', nargs='+', choices=list(MODES), default=list(MODES))
+  parser.add_argument('--duration', type=int, default=10)
+  parser.add_argument('--processes', type=int, default=2)
+  parser.add_argument('--readers', type=int, default=4, help="Hilos lectores por proceso")
+  parser.add_argument('--writers', type=int, default=4, help="Hilos escritores por proceso")
+  parser.add_argument('--hot-items', type=int, default=1000, help="Ítems sobre los que se escribe")
+  parser.add_argument('--output', default='', help="Guardar los resultados en JSON")
+  parser.add_argument('--run-mode', action='store_true', help=argparse.SUPPRESS)
+  args = parser.parse_args()
+
+  if args.run_mode:
+    sys.path.insert(0, str(BACKEND_DIR))
+    run_mode(args)
+    return
+
+  report = {
+    'processes': args.processes, 'readers': args.readers, 'writers': args.writers,
+    'duration': args.duration, 'results': {},
+  }
+  with tempfile.TemporaryDirectory() as tmp:
+    for mode in args.modes:
+      copy = Path(tmp) / f'{mode}.sqlite3'
+      copy_database(args.database, copy, 'wal' if MODES[mode]['SQLITE_PROFILE'] == '1' else 'delete')
+      env = dict(
+        os.environ, **MODES[mode], DB_ENGINE='sqlite3', DB_NAME=str(copy),
+        DJANGO_SETTINGS_MODULE='inventario.settings',
+      )
+      command = [
+        sys.executable, __file__, '--run-mode', '--duration', str(args.duration),
+        '--processes', str(args.processes), '--readers', str(args.readers),
+        '--writers', str(args.writers), '--hot-items', str(args.hot_items),
+      ]
+      output = subprocess.run(command, cwd=BACKEND_DIR, env=env, capture_output=True, text=True)
+      if output.returncode != 0:
+        sys.exit(f"{mode} falló:\n{output.stderr}")
+      result = json.loads(output.stdout.strip().splitlines()[-1])
+      report['results'][mode] = result
+      print(f"{mode:13} {json.dumps(result)}", flush=True)
+
+  if 'default' in report['results']:
+    base = report['results']['default']['reads_per_s']
+    print("\nlecturas/s frente a default:")
+    for mode, result in report['results'].items():
+      change = (result['reads_per_s'] / base - 1) * 100 if base else float('nan')
+      print(f"  {mode:13} {result['reads_per_s']:9.1f} ({change:+.0f}%)")
+  if args.output:
+    Path(args.output).write_text(json.dumps(report, indent=2))
+
+
+if __name__ == '__main__':
+  main()
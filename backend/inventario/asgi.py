@@ -3,6 +3,11 @@ ASGI config for inventario project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+Las notificaciones en vivo (/notifications/stream/) se atienden antes de
+llegar al manejador de Django; ver api/events.py. En producción:
+
+  uvicorn inventario.asgi:application --workers 2
+
 For more information on this file, see
 https://docs.djangoproject.com/en/5.1/howto/deployment/asgi/
 """
@@ -12,5 +17,13 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'inventario.settings')
+# Bajo ASGI cada petición síncrona corre en un hilo nuevo y una conexión
+# persistente quedaría abierta por hilo: con PostgreSQL conviene DB_POOL=1
+os.environ.setdefault('DB_CONN_MAX_AGE', '0')
+
+django_application = get_asgi_application()
+
+# Después de configurar Django: importa modelos y resuelve URLs
+from api import events  # noqa: E402
 
-application = get_asgi_application()
+application = events.route(django_application)
@@ -1,3 +1,4 @@
+import os
 from pathlib import Path
 from datetime import timedelta
 
@@ -34,6 +35,9 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'api.metrics.MetricsMiddleware',
+    'api.querybudget.QueryBudgetMiddleware',
+    'api.dbrouter.ReplicaRoutingMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -70,12 +74,97 @@ WSGI_APPLICATION = 'inventario.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.1/ref/settings/#databases
 
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+#
+# Se configura con variables de entorno:
+#
+#   DB_ENGINE          sqlite3 (por defecto) o postgresql
+#   DB_NAME            archivo de SQLite o nombre de la base en PostgreSQL
+#   DB_USER, DB_PASSWORD, DB_HOST, DB_PORT   (PostgreSQL)
+#   DB_CONN_MAX_AGE    segundos que se reutiliza una conexión (0 = una por
+#                      petición). Bajo ASGI inventario/asgi.py lo pone en 0.
+#   DB_POOL            1 = pool de conexiones de psycopg (PostgreSQL, requiere
+#                      psycopg[pool]); DB_POOL_MIN_SIZE / DB_POOL_MAX_SIZE
+#   DB_REPLICA_NAME / DB_REPLICA_HOST / DB_REPLICA_PORT / DB_REPLICA_USER /
+#   DB_REPLICA_PASSWORD  réplica de lectura (alias 'replica', ver
+#                      api/dbrouter.py); lo que no se defina se toma de DB_*
+#   SQLITE_PROFILE     0 = SQLite sin PRAGMAs ni BEGIN IMMEDIATE (api/sqlite)
+#   SQLITE_WRITE_LANE  1 = los escritores del proceso esperan en fila
+
+DB_ENGINE = os.environ.get('DB_ENGINE', 'sqlite3')
+DB_POOL = os.environ.get('DB_POOL', '0') == '1'
+
+# Perfil de concurrencia de SQLite: WAL para que las escrituras no bloqueen a
+# los lectores y BEGIN IMMEDIATE para que los escritores esperen en lugar de
+# fallar con "database is locked". Medido con benchmarks/sqlite_profile.py.
+SQLITE_PROFILE = os.environ.get('SQLITE_PROFILE', '1') == '1'
+SQLITE_PRAGMAS = {
+    'journal_mode': 'wal',
+    'synchronous': 'normal',
+    'busy_timeout': 5000,
+    'mmap_size': 256 * 1024 * 1024,
+    'cache_size': -64000,
+} if SQLITE_PROFILE else {}
+SQLITE_WRITE_LANE = os.environ.get('SQLITE_WRITE_LANE', '0') == '1'
+
+
+def _database(prefix, fallback=None):
+    def env(name, default=None):
+        value = os.environ.get(prefix + name)
+        if value is None and fallback is not None:
+            value = os.environ.get(fallback + name)
+        return default if value is None else value
+
+    if DB_ENGINE == 'sqlite3':
+        return {
+            'ENGINE': 'api.sqlite',
+            'NAME': env('NAME', BASE_DIR / 'db.sqlite3'),
+            'CONN_MAX_AGE': int(env('CONN_MAX_AGE', 60)),
+            'CONN_HEALTH_CHECKS': True,
+            'OPTIONS': {'transaction_mode': 'IMMEDIATE'} if SQLITE_PROFILE else {},
+        }
+
+    database = {
+        'ENGINE': 'django.db.backends.postgresql',
+        'NAME': env('NAME', 'inventario'),
+        'USER': env('USER', ''),
+        'PASSWORD': env('PASSWORD', ''),
+        'HOST': env('HOST', ''),
+        'PORT': env('PORT', ''),
+        'CONN_MAX_AGE': int(env('CONN_MAX_AGE', 60)),
+        'CONN_HEALTH_CHECKS': True,
     }
+    if DB_POOL:
+        # El pool reemplaza a las conexiones persistentes
+        database['CONN_MAX_AGE'] = 0
+        database['OPTIONS'] = {
+            'pool': {
+                'min_size': int(env('POOL_MIN_SIZE', 2)),
+                'max_size': int(env('POOL_MAX_SIZE', 10)),
+                'timeout': 10,
+            },
+        }
+    return database
+
+
+DATABASES = {
+    'default': _database('DB_'),
 }
+if os.environ.get('DB_REPLICA_NAME') or os.environ.get('DB_REPLICA_HOST'):
+    DATABASES['replica'] = _database('DB_REPLICA_', fallback='DB_')
+    # En las pruebas la réplica apunta a la base de pruebas de 'default'
+    DATABASES['replica']['TEST'] = {'MIRROR': 'default'}
+
+DATABASE_ROUTERS = ['api.dbrouter.PrimaryReplicaRouter']
+
+# URLs (nombre en urls.py) cuyas lecturas GET pueden ir a la réplica
+DATABASE_REPLICA_URLS = {
+    'get_all_items', 'item-detail', 'item-history', 'search_items', 'dashboard-summary',
+    'get_all_category', 'category-list', 'get_all_location', 'location-list',
+    'get_all_status', 'status-list', 'get_all_users', 'user-list',
+}
+# Tiempo que un cliente lee de la primaria después de escribir; debe cubrir
+# el retraso de la réplica
+DATABASE_REPLICA_PIN_SECONDS = 5
 
 
 # Password validation
@@ -114,6 +203,62 @@ USE_TZ = True
 
 STATIC_URL = 'static/'
 
+# Archivos subidos (imágenes de ítems), servidos por api/media.py
+MEDIA_URL = '/media/'
+MEDIA_ROOT = BASE_DIR / 'media'
+# Detrás de un proxy: 'x-accel-redirect' (nginx, con una location interna en
+# MEDIA_ACCEL_PREFIX que apunte a MEDIA_ROOT) o 'x-sendfile' (Apache, lighttpd)
+MEDIA_SENDFILE = None
+MEDIA_ACCEL_PREFIX = '/protected-media/'
+MEDIA_CACHE_MAX_AGE = 3600
+
+# Caché
+# Con varios procesos conviene un backend compartido (Redis/Memcached) para que
+# la caché de datos de referencia (api/cache.py) se invalide en todos a la vez.
+# Las vistas de ítems solo usan ETag/304 con un backend compartido.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+REFERENCE_CACHE_TIMEOUT = 300
+
+# Cola de trabajos en segundo plano (manage.py run_jobs)
+# Con JOBS_EAGER = True las tareas corren en el proceso web al confirmar la transacción
+JOBS_EAGER = False
+JOBS_VISIBILITY_TIMEOUT = 300
+JOBS_MAX_ATTEMPTS = 3
+JOBS_RETRY_BACKOFF = 10
+
+# Contadores materializados del dashboard (ver api/counters.py).
+# Antes de activarlos: python manage.py rebuild_inventory_counters
+INVENTORY_COUNTERS = False
+
+# Presupuesto de consultas SQL por petición (ver api/querybudget.py). Las URLs
+# sin entrada en api/query_budgets.json usan QUERY_BUDGET_DEFAULT.
+QUERY_BUDGET_DEFAULT = 30
+
+# Métricas en /metrics (ver api/metrics.py). Con varios procesos de gunicorn,
+# METRICS_MULTIPROCESS_DIR debe ser un directorio compartido y vacío al arrancar.
+METRICS_MULTIPROCESS_DIR = None
+METRICS_FLUSH_INTERVAL = 5
+METRICS_TOKEN = None
+
+# Vistas async de lectura de ítems (listado, detalle, búsqueda, dashboard).
+# Solo convienen bajo ASGI; con WSGI cada petición tendría que crear un event
+# loop. Se puede cambiar sin editar este archivo con ASYNC_ITEM_VIEWS=0/1.
+# Medido con benchmarks/async_views.py: más req/s en detalle y listado, pero
+# los mismos hilos por petición (la ORM async de Django sigue usando uno).
+ASYNC_ITEM_VIEWS = os.environ.get('ASYNC_ITEM_VIEWS', '0') == '1'
+
+# Notificaciones en vivo (api/events.py, requiere ASGI). SSE_POLL_INTERVAL es
+# cada cuánto se buscan en la base las creadas por otros procesos (None = nunca).
+SSE_HEARTBEAT_INTERVAL = 15
+SSE_QUEUE_SIZE = 100
+SSE_REPLAY_LIMIT = 200
+SSE_POLL_INTERVAL = 2
+SSE_TICKET_MAX_AGE = 60
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.1/ref/settings/#default-auto-field
 
@@ -1,18 +1,30 @@
-from django.urls import path
+from django.urls import path, re_path
 from django.contrib import admin
 from django.conf import settings
-from django.conf.urls.static import static
 from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
+from api import events, media, metrics
 from api.views import (
     UpdateStockView, delete_item, get_all_item, get_user, get_all_users,
     create_user, item_detail, send_notification, update_item, update_user, delete_user,
     get_all_location, create_location, update_location, delete_location,
-    get_notifications, mark_all_as_read, mark_as_read, delete_notification,
+    get_notifications, notifications_unread_count, mark_all_as_read, mark_as_read, delete_notification,
     get_all_category, create_categiory, update_category, delete_category,
     search_items, dashboard_summary, CategoryListAPIView, LocationListAPIView,
-    StatusListAPIView, UserListAPIView, ItemCreateAPIView, get_all_status
+    StatusListAPIView, UserListAPIView, ItemCreateAPIView, get_all_status,
+    BatchUpdateStockView, import_items, export_items, export_stock_history, item_history,
+    aget_all_item, aitem_detail, asearch_items, adashboard_summary
 )
 
+# Lecturas de ítems: vistas async bajo ASGI (ver ASYNC_ITEM_VIEWS en settings)
+if settings.ASYNC_ITEM_VIEWS:
+    item_list_view, item_detail_view, search_view, dashboard_view = (
+        aget_all_item, aitem_detail, asearch_items, adashboard_summary
+    )
+else:
+    item_list_view, item_detail_view, search_view, dashboard_view = (
+        get_all_item, item_detail, search_items, dashboard_summary
+    )
+
 urlpatterns = [
     path('admin/', admin.site.urls),
     
@@ -48,22 +60,38 @@ urlpatterns = [
 
     # Notificaciones
     path('notifications/', get_notifications, name='get_notifications'),
+    path('notifications/unread-count/', notifications_unread_count, name='notifications-unread-count'),
+    path('notifications/stream/', events.stream_unavailable, name='notifications-stream'),
+    path('notifications/stream/ticket/', events.stream_ticket, name='notifications-stream-ticket'),
     path('notifications/mark-all/', mark_all_as_read, name='mark_all_as_read'),
     path('notifications/mark/<int:notif_id>/', mark_as_read, name='mark_as_read'),
     path('notifications/delete/<int:notif_id>/', delete_notification, name='delete_notification'),
     path('notifications/send/', send_notification, name='send-notification'),
 
     # Busqueda del Item
-    path('items/search/', search_items, name='search_items'),
-    path('items/<int:id>/', item_detail, name='item-detail'),
+    path('items/search/', search_view, name='search_items'),
+    path('items/<int:id>/', item_detail_view, name='item-detail'),
 
     # Todos los items
-    path('dashboard/summary/', dashboard_summary, name='dashboard-summary'),
+    path('dashboard/summary/', dashboard_view, name='dashboard-summary'),
 
     # Item
-    path('items/all/', get_all_item, name='get_all_items'),
+    path('items/all/', item_list_view, name='get_all_items'),
     path('items/create/', ItemCreateAPIView.as_view(), name='item-create'),
+    path('items/import/', import_items, name='item-import'),
     path('items/delete/<int:item_id>/', delete_item, name='delete_item'),
     path('items/update/<int:item_id>/', update_item, name='item-update'),
     path('items/<int:item_id>/update-stock/', UpdateStockView.as_view(), name='update-stock'),
-] + static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
\ No newline at end of file
+    path('items/<int:item_id>/history/', item_history, name='item-history'),
+    path('items/update-stock/batch/', BatchUpdateStockView.as_view(), name='update-stock-batch'),
+
+    # Exportación
+    path('export/items/', export_items, name='export-items'),
+    path('export/stock-history/', export_stock_history, name='export-stock-history'),
+
+    # Métricas para Prometheus
+    path('metrics', metrics.metrics_view, name='metrics'),
+
+    # Archivos subidos (en producción conviene MEDIA_SENDFILE, ver api/media.py)
+    re_path(r'^%s(?P<path>.+)$' % settings.MEDIA_URL.lstrip('/'), media.serve, name='media'),
+]
\ No newline at end of file
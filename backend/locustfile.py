@@ -1,43 +1,261 @@
-from locust import HttpUser, task, between
+"""
+Pruebas de carga contra el servidor de desarrollo.
+
+Preparación (una vez):
+
+  python manage.py provision_loadtest --users 50 --items 500
+
+Interactivo (http://localhost:8089):
+
+  locust -H http://localhost:8000
+
+Sin interfaz, con reporte JSON comparado contra una línea base:
+
+  locust -H http://localhost:8000 --headless -u 50 -r 10 -t 2m \\
+    --scenario mixed --report loadtest/report.json --baseline loadtest/baseline.json
+
+Si algún endpoint empeora más que --tolerance respecto a la línea base (p95 o
+throughput) locust termina con código 1. --save-baseline guarda el reporte
+como nueva línea base.
+"""
+import itertools
+import json
 import random
-import string
+import threading
+from pathlib import Path
+
+from locust import HttpUser, between, events, task
+
+# Escenario -> peso de cada tarea
+SCENARIOS = {
+  # Uso normal: mayormente lecturas, algunos movimientos de stock
+  'mixed': {
+    'list_items': 20,
+    'list_items_page': 10,
+    'item_detail': 20,
+    'search': 10,
+    'update_stock_hot': 5,
+    'update_stock_cold': 5,
+    'dashboard': 10,
+    'notifications': 5,
+    'notifications_badge': 5,
+  },
+  'read_heavy': {
+    'list_items_page': 30,
+    'item_detail': 30,
+    'search': 20,
+    'dashboard': 10,
+    'notifications': 10,
+  },
+  # Muchos usuarios moviendo el stock de los mismos pocos ítems
+  'stock_contention': {
+    'update_stock_hot': 70,
+    'update_stock_cold': 10,
+    'item_detail': 20,
+  },
+  # Pestañas abiertas: el globo se sondea mucho más de lo que se abre la bandeja
+  'dashboard_polling': {
+    'dashboard': 50,
+    'notifications_badge': 40,
+    'notifications': 10,
+  },
+}
+
+SEARCH_TERMS = ['sku', 'prueba', 'bodega', 'categoría', '0001', 'taladro']
+PERCENTILES = (0.5, 0.95, 0.99)
 
-class MyLoadTestUser(HttpUser):
-  wait_time = between(1, 3)
+
+@events.init_command_line_parser.add_listener
+def add_arguments(parser):
+  parser.add_argument('--scenario', choices=sorted(SCENARIOS), default='mixed', help="Mezcla de tareas")
+  parser.add_argument('--user-prefix', default='loadtest', help="Prefijo de los usuarios de provision_loadtest")
+  parser.add_argument('--user-count', type=int, default=50, help="Tamaño del pool de usuarios")
+  parser.add_argument('--user-password', default='loadtest-123', include_in_web_ui=False)
+  parser.add_argument('--hot-fraction', type=float, default=0.02,
+                      help="Fracción de los ítems que concentra las actualizaciones 'hot'")
+  parser.add_argument('--report', default='', help="Ruta del reporte JSON al terminar")
+  parser.add_argument('--baseline', default='', help="Reporte JSON contra el que comparar")
+  parser.add_argument('--tolerance', type=float, default=0.2, help="Empeoramiento admitido (0.2 = 20%%)")
+  parser.add_argument('--save-baseline', action='store_true', help="Guardar el reporte como línea base")
+
+
+class Catalog:
+  """Ids de ítems compartidos por todos los usuarios simulados del proceso"""
+  def __init__(self):
+    self.lock = threading.Lock()
+    self.hot = []
+    self.cold = []
+    self.users = None
+
+  def load(self, client, hot_fraction):
+    with self.lock:
+      if self.hot or self.cold:
+        return
+      response = client.get('/items/all/?limit=500', name='/items/all/?limit')
+      ids = sorted(row['id'] for row in response.json()['results'])
+      hot_count = max(1, int(len(ids) * hot_fraction))
+      self.hot, self.cold = ids[:hot_count], ids[hot_count:] or ids
+
+  def next_user(self, options):
+    with self.lock:
+      if self.users is None:
+        names = [f"{options.user_prefix}_{n:03d}" for n in range(1, options.user_count + 1)]
+        self.users = itertools.cycle(names)
+      return next(self.users)
+
+
+catalog = Catalog()
+
+
+class InventoryUser(HttpUser):
+  host = 'http://localhost:8000'
+  wait_time = between(0.5, 2)
 
   def on_start(self):
-    # Autenticación JWT: obtener token antes de comenzar
-    response = self.client.post("/api/token/", json={
-      "username": "Sabogal",
-      "password": "123456789"
-    })
-    token = response.json()["access"]
-    self.client.headers.update({"Authorization": f"Bearer {token}"})
+    options = self.environment.parsed_options
+    self.username = catalog.next_user(options)
+    response = self.client.post('/api/token/', json={
+      'username': self.username,
+      'password': options.user_password,
+    }, name='/api/token/')
+    if response.status_code != 200:
+      raise RuntimeError(
+        f"No se pudo autenticar a {self.username}: ejecute 'manage.py provision_loadtest'"
+      )
+    self.client.headers.update({'Authorization': f"Bearer {response.json()['access']}"})
+    catalog.load(self.client, options.hot_fraction)
+
+    weights = SCENARIOS[options.scenario]
+    self.tasks = [getattr(type(self), name) for name, weight in weights.items() for _ in range(weight)]
 
   @task
-  def get_all_users(self):
-    self.client.get("/users/all/")
+  def list_items(self):
+    self.client.get('/items/all/', name='/items/all/')
 
   @task
-  def create_user(self):
-    random_username = "user_" + ''.join(random.choices(string.ascii_lowercase, k=5))
-    self.client.post("/users/create/", json={
-      "first_name": random_username,
-      "last_name": random_username,
-      "username": random_username,
-      "email": f"{random_username}@test.com",
-      "password": "testpass123",
-      "role": "pasante"
-    })
+  def list_items_page(self):
+    # Primera página y, a veces, la siguiente con el cursor
+    response = self.client.get('/items/all/?limit=50', name='/items/all/?limit')
+    cursor = response.json().get('next') if response.ok else None
+    if cursor and random.random() < 0.5:
+      self.client.get('/items/all/', params={'limit': 50, 'cursor': cursor}, name='/items/all/?cursor')
 
   @task
-  def create_location(self):
-    self.client.post("/location/create/", json={
-      "name": "Test Location"
-    })
+  def item_detail(self):
+    self.client.get(f'/items/{random.choice(catalog.cold)}/', name='/items/[id]/')
 
   @task
-  def create_category(self):
-    self.client.post("/category/create/", json={
-      "name": "Test Category"
-    })
\ No newline at end of file
+  def search(self):
+    self.client.get('/items/search/', params={'q': random.choice(SEARCH_TERMS)}, name='/items/search/')
+
+  def update_stock(self, item_id, name):
+    data = {'type': random.choice(('add', 'subtract')), 'quantity': 1}
+    with self.client.post(f'/items/{item_id}/update-stock/', json=data, name=name,
+                          catch_response=True) as response:
+      # Quedarse sin stock es una respuesta válida del endpoint
+      if response.status_code == 400 and 'Stock insuficiente' in response.text:
+        response.success()
+
+  @task
+  def update_stock_hot(self):
+    self.update_stock(random.choice(catalog.hot), '/items/[id]/update-stock/ (hot)')
+
+  @task
+  def update_stock_cold(self):
+    self.update_stock(random.choice(catalog.cold), '/items/[id]/update-stock/ (cold)')
+
+  @task
+  def dashboard(self):
+    self.client.get('/dashboard/summary/', name='/dashboard/summary/')
+
+  @task
+  def notifications(self):
+    self.client.get('/notifications/', name='/notifications/')
+
+  @task
+  def notifications_badge(self):
+    self.client.get('/notifications/unread-count/', name='/notifications/unread-count/')
+
+
+# Reporte y comparación con la línea base
+
+def build_report(environment):
+  endpoints = {}
+  for (name, method), entry in sorted(environment.stats.entries.items()):
+    if not entry.num_requests:
+      continue
+    endpoints[f"{method} {name}"] = {
+      'requests': entry.num_requests,
+      'failures': entry.num_failures,
+      'rps': round(entry.total_rps, 2),
+      **{f"p{int(p * 100)}": entry.get_response_time_percentile(p) for p in PERCENTILES},
+    }
+  total = environment.stats.total
+  options = environment.parsed_options
+  return {
+    'scenario': options.scenario,
+    'users': options.num_users,
+    'duration': round(total.last_request_timestamp - total.start_time, 1) if total.last_request_timestamp else 0,
+    'total': {
+      'requests': total.num_requests,
+      'failures': total.num_failures,
+      'rps': round(total.total_rps, 2),
+      **{f"p{int(p * 100)}": total.get_response_time_percentile(p) for p in PERCENTILES},
+    },
+    'endpoints': endpoints,
+  }
+
+
+def compare(report, baseline, tolerance):
+  """Lista de regresiones: p95 más lento o throughput menor que la línea base"""
+  regressions = []
+  current = {'total': report['total'], **report['endpoints']}
+  previous = {'total': baseline['total'], **baseline['endpoints']}
+  for name, old in previous.items():
+    new = current.get(name)
+    if new is None:
+      continue
+    if old['p95'] and new['p95'] > old['p95'] * (1 + tolerance):
+      regressions.append(f"{name}: p95 {old['p95']} ms -> {new['p95']} ms")
+    if old['rps'] and new['rps'] < old['rps'] * (1 - tolerance):
+      regressions.append(f"{name}: {old['rps']} req/s -> {new['rps']} req/s")
+  return regressions
+
+
+@events.quitting.add_listener
+def write_report(environment, **kwargs):
+  options = environment.parsed_options
+  if options is None or not (options.report or options.baseline or options.save_baseline):
+    return
+  report = build_report(environment)
+  text = json.dumps(report, indent=2, ensure_ascii=False)
+
+  if options.report:
+    Path(options.report).parent.mkdir(parents=True, exist_ok=True)
+    Path(options.report).write_text(text)
+  if not options.baseline:
+    return
+  baseline_path = Path(options.baseline)
+  if options.save_baseline:
+    baseline_path.parent.mkdir(parents=True, exist_ok=True)
+    baseline_path.write_text(text)
+    print(f"Línea base guardada en {baseline_path}")
+    return
+  if not baseline_path.exists():
+    print(f"No existe la línea base {baseline_path}; use --save-baseline para crearla")
+    return
+
+  baseline = json.loads(baseline_path.read_text())
+  if (baseline.get('scenario'), baseline.get('users')) != (report['scenario'], report['users']):
+    print(
+      f"La línea base es de '{baseline.get('scenario')}' con {baseline.get('users')} usuarios; "
+      f"no se compara con '{report['scenario']}' con {report['users']}"
+    )
+    return
+  regressions = compare(report, baseline, options.tolerance)
+  for line in regressions:
+    print(f"REGRESIÓN {line}")
+  if regressions:
+    environment.process_exit_code = 1
+  else:
+    print(f"Sin regresiones respecto a {baseline_path} (tolerancia {options.tolerance:.0%})")
@@ -9,18 +9,23 @@ const Navbar = () => {
   const [showNotifications, setShowNotifications] = useState(false);
   const notificationRef = useRef(null);
   const [notifications, setNotifications] = useState([]);
+  const [unreadCount, setUnreadCount] = useState(0);
+  const latestIdRef = useRef(0);
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState("");
   const [user, setUser] = useState({ username: "", role: "" });
 
   const token = localStorage.getItem("access_token");
 
+  // Primera página de la bandeja (las más recientes)
   const fetchNotifications = async () => {
     try {
       const response = await axios.get("http://127.0.0.1:8000/notifications/", {
         headers: { Authorization: `Bearer ${token}` },
       });
-      setNotifications(response.data.notifications || response.data);
+      const rows = response.data.notifications || [];
+      setNotifications(rows);
+      latestIdRef.current = rows.length > 0 ? rows[0].id : 0;
     } catch (err) {
       setError("Error al cargar las notificaciones.");
     } finally {
@@ -28,14 +33,109 @@ const Navbar = () => {
     }
   };
 
+  // Solo las que llegaron después de la más reciente que ya tenemos
+  const fetchNewNotifications = async () => {
+    const response = await axios.get("http://127.0.0.1:8000/notifications/", {
+      params: { since_id: latestIdRef.current },
+      headers: { Authorization: `Bearer ${token}` },
+    });
+    const rows = response.data.notifications || [];
+    if (rows.length > 0) {
+      latestIdRef.current = rows[rows.length - 1].id;
+      setNotifications((current) => [...rows.reverse(), ...current]);
+    }
+  };
+
+  // El sondeo solo pide el contador; la lista se actualiza si hay nuevas
+  const pollUnreadCount = async () => {
+    try {
+      const response = await axios.get("http://127.0.0.1:8000/notifications/unread-count/", {
+        headers: { Authorization: `Bearer ${token}` },
+      });
+      setUnreadCount(response.data.unread);
+      if (response.data.latest_id > latestIdRef.current) {
+        await fetchNewNotifications();
+      }
+    } catch (err) {
+      setError("Error al cargar las notificaciones.");
+    }
+  };
+
   useEffect(() => {
     if (token) {
-      fetchNotifications();
-      const interval = setInterval(fetchNotifications, 30000);
+      fetchNotifications().then(pollUnreadCount);
+      const interval = setInterval(pollUnreadCount, 30000);
       return () => clearInterval(interval);
     }
   }, [token]);
 
+  // Canal en vivo (SSE). Si no está disponible (p. ej. runserver sin ASGI) el
+  // sondeo de arriba sigue actualizando el globo.
+  useEffect(() => {
+    if (!token) {
+      return undefined;
+    }
+    let source = null;
+    let retry = null;
+    let closed = false;
+
+    const onNotification = (e) => {
+      const notif = JSON.parse(e.data);
+      if (notif.id <= latestIdRef.current) {
+        return;
+      }
+      latestIdRef.current = notif.id;
+      setNotifications((current) => [notif, ...current]);
+      if (!notif.is_read) {
+        setUnreadCount((count) => count + 1);
+      }
+    };
+
+    const connect = async () => {
+      try {
+        // EventSource no envía cabeceras: se usa un ticket de corta duración
+        const response = await axios.post(
+          "http://127.0.0.1:8000/notifications/stream/ticket/",
+          {},
+          { headers: { Authorization: `Bearer ${token}` } }
+        );
+        if (closed) {
+          return;
+        }
+        const params = new URLSearchParams({ ticket: response.data.ticket });
+        // Reanudar desde la más reciente que ya se muestra
+        if (latestIdRef.current > 0) {
+          params.set("last_event_id", latestIdRef.current);
+        }
+        source = new EventSource(`http://127.0.0.1:8000/notifications/stream/?${params}`);
+        source.addEventListener("notification", onNotification);
+        // Se perdieron demasiadas: recargar la bandeja completa
+        source.addEventListener("reset", () => {
+          fetchNotifications().then(pollUnreadCount);
+        });
+        source.onerror = () => {
+          // Con el ticket vencido o sin ASGI EventSource ya no reintenta solo
+          if (source.readyState === EventSource.CLOSED && !closed) {
+            retry = setTimeout(connect, 10000);
+          }
+        };
+      } catch (err) {
+        if (!closed) {
+          retry = setTimeout(connect, 30000);
+        }
+      }
+    };
+
+    connect();
+    return () => {
+      closed = true;
+      clearTimeout(retry);
+      if (source) {
+        source.close();
+      }
+    };
+  }, [token]);
+
   useEffect(() => {
     const fetchUser = async () => {
       try {
@@ -56,8 +156,6 @@ const Navbar = () => {
     }
   }, [token]);
 
-  const unreadCount = notifications.filter((n) => !n.is_read).length;
-
   const markAllAsRead = async () => {
     try {
       await axios.post(
@@ -66,6 +164,7 @@ const Navbar = () => {
         { headers: { Authorization: `Bearer ${token}` } }
       );
       setNotifications(notifications.map((n) => ({ ...n, is_read: true })));
+      setUnreadCount(0);
     } catch (err) {
       setError("Error al marcar como leídas.");
     }
@@ -78,11 +177,14 @@ const Navbar = () => {
     }
 
     try {
-      await axios.post(
+      const response = await axios.post(
         `http://127.0.0.1:8000/notifications/mark/${notifId}/`,
         {},
         { headers: { Authorization: `Bearer ${token}` } }
       );
+      if (response.data.status === "success") {
+        setUnreadCount((count) => Math.max(count - 1, 0));
+      }
       setNotifications(notifications.map(n => 
         n.id === notifId ? { ...n, is_read: true } : n
       ));
@@ -100,6 +202,10 @@ const Navbar = () => {
         `http://127.0.0.1:8000/notifications/delete/${notifId}/`,
         { headers: { Authorization: `Bearer ${token}` } }
       );
+      const deleted = notifications.find(n => n.id === notifId);
+      if (deleted && !deleted.is_read) {
+        setUnreadCount((count) => Math.max(count - 1, 0));
+      }
       setNotifications(notifications.filter(n => n.id !== notifId));
     } catch (err) {
       setError("Error al eliminar la notificación.");